@@ -1,10 +1,29 @@
-import sqlite3
 from services.UserAuth import UserAuthentication  
-from services.scooterCRUD import create_scooter, update_scooter, delete_scooter, search_scooters
+from services.database import get_connection, close_all
+from services.logCRUD import start_audit_writer, stop_audit_writer, view_logs
+from services.scooterCRUD import create_scooter, update_scooter, delete_scooter, search_scooters, find_nearby_scooters
 from services.travellerCRUD import add_traveller, update_traveller, delete_traveller, search_traveller
+from services.bulk_import import bulk_import
+from services.export import export_data
+from services.fleet_snapshot import show_fleet_stats
+from services.charging import charging_report
+from services.maintenance import maintenance_report, mark_serviced_menu
+from services.session_manager import start_session_sweeper, stop_session_sweeper
+from services.backup_restore import create_backup, restore_backup, manage_restore_codes
+from services.schema import ensure_schema
+from services.instrumentation import configure_from_env, stop_metrics_exporter, timer
+
+# Metric label of each menu choice (instrumentation "menu.command"; its time includes the
+# user's typing at the command's own prompts, so the SQL and crypto metrics show the work)
+MENU_COMMANDS = {
+    "1": "search_scooter", "2": "update_scooter", "3": "create_scooter", "4": "delete_scooter",
+    "5": "add_traveller", "6": "update_traveller", "7": "delete_traveller", "8": "search_traveller",
+    "9": "create_user", "10": "view_logs", "11": "create_backup", "12": "restore_backup",
+    "13": "nearby_scooters", "14": "bulk_import", "15": "export_data", "16": "fleet_statistics",
+    "17": "charging_report", "18": "maintenance_report", "19": "mark_serviced", "20": "restore_codes",
+    "l": "logout", "x": "exit",
+}
 
-#from backup_restore import create_backup, restore_backup
-#from logs import view_logs
 
 def main_menu(auth, conn):
     while True:
@@ -43,50 +62,89 @@ def main_menu(auth, conn):
             print("11. Create backup")
         if auth.can("restore_backup"):
             print("12. Restore backup")
+        if auth.can("generate_restore_code"):
+            print("20. Manage restore codes")
+
+        if auth.can("search_scooter"):
+            print("13. Find scooters near a location")
+        if auth.can("create_scooter") or auth.can("add_traveller"):
+            print("14. Bulk import scooters/travellers")
+        if auth.can("export_scooters") or auth.can("export_travellers") or auth.can("export_logs"):
+            print("15. Export data")
+        if auth.can("search_scooter"):
+            print("16. Fleet statistics")
+            print("17. Charging report")
+            print("18. Maintenance due this week")
+        if auth.can("update_scooter"):
+            print("19. Mark scooters serviced")
 
         print("L. Logout")
         print("X. Exit")
 
         choice = input("Choose an option: ").strip().lower()
 
-        if choice == "1":
-            search_scooters(conn, auth)
-        elif choice == "2":
-            update_scooter(conn, auth)
-        elif choice == "3" and auth.can("create_scooter"):
-            create_scooter(conn, auth)
-        elif choice == "4" and auth.can("delete_scooter"):
-            delete_scooter(conn, auth)
-        elif choice == "5" and auth.can("add_traveller"):
-            add_traveller(conn, auth)
-        elif choice == "6" and auth.can("update_traveller"):
-            update_traveller(conn, auth)
-        elif choice == "7" and auth.can("delete_traveller"):
-            delete_traveller(conn, auth)
-        elif choice == "8" and auth.can("search_traveller"):
-            search_traveller(conn, auth)
-        elif choice == "9":
-            auth.create_user()
-        elif choice == "10" and auth.can("view_logs"):
-            view_logs(conn, auth)
-        elif choice == "11" and auth.can("create_backup"):
-            create_backup(conn, auth)
-        elif choice == "12" and auth.can("restore_backup"):
-            restore_backup(conn, auth)
-        elif choice == "l":
-            auth.logout()
-        elif choice == "x":
-            print("Exiting system.")
-            break
-        else:
-            print("Invalid choice or access denied.")
+        with timer("menu.command", MENU_COMMANDS.get(choice, "invalid")):
+            if choice == "1":
+                search_scooters(conn, auth)
+            elif choice == "2":
+                update_scooter(conn, auth)
+            elif choice == "3" and auth.can("create_scooter"):
+                create_scooter(conn, auth)
+            elif choice == "4" and auth.can("delete_scooter"):
+                delete_scooter(conn, auth)
+            elif choice == "5" and auth.can("add_traveller"):
+                add_traveller(conn, auth)
+            elif choice == "6" and auth.can("update_traveller"):
+                update_traveller(conn, auth)
+            elif choice == "7" and auth.can("delete_traveller"):
+                delete_traveller(conn, auth)
+            elif choice == "8" and auth.can("search_traveller"):
+                search_traveller(conn, auth)
+            elif choice == "9":
+                auth.create_user()
+            elif choice == "10" and auth.can("view_logs"):
+                view_logs(conn, auth)
+            elif choice == "11" and auth.can("create_backup"):
+                create_backup(conn, auth)
+            elif choice == "12" and auth.can("restore_backup"):
+                restore_backup(conn, auth)
+            elif choice == "13" and auth.can("search_scooter"):
+                find_nearby_scooters(conn, auth)
+            elif choice == "14" and (auth.can("create_scooter") or auth.can("add_traveller")):
+                bulk_import(conn, auth)
+            elif choice == "15":
+                export_data(conn, auth)
+            elif choice == "16" and auth.can("search_scooter"):
+                show_fleet_stats(conn, auth)
+            elif choice == "17" and auth.can("search_scooter"):
+                charging_report(conn, auth)
+            elif choice == "18" and auth.can("search_scooter"):
+                maintenance_report(conn, auth)
+            elif choice == "19" and auth.can("update_scooter"):
+                mark_serviced_menu(conn, auth)
+            elif choice == "20" and auth.can("generate_restore_code"):
+                manage_restore_codes(conn, auth)
+            elif choice == "l":
+                auth.logout()
+            elif choice == "x":
+                print("Exiting system.")
+                break
+            else:
+                print("Invalid choice or access denied.")
 
 if __name__ == "__main__":
     try:
-        conn = sqlite3.connect("urban_mobility.db")
+        configure_from_env()
+        conn = get_connection()
+        start_audit_writer()
+        ensure_schema(conn)
+        start_session_sweeper()
         auth = UserAuthentication(conn)
         main_menu(auth, conn)
     except KeyboardInterrupt:
         print("\nSystem exited by user.")
     finally:
-        conn.close()
+        stop_session_sweeper()
+        stop_metrics_exporter()
+        stop_audit_writer()  # commits any buffered audit events
+        close_all()
@@ -0,0 +1,162 @@
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Callable, List, Optional
+from models.log_entry import LogEntry
+from models.scooter import Scooter
+from models.traveller import Traveller
+from models.user import User
+from modelEncryption.bulk_decode import decode_rows
+from modelEncryption.logEncryption import logentry_to_encrypted_row
+from modelEncryption.userEncryption import user_to_encrypted_row
+from services.blind_index import blind_index
+from services.bulk_import import ENTITIES, _insert_batch
+from services.database import get_connection, write_transaction
+from services.password_hashing import hash_password
+from services.validators import Citylist
+
+# Deterministic synthetic data for the benchmarks.
+# The same seed and counts always produce the same plaintext records. They are written through
+# the application's own encoders: bulk_import's entity specs for scooters and travellers
+# (scooter_to_encrypted_row / traveller_to_encrypted_row plus blind indexes, search grams and the
+# derived columns), user_to_encrypted_row and logentry_to_encrypted_row, so a generated database
+# looks like one filled through the menus. Only the ciphertexts differ between runs.
+# Every generated user has the password BENCH_PASSWORD; it is hashed once, since a bcrypt hash
+# per user would dominate generation time.
+#
+#   python -m benchmarks.generator --db bench.db --scooters 100000 --travellers 100000 --users 100 --logs 100000
+
+SEED = 42
+BATCH_SIZE = 1000
+BENCH_PASSWORD = "Bench_pass1!"
+EPOCH = datetime(2024, 1, 1)
+
+BRANDS = {"Segway": ["Max", "Ninebot", "E45"], "Xiaomi": ["Pro2", "Essential", "M365"],
+          "Gotrax": ["G4", "XR"], "Niu": ["KQi3", "KQi2"], "Apollo": ["City", "Ghost"]}
+FIRST_NAMES = ["Anna", "Bram", "Chloe", "Daan", "Emma", "Finn", "Julia", "Lars", "Mila", "Noah", "Sara", "Thijs"]
+LAST_NAMES = ["Jansen", "Bakker", "Visser", "Smit", "Meijer", "Mulder", "Bos", "Vos", "Peters", "Hendriks"]
+STREETS = ["Coolsingel", "Witte de Withstraat", "Oudedijk", "Kralingseweg", "Lijnbaan", "Meent"]
+ACTIVITIES = ["Login successful", "Searched scooters", "Updated scooter", "Added traveller", "Logged out"]
+
+
+def bench_scooter(rng: random.Random, n: int) -> Scooter:
+    brand = rng.choice(list(BRANDS))
+    low = rng.choice([10, 20, 30])
+    return Scooter(
+        id=None, brand=brand, model=rng.choice(BRANDS[brand]), serial_number=f"BS{n:010d}",
+        top_speed=float(rng.choice([20, 25, 30])), battery_capacity=float(rng.randint(300, 900)),
+        soc=rng.randint(0, 100), target_soc_range=f"{low}-{low + 60}",
+        latitude=round(rng.uniform(51.86, 51.99), 5), longitude=round(rng.uniform(4.41, 4.59), 5),
+        out_of_service=rng.random() < 0.05, mileage=float(rng.randint(0, 5000)),
+        last_maintenance=(date(2025, 1, 1) + timedelta(days=rng.randint(0, 600))).isoformat(),
+        in_service_date=EPOCH + timedelta(days=rng.randint(0, 365)))
+
+
+def bench_traveller(rng: random.Random, n: int) -> Traveller:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return Traveller(
+        id=None, first_name=first, last_name=last,
+        birthday=(date(1960, 1, 1) + timedelta(days=rng.randint(0, 15000))).isoformat(),
+        gender=rng.choice(["male", "female"]), street_name=rng.choice(STREETS),
+        house_number=str(rng.randint(1, 300)), zip_code=f"{rng.randint(1000, 9999)}{rng.choice('ABCDEFGH')}X",
+        city=rng.choice(Citylist), email=f"{first.lower()}.{last.lower()}{n}@example.nl",
+        mobile_phone=f"6{rng.randint(0, 99999999):08d}", driving_license=f"XB{rng.randint(0, 9999999):07d}",
+        registration_date=EPOCH + timedelta(minutes=n))
+
+
+def bench_username(n: int) -> str:
+    return f"bench{n:05d}"
+
+
+def _populate(conn, count: int, start: int, make: Callable, encode: Callable, insert: Callable,
+              batch_size: int, progress: Optional[Callable], label: str):
+    records = (make(n) for n in range(start, start + count))
+    done = 0
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        encoded = decode_rows(batch, encode)
+        write_transaction(lambda c: insert(c, encoded), conn)
+        done += len(batch)
+        if progress:
+            progress(label, done, count)
+
+
+def _next_number(conn, table: str) -> int:
+    """Records are numbered on from the table's highest id, so a second run adds new unique ones"""
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+
+def populate(conn, scooters: int = 0, travellers: int = 0, users: int = 0, logs: int = 0, seed: int = SEED,
+             batch_size: int = BATCH_SIZE, progress: Callable = None) -> dict:
+    """Add the requested number of synthetic records; returns the counts added"""
+    rng = random.Random(seed)
+    scooter_spec, traveller_spec = ENTITIES["scooters"], ENTITIES["travellers"]
+    _populate(conn, scooters, _next_number(conn, "scooters"), lambda n: bench_scooter(rng, n), scooter_spec.encode,
+              lambda c, enc: _insert_batch(c, scooter_spec, enc), batch_size, progress, "scooters")
+    _populate(conn, travellers, _next_number(conn, "travellers"), lambda n: bench_traveller(rng, n),
+              traveller_spec.encode, lambda c, enc: _insert_batch(c, traveller_spec, enc), batch_size, progress,
+              "travellers")
+
+    password_hash = hash_password(BENCH_PASSWORD)
+    first_user = _next_number(conn, "users")
+    _populate(conn, users, first_user,
+              lambda n: User(bench_username(n), password_hash, rng.choice(["engineer", "sysadmin"]),
+                             rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), EPOCH),
+              lambda u: user_to_encrypted_row(u) + (blind_index("username", u.username),),
+              lambda c, rows: c.executemany("""
+                  INSERT INTO users (username, password_hash, role, first_name, last_name, registration_date, username_bidx)
+                  VALUES (?, ?, ?, ?, ?, ?, ?)""", rows), batch_size, progress, "users")
+
+    names = [bench_username(n) for n in range(first_user, first_user + users)] or ["super_admin"]
+    _populate(conn, logs, _next_number(conn, "log_entries"),
+              lambda n: LogEntry(EPOCH + timedelta(seconds=n), rng.choice(names), rng.choice(ACTIVITIES), "",
+                                 rng.random() < 0.02),
+              lambda log: logentry_to_encrypted_row(log) + (blind_index("username", log.username),),
+              lambda c, rows: c.executemany("""
+                  INSERT INTO log_entries (timestamp, username, activity, additional_info, suspicious, username_bidx)
+                  VALUES (?, ?, ?, ?, ?, ?)""", rows), batch_size, progress, "log_entries")
+    return {"scooters": scooters, "travellers": travellers, "users": users, "log_entries": logs}
+
+
+def bench_usernames(conn, limit: int = 20) -> List[str]:
+    """Up to limit usernames the generator has created (they all log in with BENCH_PASSWORD)"""
+    names = []
+    for n in range(1, _next_number(conn, "users") + 1):
+        if len(names) >= limit:
+            break
+        if conn.execute("SELECT 1 FROM users WHERE username_bidx = ?",
+                        (blind_index("username", bench_username(n)),)).fetchone():
+            names.append(bench_username(n))
+    return names
+
+
+def _print_progress(label, done, total):
+    if done == total or done % (BATCH_SIZE * 20) == 0:
+        print(f"  {label}: {done}/{total}")
+
+
+def main(argv: Optional[List[str]] = None):
+    from init_db import initialize
+
+    parser = argparse.ArgumentParser(description="Fill a database with deterministic synthetic data")
+    parser.add_argument("--db", required=True, help="database file (created if missing)")
+    parser.add_argument("--scooters", type=int, default=10000)
+    parser.add_argument("--travellers", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logs", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+
+    initialize(args.db)
+    conn = get_connection(args.db)
+    started = time.monotonic()
+    populate(conn, args.scooters, args.travellers, args.users, args.logs, args.seed, progress=_print_progress)
+    print(f"Generated in {time.monotonic() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
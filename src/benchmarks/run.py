@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from benchmarks.generator import BENCH_PASSWORD, bench_usernames
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.scooterEncryption import iter_rows_to_scooters
+from services import auth_service, scooter_service, traveller_service
+from services.database import get_connection
+from services.logCRUD import flush_audit_log, log_action, start_audit_writer, stop_audit_writer
+
+# Timed scenarios over a generated database (see benchmarks.generator).
+# Each scenario starts with an empty decode cache and one untimed warm-up operation, then times
+# every operation separately. Results go to a JSON file; with --baseline each scenario's mean is
+# compared to the baseline's and anything slower by more than --tolerance counts as a regression
+# (exit status 1), so a run can gate a change.
+#
+#   python -m benchmarks.run --db bench.db [--baseline benchmarks/baseline.json] [--only login ...]
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+TOLERANCE = 0.15
+ACTOR = {"username": "super_admin", "role": "superadmin"}
+SCOOTER_TERMS = ["segway", "max", "xiaomi", "kqi", "bs00000001"]
+TRAVELLER_TERMS = ["jansen", "anna", "rotterdam", "visser", "mila"]
+
+
+def _serial_lookup(conn, rng, ops):
+    count = conn.execute("SELECT COUNT(*) FROM scooters").fetchone()[0]
+    serials = [f"BS{rng.randrange(count):010d}" for _ in range(ops + 1)]
+    return [lambda s=s: scooter_service.get_scooter(conn, s) for s in serials]
+
+
+def _search_scooters(conn, rng, ops):
+    return [lambda t=rng.choice(SCOOTER_TERMS): list(scooter_service.search_scooters(conn, ACTOR, t, limit=50))
+            for _ in range(ops + 1)]
+
+
+def _search_travellers(conn, rng, ops):
+    return [lambda t=rng.choice(TRAVELLER_TERMS): list(traveller_service.search_travellers(conn, ACTOR, t, limit=50))
+            for _ in range(ops + 1)]
+
+
+def _login(conn, rng, ops):
+    names = bench_usernames(conn)
+    if not names:
+        raise RuntimeError("No generated users; run benchmarks.generator with --users first")
+    return [lambda u=rng.choice(names): auth_service.authenticate(conn, u, BENCH_PASSWORD) for _ in range(ops + 1)]
+
+
+def _log_action(conn, rng, ops):
+    def burst():
+        for i in range(1000):
+            log_action("super_admin", f"Benchmark event {i}", suspicious=False)
+        flush_audit_log()
+    return [burst] * (ops + 1)
+
+
+def _bulk_decode(conn, rng, ops):
+    rows = conn.execute("SELECT * FROM scooters LIMIT 10000").fetchall()
+    return [lambda: sum(1 for _ in iter_rows_to_scooters(rows, cache=False))] * (ops + 1)
+
+
+# name -> (operation factory, default operation count, unit of one operation)
+SCENARIOS: Dict[str, tuple] = {
+    "serial_lookup": (_serial_lookup, 500, "lookup"),
+    "search_scooters": (_search_scooters, 50, "search, 50 results"),
+    "search_travellers": (_search_travellers, 50, "search, 50 results"),
+    "login": (_login, 10, "login"),
+    "log_action": (_log_action, 10, "1000 events written"),
+    "bulk_decode": (_bulk_decode, 5, "scan of up to 10000 scooter rows"),
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+def run_scenario(conn, name: str, ops: int = None, seed: int = 1) -> dict:
+    factory, default_ops, unit = SCENARIOS[name]
+    operations = factory(conn, random.Random(seed), ops or default_ops)
+    decode_cache.clear()
+    operations[0]()   # warm-up
+    timings = []
+    for operation in operations[1:]:
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {"unit": unit, "ops": len(timings), "mean_ms": round(statistics.fmean(timings), 3),
+            "p50_ms": round(_percentile(timings, 0.5), 3), "p95_ms": round(_percentile(timings, 0.95), 3),
+            "max_ms": round(timings[-1], 3)}
+
+
+def run(conn, names: List[str] = None, progress: Callable = None) -> dict:
+    counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("scooters", "travellers", "users", "log_entries")}
+    results = {"created": datetime.now().isoformat(timespec="seconds"),
+               "host": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+               "rows": counts, "scenarios": {}}
+    for name in names or SCENARIOS:
+        results["scenarios"][name] = run_scenario(conn, name)
+        if progress:
+            progress(name, results["scenarios"][name])
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> List[tuple]:
+    """(scenario, baseline mean, current mean, change, regressed) for scenarios present in both"""
+    rows = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        change = current["mean_ms"] / before["mean_ms"] - 1 if before["mean_ms"] else 0.0
+        rows.append((name, before["mean_ms"], current["mean_ms"], change, change > tolerance))
+    return rows
+
+
+def _print_result(name, r):
+    print(f"  {name:<18} mean {r['mean_ms']:>9.2f} ms  p50 {r['p50_ms']:>9.2f}  p95 {r['p95_ms']:>9.2f}"
+          f"  ({r['ops']} x {r['unit']})")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run the timed benchmark scenarios")
+    parser.add_argument("--db", required=True, help="database filled by benchmarks.generator")
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--out", default=None, help="results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args(argv)
+
+    conn = get_connection(args.db)
+    start_audit_writer(args.db)
+    try:
+        print(f"Benchmarking {args.db}")
+        results = run(conn, args.only, _print_result)
+    finally:
+        stop_audit_writer()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # log_action adds rows to log_entries on every run, so only the other tables must match
+        fixed = ("scooters", "travellers", "users")
+        if any(baseline.get("rows", {}).get(t) != results["rows"][t] for t in fixed):
+            print(f"Note: baseline was measured on {baseline.get('rows')} rows, this run on {results['rows']}.")
+        regressions = 0
+        for name, before, now, change, regressed in compare(results, baseline, args.tolerance):
+            regressions += regressed
+            print(f"  {name:<18} {before:>9.2f} -> {now:>9.2f} ms  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,20 @@
-import sqlite3
 import os
+from services.database import connect
+from services.schema import ensure_schema
 
 # Ensure db is created in the same folder as this script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-db_path = os.path.join(BASE_DIR, "urban_mobility.db")
+DB_PATH = os.path.join(BASE_DIR, "urban_mobility.db")
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
 
-# Create users table
-cursor.execute('''
+def initialize(db_path: str = None) -> str:
+    """Create the tables and bring the schema up to date; returns the database path"""
+    db_path = db_path or DB_PATH
+    conn = connect(db_path)
+    cursor = conn.cursor()
+
+    # Create users table
+    cursor.execute('''
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT NOT NULL UNIQUE,
@@ -21,8 +26,8 @@ CREATE TABLE IF NOT EXISTS users (
 )
 ''')
 
-# Create travellers table
-cursor.execute('''
+    # Create travellers table
+    cursor.execute('''
 CREATE TABLE IF NOT EXISTS travellers (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     first_name TEXT NOT NULL,
@@ -40,8 +45,8 @@ CREATE TABLE IF NOT EXISTS travellers (
 )
 ''')
 
-# Create scooters table
-cursor.execute('''
+    # Create scooters table
+    cursor.execute('''
 CREATE TABLE IF NOT EXISTS scooters (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     brand TEXT NOT NULL,
@@ -60,8 +65,8 @@ CREATE TABLE IF NOT EXISTS scooters (
 )
 ''')
 
-# Create log_entries table
-cursor.execute('''
+    # Create log_entries table
+    cursor.execute('''
 CREATE TABLE IF NOT EXISTS log_entries (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT NOT NULL,
@@ -72,7 +77,13 @@ CREATE TABLE IF NOT EXISTS log_entries (
 )
 ''')
 
-conn.commit()
-conn.close()
+    conn.commit()
+
+    # Indexes, derived columns and the other tables (skipped once the database is at SCHEMA_VERSION)
+    ensure_schema(conn)
+    conn.close()
+    return db_path
+
 
-print(f"Database initialized at {db_path}")
+if __name__ == "__main__":
+    print(f"Database initialized at {initialize()}")
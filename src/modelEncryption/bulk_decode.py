@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# Parallel batch decoding of encrypted rows.
+# Fernet's AES/HMAC work runs inside OpenSSL with the GIL released, so a thread pool
+# scales row decoding across cores. Rows are handed out in chunks, results come back
+# in input order, and a failing row yields None instead of aborting the batch.
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+DEFAULT_CHUNK_SIZE = 256
+MAX_PENDING_CHUNKS_PER_WORKER = 2
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = DEFAULT_WORKERS
+_executor_lock = threading.Lock()
+
+
+def configure(workers: int = None):
+    """Resize the shared decode pool (takes effect on next use)"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if workers is not None and workers != _executor_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+            _executor_workers = max(1, workers)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix="decode")
+        return _executor
+
+
+def _decode_chunk(chunk: list, decode: Callable, start: int, on_error: Optional[Callable]) -> list:
+    out = []
+    for offset, row in enumerate(chunk):
+        try:
+            out.append(decode(row))
+        except Exception as e:
+            if on_error is not None:
+                on_error(start + offset, row, e)
+            out.append(None)
+    return out
+
+
+def iter_decode_rows(rows: Iterable, decode: Callable, workers: int = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, on_error: Callable = None) -> Iterator:
+    """Lazily decode rows on the pool; yields one result per input row (None on failure), in order.
+
+    Only a bounded window of chunks is in flight, so an unbounded cursor can be streamed
+    through without holding the whole table in memory.
+    """
+    workers = workers or _executor_workers
+    rows = iter(rows)
+    if workers <= 1:
+        index = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield from _decode_chunk(chunk, decode, index, on_error)
+            index += len(chunk)
+
+    executor = _get_executor()
+    pending = deque()
+    index = 0
+    max_pending = workers * MAX_PENDING_CHUNKS_PER_WORKER
+    while True:
+        while len(pending) < max_pending:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            pending.append(executor.submit(_decode_chunk, chunk, decode, index, on_error))
+            index += len(chunk)
+        if not pending:
+            return
+        yield from pending.popleft().result()
+
+
+def decode_rows(rows: Iterable, decode: Callable, workers: int = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, on_error: Callable = None) -> List:
+    return list(iter_decode_rows(rows, decode, workers, chunk_size, on_error))
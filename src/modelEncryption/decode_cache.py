@@ -0,0 +1,123 @@
+import dataclasses
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+# Bounded LRU cache of decrypted model objects.
+# Entries are keyed by (table, id, digest of the raw row), so a changed row can never be
+# served from cache. Caching a new version of a row drops its older ones, and invalidate()
+# frees them even before the row is read again. Callers always get a shallow copy, since CRUD
+# code mutates the dataclasses it is handed.
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _row_digest(row) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for value in row:
+        h.update(repr(value).encode())
+        h.update(b"\x1f")
+    return h.digest()
+
+
+def _estimate_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    for value in obj.__dict__.values():
+        size += sys.getsizeof(value)
+    return size
+
+
+class DecodeCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (table, id, digest) -> (obj, size)
+        self._by_id = {}               # (table, id) -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_entries: int = None, max_bytes: int = None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def get_or_decode(self, table: str, row_id, row, decode):
+        """Return a copy of the cached object for this exact row, decoding and caching it on a miss"""
+        if self.max_entries <= 0:
+            return decode(row)
+        key = (table, row_id, _row_digest(row))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dataclasses.replace(entry[0])
+            self.misses += 1
+
+        obj = decode(row)
+        size = _estimate_size(obj)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                if row_id is not None:
+                    for stale in list(self._by_id.get((table, row_id), ())):
+                        self._drop(stale)
+                self._entries[key] = (obj, size)
+                self._by_id.setdefault((table, row_id), set()).add(key)
+                self._bytes += size
+                self._evict()
+        return dataclasses.replace(obj)
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, _ = next(iter(self._entries.items()))
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._by_id.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_id[key[:2]]
+
+    def invalidate(self, table: str, row_id):
+        """Drop every cached version of one row (call after update/delete)"""
+        with self._lock:
+            for key in list(self._by_id.get((table, row_id), ())):
+                self._drop(key)
+
+    def invalidate_table(self, table: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == table]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_id.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+decode_cache = DecodeCache()
@@ -1,23 +1,33 @@
-from typing import Tuple
+from typing import Iterable, List, Optional, Tuple
 from models.log_entry import LogEntry
-from services.crypto_utils import encrypt, decrypt
+from modelEncryption.sealed_rows import open_fields, seal_fields
+from modelEncryption.bulk_decode import decode_rows, iter_decode_rows
 from datetime import datetime
 
 
 def logentry_to_encrypted_row(log: LogEntry) -> Tuple:
-    return (
-        log.timestamp.isoformat(),
-        encrypt(log.username),
-        encrypt(log.activity),
-        encrypt(log.additional_info),
-        log.suspicious
-    )
+    return (log.timestamp.isoformat(),) \
+        + seal_fields("log_entries", (log.username, log.activity, log.additional_info)) \
+        + (log.suspicious,)
 
 def row_to_logentry(row: tuple) -> LogEntry:
+    # Not cached: log rows are append-only and mostly read once, so caching them would only
+    # push the hot scooter and traveller entries out of the decode cache
+    username, activity, additional_info = open_fields("log_entries", row[1:4])
     return LogEntry(
         timestamp=datetime.fromisoformat(row[0]),
-        username=decrypt(row[1]),
-        activity=decrypt(row[2]),
-        additional_info=decrypt(row[3]),
+        username=username,
+        activity=activity,
+        additional_info=additional_info,
         suspicious=bool(row[4])
     )
+
+
+def rows_to_logentries(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None) -> List[Optional[LogEntry]]:
+    """Decode many rows on the shared thread pool; order is kept and failed rows come back as None"""
+    return decode_rows(rows, row_to_logentry, workers, chunk_size, on_error)
+
+
+def iter_rows_to_logentries(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None, cache: bool = True):
+    """Streaming rows_to_logentries; cache is accepted like for the other tables, log rows are never cached"""
+    return iter_decode_rows(rows, row_to_logentry, workers, chunk_size, on_error)
@@ -1,21 +1,25 @@
-from typing import Tuple
+from typing import Iterable, List, Optional, Tuple
 from datetime import datetime
 from models.scooter import Scooter
-from services.crypto_utils import encrypt, decrypt
+from modelEncryption.sealed_rows import open_fields, seal_fields
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.bulk_decode import decode_rows, iter_decode_rows
 
 
 def scooter_to_encrypted_row(s: Scooter) -> Tuple:
+    brand, model, serial_number, latitude, longitude = seal_fields(
+        "scooters", (s.brand, s.model, s.serial_number, str(s.latitude), str(s.longitude)))  # floats as strings
     return (
         s.id,
-        encrypt(s.brand),
-        encrypt(s.model),
-        encrypt(s.serial_number),
+        brand,
+        model,
+        serial_number,
         s.top_speed,
         s.battery_capacity,
         s.soc,
         s.target_soc_range,
-        encrypt(str(s.latitude)),   # Encrypt float as string
-        encrypt(str(s.longitude)),  # Encrypt float as string
+        latitude,
+        longitude,
         s.out_of_service,
         s.mileage,
         s.last_maintenance,
@@ -24,19 +28,34 @@ def scooter_to_encrypted_row(s: Scooter) -> Tuple:
 
 
 def row_to_scooter(row: tuple) -> Scooter:
+    return decode_cache.get_or_decode("scooters", row[0], row, _decode_scooter)
+
+
+def _decode_scooter(row: tuple) -> Scooter:
+    brand, model, serial_number, latitude, longitude = open_fields("scooters", row[1:4] + row[8:10])
     return Scooter(
         id=row[0],
-        brand=decrypt(row[1]),
-        model=decrypt(row[2]),
-        serial_number=decrypt(row[3]),
+        brand=brand,
+        model=model,
+        serial_number=serial_number,
         top_speed=row[4],
         battery_capacity=row[5],
         soc=row[6],
         target_soc_range=row[7],
-        latitude=float(decrypt(row[8])),
-        longitude=float(decrypt(row[9])),
+        latitude=float(latitude),
+        longitude=float(longitude),
         out_of_service=bool(row[10]),
         mileage=row[11],
         last_maintenance=row[12],
         in_service_date=datetime.fromisoformat(row[13])
     )
+
+
+def rows_to_scooters(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None) -> List[Optional[Scooter]]:
+    """Decode many rows on the shared thread pool; order is kept and failed rows come back as None"""
+    return decode_rows(rows, row_to_scooter, workers, chunk_size, on_error)
+
+
+def iter_rows_to_scooters(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None, cache: bool = True):
+    """Streaming rows_to_scooters; cache=False bypasses the decode cache for one-off full-table scans"""
+    return iter_decode_rows(rows, row_to_scooter if cache else _decode_scooter, workers, chunk_size, on_error)
@@ -0,0 +1,63 @@
+import json
+from typing import List, Optional, Sequence, Tuple
+from services.crypto_utils import decrypt, encrypt, seal, unseal
+
+# Storage formats for the sensitive columns of a row.
+#   fields  (v1) one Fernet token per column
+#   sealed  (v2) all sensitive values of the row in one crypto_utils.seal() blob, stored as a
+#               BLOB in the table's SEAL_COLUMN; the other sensitive columns hold ''
+# Plaintext and indexed columns are untouched, and so is the column layout, so every
+# "SELECT *" reader keeps working. Readers tell the formats apart by type (BLOB vs TEXT) and
+# a table may hold both while services.row_format migrates it.
+
+ROW_FORMAT = "sealed"   # format for new writes: "sealed" or "fields"
+
+# table -> sensitive columns, in table order
+SEALED_COLUMNS = {
+    "users": ("username", "first_name", "last_name"),
+    "travellers": ("first_name", "last_name", "street_name", "house_number", "zip_code", "city",
+                   "email", "mobile_phone", "driving_license"),
+    "scooters": ("brand", "model", "serial_number", "latitude", "longitude"),
+    "log_entries": ("username", "activity", "additional_info"),
+}
+
+# table -> column holding the blob. Every blob is distinct (random nonce) but the '' placeholders
+# are not, so a UNIQUE sensitive column must be the one holding it.
+SEAL_COLUMN = {
+    "users": "username",
+    "travellers": "first_name",
+    "scooters": "serial_number",
+    "log_entries": "username",
+}
+
+
+def is_sealed(value) -> bool:
+    return isinstance(value, bytes)
+
+
+def sealed_blob(table: str, stored: Sequence) -> Optional[bytes]:
+    """The row's blob if stored (values of SEALED_COLUMNS[table]) is in the sealed format"""
+    value = stored[SEALED_COLUMNS[table].index(SEAL_COLUMN[table])]
+    return value if is_sealed(value) else None
+
+
+def seal_fields(table: str, values: Sequence[str], row_format: str = None) -> Tuple:
+    """Stored values for SEALED_COLUMNS[table], from their plaintexts"""
+    if (row_format or ROW_FORMAT) == "fields":
+        return tuple(encrypt(v) for v in values)
+    payload = json.dumps(list(values), ensure_ascii=False, separators=(",", ":")).encode()
+    blob = seal(payload, table.encode())
+    return tuple(blob if column == SEAL_COLUMN[table] else "" for column in SEALED_COLUMNS[table])
+
+
+def open_fields(table: str, stored: Sequence) -> List[Optional[str]]:
+    """Plaintexts of SEALED_COLUMNS[table] from their stored values, in either format"""
+    blob = sealed_blob(table, stored)
+    if blob is not None:
+        return json.loads(unseal(blob, table.encode()))
+    return [decrypt(v) if v is not None else None for v in stored]
+
+
+def sealed_select(table: str) -> str:
+    """Column list to SELECT when a reader needs any of the sensitive values"""
+    return ", ".join(SEALED_COLUMNS[table])
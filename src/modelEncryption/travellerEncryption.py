@@ -1,38 +1,44 @@
-from typing import Tuple
+from typing import Iterable, List, Optional, Tuple
 from datetime import datetime
 from models.traveller import Traveller
-from services.crypto_utils import encrypt, decrypt
+from modelEncryption.sealed_rows import open_fields, seal_fields
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.bulk_decode import decode_rows, iter_decode_rows
 
 def traveller_to_encrypted_row(t: Traveller) -> Tuple:
-    return (
-        t.id,
-        encrypt(t.first_name),
-        encrypt(t.last_name),
-        t.birthday,
-        t.gender,
-        encrypt(t.street_name),
-        encrypt(t.house_number),
-        encrypt(t.zip_code),
-        encrypt(t.city),
-        encrypt(t.email),
-        encrypt(t.mobile_phone),
-        encrypt(t.driving_license),
-        t.registration_date.isoformat()
-    )
+    first_name, last_name, *address_and_contact = seal_fields("travellers", (
+        t.first_name, t.last_name, t.street_name, t.house_number, t.zip_code, t.city,
+        t.email, t.mobile_phone, t.driving_license))
+    return (t.id, first_name, last_name, t.birthday, t.gender, *address_and_contact, t.registration_date.isoformat())
 
 def row_to_traveller(row: tuple) -> Traveller:
+    return decode_cache.get_or_decode("travellers", row[0], row, _decode_traveller)
+
+def _decode_traveller(row: tuple) -> Traveller:
+    (first_name, last_name, street_name, house_number, zip_code, city,
+     email, mobile_phone, driving_license) = open_fields("travellers", row[1:3] + row[5:12])
     return Traveller(
         id=row[0],
-        first_name=decrypt(row[1]),
-        last_name=decrypt(row[2]),
+        first_name=first_name,
+        last_name=last_name,
         birthday=row[3],
         gender=row[4],
-        street_name=decrypt(row[5]),
-        house_number=decrypt(row[6]),
-        zip_code=decrypt(row[7]),
-        city=decrypt(row[8]),
-        email=decrypt(row[9]),
-        mobile_phone=decrypt(row[10]),
-        driving_license=decrypt(row[11]),
+        street_name=street_name,
+        house_number=house_number,
+        zip_code=zip_code,
+        city=city,
+        email=email,
+        mobile_phone=mobile_phone,
+        driving_license=driving_license,
         registration_date=datetime.fromisoformat(row[12])
     )
+
+
+def rows_to_travellers(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None) -> List[Optional[Traveller]]:
+    """Decode many rows on the shared thread pool; order is kept and failed rows come back as None"""
+    return decode_rows(rows, row_to_traveller, workers, chunk_size, on_error)
+
+
+def iter_rows_to_travellers(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None, cache: bool = True):
+    """Streaming rows_to_travellers; cache=False bypasses the decode cache for one-off full-table scans"""
+    return iter_decode_rows(rows, row_to_traveller if cache else _decode_traveller, workers, chunk_size, on_error)
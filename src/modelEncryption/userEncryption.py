@@ -1,31 +1,50 @@
-from typing import Tuple
+from typing import Iterable, List, Optional, Tuple
 from models.user import User
-from services.crypto_utils import encrypt, decrypt
-import bcrypt
+from modelEncryption.sealed_rows import open_fields, seal_fields
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.bulk_decode import decode_rows, iter_decode_rows
+from services import password_hashing
 from datetime import datetime
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return password_hashing.hash_password(password)
 
 def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+    return password_hashing.verify_password(password, hashed)
 
 def user_to_encrypted_row(user: User) -> Tuple:
+    username, first_name, last_name = seal_fields("users", (user.username, user.first_name, user.last_name))
     return (
-        encrypt(user.username),
+        username,
         user.password_hash,  # already hashed deos not need to be encrypted
         user.role,
-        encrypt(user.first_name),
-        encrypt(user.last_name),
+        first_name,
+        last_name,
         user.registration_date.isoformat()
     )
 
 def row_to_user(row: tuple) -> User:
+    # User rows are selected without their id. The stored username (a sealed blob or token) is
+    # unique per row and kept by password changes, so it serves as the id: a re-read row with a
+    # new hash or role replaces the cached one instead of sitting beside it
+    return decode_cache.get_or_decode("users", row[0], row, _decode_user)
+
+def _decode_user(row: tuple) -> User:
+    username, first_name, last_name = open_fields("users", (row[0], row[3], row[4]))
     return User(
-        username=decrypt(row[0]),
+        username=username,
         password_hash=row[1],
         role=row[2],
-        first_name=decrypt(row[3]),
-        last_name=decrypt(row[4]),
+        first_name=first_name,
+        last_name=last_name,
         registration_date=datetime.fromisoformat(row[5])
     )
+
+
+def rows_to_users(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None) -> List[Optional[User]]:
+    """Decode many rows on the shared thread pool; order is kept and failed rows come back as None"""
+    return decode_rows(rows, row_to_user, workers, chunk_size, on_error)
+
+
+def iter_rows_to_users(rows: Iterable[tuple], workers: int = None, chunk_size: int = 256, on_error=None):
+    return iter_decode_rows(rows, row_to_user, workers, chunk_size, on_error)
@@ -0,0 +1,430 @@
+import asyncio
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+from services import auth_service, login_throttle, scooter_service, session_manager, traveller_service
+from services.charging import charging_needed
+from services.maintenance import maintenance_due, mark_serviced
+from services.maintenance_config import DUE_SOON_DAYS, DUE_SOON_KM
+from services.fleet_snapshot import fleet_summary
+from services.database import get_connection
+from services.errors import AuthenticationError, NotFound, ServiceError, TooManyRequests, ValidationError
+from services.instrumentation import timer
+from services.logCRUD import log_action
+
+# JSON-over-HTTP front-end for the service layer, for many concurrent operators on one backend.
+# The event loop only parses requests and routes them; every handler (SQL, Fernet, bcrypt)
+# runs on a worker thread, each of which uses its own pooled connection from services.database.
+#
+#   python -m services.api_server [--host 127.0.0.1] [--port 8080] [--workers 8]
+#
+# POST /login {"username", "password"} returns {"token"}; send it as "Authorization: Bearer <token>".
+
+HOST = "127.0.0.1"
+PORT = 8080
+WORKERS = 8
+MAX_BODY = 1 << 20      # bytes; a larger Content-Length is refused with 413 before reading
+MAX_HEADERS = 100
+DEFAULT_PAGE = 50
+MAX_PAGE = 500
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _content_length(headers: dict) -> int:
+    """Validated Content-Length: 400 unless it is a plain decimal number, 413 above MAX_BODY"""
+    value = headers.get("content-length", "")
+    if not value:
+        return 0
+    if not re.fullmatch(r"[0-9]+", value):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    length = int(value)
+    if length > MAX_BODY:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    return length
+
+
+def _json_default(value):
+    if is_dataclass(value):
+        data = asdict(value)
+        data.pop("password_hash", None)
+        return data
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def _page_args(query: dict):
+    try:
+        limit = min(int(query.get("limit", DEFAULT_PAGE)), MAX_PAGE)
+        offset = max(int(query.get("offset", 0)), 0)
+    except ValueError:
+        raise ValidationError("limit", "limit and offset must be integers")
+    return limit, offset
+
+
+def _float_arg(query: dict, name: str, required: bool = True) -> Optional[float]:
+    if name not in query:
+        if required:
+            raise ValidationError(name, "Value is required")
+        return None
+    try:
+        value = float(query[name])
+    except ValueError:
+        raise ValidationError(name, "Must be a number")
+    if not math.isfinite(value):
+        raise ValidationError(name, "Must be a finite number")
+    return value
+
+
+# Handlers run on worker threads: handler(conn, actor, params, query, body) -> payload
+
+def _search_scooters(conn, actor, params, query, body):
+    limit, offset = _page_args(query)
+    return list(scooter_service.search_scooters(conn, actor, query.get("q", ""), limit, offset))
+
+
+def _nearby_scooters(conn, actor, params, query, body):
+    n = query.get("n")
+    hits = scooter_service.nearby_scooters(
+        conn, actor, _float_arg(query, "lat"), _float_arg(query, "lon"),
+        n=int(n) if n and n.isdigit() else None, radius_km=_float_arg(query, "radius", required=False))
+    return [{"distance_km": round(d, 3), "scooter": s} for d, s in hits]
+
+
+def _create_scooter(conn, actor, params, query, body):
+    return scooter_service.create_scooter(conn, actor, body)
+
+
+def _update_scooter(conn, actor, params, query, body):
+    return scooter_service.update_scooter(conn, actor, params["serial"], body)
+
+
+def _delete_scooter(conn, actor, params, query, body):
+    scooter_service.delete_scooter(conn, actor, params["serial"])
+    return {"deleted": params["serial"]}
+
+
+def _charging_needed(conn, actor, params, query, body):
+    limit, offset = _page_args(query)
+    hits = charging_needed(conn, actor, query.get("mode", "below"), limit, offset)
+    return [{"gap": gap, "scooter": s} for gap, s in hits]
+
+
+def _maintenance_due(conn, actor, params, query, body):
+    limit, offset = _page_args(query)
+    try:
+        days = int(query.get("days", DUE_SOON_DAYS))
+        km = float(query.get("km", DUE_SOON_KM))
+    except ValueError:
+        raise ValidationError("days", "days and km must be numbers")
+    total, hits = maintenance_due(conn, actor, days, km, limit, offset)
+    return {"total": total, "scooters": [
+        {"next_due_date": due, "km_left": left, "scooter": s} for due, left, s in hits]}
+
+
+def _mark_serviced(conn, actor, params, query, body):
+    serials = body.get("serials")
+    if not isinstance(serials, list):
+        raise ValidationError("serials", "Must be a list of serial numbers")
+    updated, missing = mark_serviced(conn, actor, [str(s) for s in serials], body.get("service_date"))
+    return {"updated": updated, "unknown": missing}
+
+
+def _fleet_summary(conn, actor, params, query, body):
+    return fleet_summary(conn, actor)
+
+
+def _search_travellers(conn, actor, params, query, body):
+    limit, offset = _page_args(query)
+    return list(traveller_service.search_travellers(conn, actor, query.get("q", ""), limit, offset))
+
+
+def _get_traveller(conn, actor, params, query, body):
+    auth_service.require_permission(actor, "search_traveller")
+    return traveller_service.get_traveller(conn, int(params["id"]))
+
+
+def _add_traveller(conn, actor, params, query, body):
+    return traveller_service.add_traveller(conn, actor, body)
+
+
+def _update_traveller(conn, actor, params, query, body):
+    return traveller_service.update_traveller(conn, actor, int(params["id"]), body)
+
+
+def _delete_traveller(conn, actor, params, query, body):
+    traveller_service.delete_traveller(conn, actor, int(params["id"]))
+    return {"deleted": int(params["id"])}
+
+
+def _create_user(conn, actor, params, query, body):
+    return auth_service.create_user(
+        conn, actor, body.get("username", ""), body.get("password", ""), body.get("role", ""),
+        body.get("first_name", ""), body.get("last_name", ""))
+
+
+def _revoke_sessions(conn, actor, params, query, body):
+    return {"revoked": session_manager.revoke_user_sessions(conn, actor, params["username"])}
+
+
+ROUTES = [
+    ("GET", r"/scooters", _search_scooters),
+    ("GET", r"/scooters/nearby", _nearby_scooters),
+    ("GET", r"/scooters/charging", _charging_needed),
+    ("GET", r"/scooters/maintenance", _maintenance_due),
+    ("POST", r"/scooters/serviced", _mark_serviced),
+    ("POST", r"/scooters", _create_scooter),
+    ("PATCH", r"/scooters/(?P<serial>[A-Za-z0-9]+)", _update_scooter),
+    ("DELETE", r"/scooters/(?P<serial>[A-Za-z0-9]+)", _delete_scooter),
+    ("GET", r"/fleet/summary", _fleet_summary),
+    ("GET", r"/travellers", _search_travellers),
+    ("GET", r"/travellers/(?P<id>\d+)", _get_traveller),
+    ("POST", r"/travellers", _add_traveller),
+    ("PATCH", r"/travellers/(?P<id>\d+)", _update_traveller),
+    ("DELETE", r"/travellers/(?P<id>\d+)", _delete_traveller),
+    ("POST", r"/users", _create_user),
+    ("DELETE", r"/users/(?P<username>[\w.'-]+)/sessions", _revoke_sessions),
+]
+ROUTES = [(method, re.compile(pattern + r"$"), handler) for method, pattern, handler in ROUTES]
+
+
+class ApiServer:
+    def __init__(self, db_path: str = None, workers: int = WORKERS):
+        self.db_path = db_path
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+
+    # --- sessions -------------------------------------------------------------
+
+    @staticmethod
+    def _token(headers: dict) -> Optional[str]:
+        auth = headers.get("authorization", "")
+        return auth[7:].strip() if auth.lower().startswith("bearer ") else None
+
+    def _actor_for(self, conn, headers: dict) -> dict:
+        session = session_manager.resolve(conn, self._token(headers))
+        if session is None:
+            raise AuthenticationError("Please login first.")
+        return session.actor
+
+    def _login(self, conn, body: dict, source: str) -> dict:
+        username = str(body.get("username", "")).strip().lower()
+        password = str(body.get("password", ""))
+        if not username or not password:
+            raise ValidationError("username", "Username and password are required.")
+
+        wait = login_throttle.acquire(conn, username, source)
+        if wait:
+            log_action(username, "Login attempt on locked account", suspicious=True)
+            raise TooManyRequests(f"Too many login attempts. Try again in {login_throttle.format_wait(wait)}.", wait)
+
+        user = auth_service.authenticate(conn, username, password)
+        if user is None:
+            log_action(username, "Failed login attempt", suspicious=True)
+            raise AuthenticationError("Invalid username or password.")
+
+        login_throttle.reset(conn, username)
+        token = session_manager.create_session(conn, user)
+        actor = session_manager.resolve(conn, token).actor
+        log_action(username, "Login successful", suspicious=False)
+        return {"token": token, "user": actor, "expires_in": session_manager.IDLE_TIMEOUT}
+
+    def _logout(self, conn, headers: dict) -> dict:
+        actor = self._actor_for(conn, headers)
+        session_manager.revoke(conn, self._token(headers))
+        log_action(actor["username"], "Logged out", suspicious=False)
+        return {"logged_out": actor["username"]}
+
+    def _change_password(self, conn, headers: dict, body: dict) -> dict:
+        """Own password (the calling session stays logged in) or, for admins, another user's"""
+        actor = self._actor_for(conn, headers)
+        auth_service.change_password(
+            conn, actor, body.get("new_password", ""), current_password=body.get("current_password"),
+            target_username=body.get("username"), session_token=self._token(headers))
+        return {"updated": body.get("username") or actor["username"]}
+
+    # --- dispatch -------------------------------------------------------------
+
+    def _dispatch(self, method: str, target: str, headers: dict, body: dict, source: str):
+        """Runs on a worker thread; returns (status, payload)"""
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        conn = get_connection(self.db_path)
+
+        if url.path == "/login" and method == "POST":
+            return HTTPStatus.OK, self._login(conn, body, source)
+        if url.path == "/logout" and method == "POST":
+            return HTTPStatus.OK, self._logout(conn, headers)
+        if url.path == "/password" and method == "POST":
+            return HTTPStatus.CREATED, self._change_password(conn, headers, body)
+
+        allowed = []
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed.append(route_method)
+                continue
+            actor = self._actor_for(conn, headers)
+            status = HTTPStatus.CREATED if method == "POST" else HTTPStatus.OK
+            with timer("api.request", handler.__name__.lstrip("_")):
+                return status, handler(conn, actor, match.groupdict(), query, body)
+        if allowed:
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {', '.join(allowed)}")
+        raise NotFound(f"No route for {url.path}")
+
+    async def _handle(self, method, target, headers, body, source):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self._dispatch, method, target, headers, body, source)
+        except ServiceError as e:
+            payload = {"error": str(e)}
+            if isinstance(e, ValidationError):
+                payload["field"] = e.field
+            if isinstance(e, TooManyRequests):
+                payload["retry_after"] = round(e.retry_after, 1)
+            return e.status, payload
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            log_action("SYSTEM", f"API error on {method} {target}: {e}", suspicious=True)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+    # --- HTTP/1.1 -------------------------------------------------------------
+
+    @staticmethod
+    async def _read_line(reader) -> bytes:
+        try:
+            return await reader.readline()
+        except ValueError:   # longer than the stream limit
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request line or header too long")
+
+    async def _read_request(self, reader):
+        """(method, target, version, headers, body) or None at EOF"""
+        line = await self._read_line(reader)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await self._read_line(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+            name, colon, value = line.decode("latin-1").partition(":")
+            if not colon or not name.strip():
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+        length = _content_length(headers)
+        body = {}
+        if length:
+            try:
+                body = json.loads(await reader.readexactly(length))
+            except (ValueError, RecursionError):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+            if not isinstance(body, dict):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return method.upper(), target, version, headers, body
+
+    @staticmethod
+    def _write_response(writer, status: int, payload, keep_alive: bool):
+        data = json.dumps(payload, default=_json_default).encode()
+        reason = HTTPStatus(status).phrase
+        writer.write(
+            f"HTTP/1.1 {int(status)} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+        )
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        source = peer[0] if peer else "unknown"
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    self._write_response(writer, e.status, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+                status, payload = await self._handle(method, target, headers, body, source)
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:   # close this connection only; the server keeps running
+            log_action("SYSTEM", f"API connection from {source} failed: {e}", suspicious=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            print(f"Urban mobility API listening on http://{host}:{port}")
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def main():
+    import argparse
+    from services.UserAuth import UserAuthentication
+    from services.database import close_all
+    from services.logCRUD import start_audit_writer, stop_audit_writer
+    from services.schema import ensure_schema
+    from services.session_manager import start_session_sweeper, stop_session_sweeper
+    from services.instrumentation import configure_from_env, stop_metrics_exporter
+
+    parser = argparse.ArgumentParser(description="Serve the urban mobility operations over HTTP/JSON")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    args = parser.parse_args()
+
+    configure_from_env()
+    conn = get_connection(args.db)
+    start_audit_writer(args.db)
+    ensure_schema(conn)
+    start_session_sweeper(args.db)
+    UserAuthentication(conn)  # creates the super admin on a fresh database
+
+    api = ApiServer(args.db, args.workers)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        api.close()
+        stop_session_sweeper()
+        stop_metrics_exporter()
+        stop_audit_writer()
+        close_all()
+
+
+if __name__ == "__main__":
+    main()
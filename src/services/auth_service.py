@@ -0,0 +1,137 @@
+import re
+from datetime import datetime
+from typing import Optional
+from models.user import User
+from modelEncryption.userEncryption import row_to_user, verify_password, hash_password, user_to_encrypted_row
+from services.blind_index import blind_index
+from services.password_hashing import needs_rehash
+from services.database import write_transaction
+from services.errors import Conflict, NotFound, PermissionDenied, ValidationError
+from services.logCRUD import log_action
+from services.role_permissions_config import ROLE_PERMISSIONS
+
+# Pure authentication/user operations shared by the CLI (UserAuthentication) and the
+# HTTP API. An "actor" is the logged-in user as a dict with at least username and role.
+
+USER_COLUMNS = "username, password_hash, role, first_name, last_name, registration_date"
+
+
+def has_permission(role: Optional[str], action: str) -> bool:
+    return ROLE_PERMISSIONS.get((role or "").lower(), {}).get(action, False)
+
+
+def require_permission(actor: dict, action: str):
+    if not actor or not has_permission(actor.get("role"), action):
+        raise PermissionDenied(f"Access denied: you do not have permission to {action.replace('_', ' ')}.")
+
+
+def find_user(conn, username: str) -> Optional[User]:
+    row = conn.execute(
+        f"SELECT {USER_COLUMNS} FROM users WHERE username_bidx = ?",
+        (blind_index("username", username),)
+    ).fetchone()
+    return row_to_user(row) if row else None
+
+
+def authenticate(conn, username: str, password: str) -> Optional[User]:
+    """Return the user if the credentials match, else None (throttling is the caller's job)"""
+    username = username.strip().lower()
+    user = find_user(conn, username)
+    if user is None or not verify_password(password, user.password_hash):
+        return None
+    if needs_rehash(user.password_hash):
+        # Only applies if the hash is still the one just verified (no concurrent password change)
+        old_hash, user.password_hash = user.password_hash, hash_password(password)
+        write_transaction(lambda c: c.execute(
+            "UPDATE users SET password_hash = ? WHERE username_bidx = ? AND password_hash = ?",
+            (user.password_hash, blind_index("username", username), old_hash)), conn)
+    return user
+
+
+def validate_username(username: str) -> bool:
+    return bool(username) and bool(re.match(r"^[a-zA-Z_][\w.'-]{7,9}$", username))
+
+
+def validate_password(password: str):
+    if not password:
+        return False, "Password cannot be empty"
+    if len(password) < 12 or len(password) > 30:
+        return False, "Password must be between 12-30 characters"
+    if not re.search(r"[a-z]", password):
+        return False, "Password must contain at least one lowercase letter"
+    if not re.search(r"[A-Z]", password):
+        return False, "Password must contain at least one uppercase letter"
+    if not re.search(r"[0-9]", password):
+        return False, "Password must contain at least one digit"
+    if not re.search(r"[~!@#$%&_\-+=`|\\(){}\[\]:;'<>,.?/]", password):
+        return False, "Password must contain at least one special character"
+    return True, "Password is valid"
+
+
+def allowed_roles(actor: dict) -> list:
+    roles = []
+    if has_permission(actor.get("role"), "create_engineer"):
+        roles.append("engineer")
+    if has_permission(actor.get("role"), "create_sysadmin"):
+        roles.append("sysadmin")
+    return roles
+
+
+def create_user(conn, actor: dict, username: str, password: str, role: str,
+                first_name: str, last_name: str) -> User:
+    username = username.strip().lower()
+    if role not in allowed_roles(actor):
+        raise PermissionDenied(f"Access denied: you cannot create users with role '{role}'.")
+    if not validate_username(username):
+        raise ValidationError("username", "Must be 8-10 characters, start with letter/underscore, and use only valid characters.")
+    is_valid, message = validate_password(password)
+    if not is_valid:
+        raise ValidationError("password", message)
+    for field, name in (("first_name", first_name), ("last_name", last_name)):
+        if not name or not name.replace(' ', '').replace('-', '').isalpha():
+            raise ValidationError(field, "Names must contain only letters, spaces, and hyphens.")
+    if find_user(conn, username) is not None:
+        raise Conflict("Username already exists.")
+
+    user = User(
+        username=username,
+        password_hash=hash_password(password),
+        role=role,
+        first_name=first_name,
+        last_name=last_name,
+        registration_date=datetime.now()
+    )
+    write_transaction(lambda c: c.execute(f"""
+        INSERT INTO users ({USER_COLUMNS}, username_bidx)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, user_to_encrypted_row(user) + (blind_index("username", username),)), conn)
+    log_action(actor["username"], f"Created user '{username}' with role '{role}'", suspicious=False)
+    return user
+
+
+def change_password(conn, actor: dict, new_password: str, current_password: str = None,
+                    target_username: str = None, session_token: str = None):
+    """Change the actor's own password (current_password required) or, for admins, another user's.
+    Every session of the user ends, except session_token when actors change their own password."""
+    username = (target_username or actor["username"]).lower()
+    if username != actor["username"]:
+        if actor.get("role") not in ("superadmin", "sysadmin"):
+            raise PermissionDenied("Insufficient permissions.")
+    else:
+        user = find_user(conn, username)
+        if user is None or not verify_password(current_password or "", user.password_hash):
+            log_action(actor["username"], f"Failed password update attempt for {username}", suspicious=True)
+            raise PermissionDenied("Current password is incorrect.")
+    is_valid, message = validate_password(new_password)
+    if not is_valid:
+        raise ValidationError("password", message)
+
+    new_hash = hash_password(new_password)
+    cursor = write_transaction(lambda c: c.execute(
+        "UPDATE users SET password_hash = ? WHERE username_bidx = ?",
+        (new_hash, blind_index("username", username))), conn)
+    if cursor.rowcount == 0:
+        raise NotFound(f"User '{username}' not found.")
+    from services.session_manager import end_user_sessions   # imports this module
+    end_user_sessions(conn, username, keep_token=session_token if username == actor["username"] else None)
+    log_action(actor["username"], f"Password updated for user '{username}'", suspicious=False)
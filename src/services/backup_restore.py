@@ -0,0 +1,581 @@
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from modelEncryption.decode_cache import decode_cache
+from services.auth_service import find_user, has_permission, require_permission
+from services.blind_index import blind_index
+from services.crypto_utils import derive_key
+from services.database import DB_PATH, db_path_of, get_connection, write_transaction
+from services.errors import Conflict, NotFound, PermissionDenied, ServiceError, ValidationError
+from services.fleet_snapshot import reset_fleet_snapshot
+from services.logCRUD import flush_audit_log, log_action
+from services.spatial_index import reset_spatial_index
+
+# Online backups.
+# A snapshot is taken with SQLite's backup API in steps of STEP_PAGES pages on a dedicated
+# connection that pins one read transaction for the whole copy: in WAL mode operators keep
+# writing, and the copy never restarts because of their commits (the WAL just grows until
+# the snapshot is released).
+# The snapshot is then split into pages and stored in a zip archive (deflate):
+#   manifest.json  kind, parent, page size/count, SHA-256 of every entry and of the database
+#   pages.idx      16-byte BLAKE2b digest of every page, to diff the next backup against
+#   pages.bin      (4-byte page number, page) records for the pages this archive carries
+# A full backup carries every page, a differential the pages changed since the last full one,
+# an incremental the pages changed since the previous backup of any kind.
+# Restore streams the chain (full, then each later archive) into a scratch file, checks every
+# checksum and PRAGMA quick_check, and only then copies it over the live database.
+#
+#   python -m services.backup_restore backup --kind incremental | list | verify NAME
+
+STEP_PAGES = 1024           # pages copied per backup step
+STEP_PAUSE = 0.005          # seconds between steps, leaves I/O to the operators
+COMPRESS_LEVEL = 6
+ARCHIVE_SUFFIX = ".umbak"
+FORMAT_VERSION = 1
+DIGEST_SIZE = 16
+PAGE_HEADER = struct.Struct(">I")
+KINDS = ("full", "differential", "incremental")
+RESTORE_CODE_TTL = timedelta(hours=24)
+RESTORE_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+_backup_lock = threading.Lock()
+
+
+def default_backup_dir(db_path: str = None) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path or DB_PATH)), "backups")
+
+
+def page_digest(page: bytes) -> bytes:
+    return hashlib.blake2b(page, digest_size=DIGEST_SIZE).digest()
+
+
+def _iter_pages(path: str, page_size: int):
+    with open(path, "rb") as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield page
+
+
+def _remove_scratch(path: str):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+# --- archives -------------------------------------------------------------------
+
+def read_manifest(path: str) -> dict:
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+    manifest["name"] = os.path.basename(path)
+    return manifest
+
+
+def list_backups(backup_dir: str = None) -> List[dict]:
+    """Manifests of every readable archive, oldest first"""
+    backup_dir = backup_dir or default_backup_dir()
+    if not os.path.isdir(backup_dir):
+        return []
+    manifests = []
+    for name in os.listdir(backup_dir):
+        if not name.endswith(ARCHIVE_SUFFIX):
+            continue
+        try:
+            manifests.append(read_manifest(os.path.join(backup_dir, name)))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            print(f"⚠️ Skipping unreadable backup archive {name}")
+    return sorted(manifests, key=lambda m: m["created"])
+
+
+def _page_digests(path: str, manifest: dict) -> bytes:
+    with zipfile.ZipFile(path) as zf:
+        digests = zf.read("pages.idx")
+    if hashlib.sha256(digests).hexdigest() != manifest["files"]["pages.idx"]:
+        raise ServiceError(f"Backup {manifest['name']} is corrupt (pages.idx checksum mismatch).")
+    return digests
+
+
+def _chain(manifest: dict, manifests: List[dict]) -> List[dict]:
+    """The archives to apply for `manifest`, full backup first"""
+    by_id = {m["id"]: m for m in manifests}
+    chain = [manifest]
+    while chain[-1]["parent"] is not None:
+        parent = by_id.get(chain[-1]["parent"]["id"])
+        if parent is None:
+            raise ServiceError(f"Backup {chain[-1]['name']} depends on {chain[-1]['parent']['name']}, which is missing.")
+        chain.append(parent)
+    return chain[::-1]
+
+
+def _snapshot(db_path: str, dest_path: str, progress: Callable = None) -> int:
+    """Copy a consistent snapshot of db_path to dest_path in steps; returns the page size"""
+    source = sqlite3.connect(db_path, isolation_level=None)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()   # pins the read snapshot
+
+        def step(status, remaining, total):
+            if progress:
+                progress("snapshot", total - remaining, total)
+            time.sleep(STEP_PAUSE)
+
+        source.backup(dest, pages=STEP_PAGES, progress=step)
+        source.execute("COMMIT")
+        return dest.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        dest.close()
+        source.close()
+
+
+def write_backup(db_path: str = None, kind: str = "full", backup_dir: str = None,
+                 created_by: str = "SYSTEM", progress: Callable = None) -> dict:
+    """Take a backup of db_path and return its manifest; differential/incremental fall back to full without a parent"""
+    if kind not in KINDS:
+        raise ValidationError("kind", f"Must be one of {', '.join(KINDS)}")
+    db_path = db_path or DB_PATH
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    if not _backup_lock.acquire(blocking=False):
+        raise Conflict("A backup is already running.")
+    try:
+        os.makedirs(backup_dir, exist_ok=True)
+        started = time.monotonic()
+        existing = list_backups(backup_dir)
+        parent = None
+        if kind == "incremental" and existing:
+            parent = existing[-1]
+        elif kind == "differential":
+            parent = next((m for m in reversed(existing) if m["kind"] == "full"), None)
+        if parent is None:
+            kind = "full"
+        parent_digests = _page_digests(os.path.join(backup_dir, parent["name"]), parent) if parent else b""
+
+        created = datetime.now()
+        backup_id = uuid.uuid4().hex
+        name = f"backup-{created:%Y%m%d-%H%M%S}-{kind}-{backup_id[:8]}{ARCHIVE_SUFFIX}"
+        scratch = os.path.join(backup_dir, f".snapshot-{backup_id}.db")
+        part = os.path.join(backup_dir, name + ".part")
+        try:
+            page_size = _snapshot(db_path, scratch, progress)
+            page_count = os.path.getsize(scratch) // page_size
+            digests = bytearray()
+            db_hash, pages_hash = hashlib.sha256(), hashlib.sha256()
+            stored = 0
+            with zipfile.ZipFile(part, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+                with zf.open("pages.bin", "w", force_zip64=True) as out:
+                    for page_no, page in enumerate(_iter_pages(scratch, page_size), start=1):
+                        digest = page_digest(page)
+                        digests += digest
+                        db_hash.update(page)
+                        offset = (page_no - 1) * DIGEST_SIZE
+                        if parent_digests[offset:offset + DIGEST_SIZE] == digest:
+                            continue
+                        record = PAGE_HEADER.pack(page_no) + page
+                        out.write(record)
+                        pages_hash.update(record)
+                        stored += 1
+                        if progress and page_no % STEP_PAGES == 0:
+                            progress("archive", page_no, page_count)
+                zf.writestr("pages.idx", bytes(digests))
+                manifest = {
+                    "format": FORMAT_VERSION,
+                    "id": backup_id,
+                    "kind": kind,
+                    "created": created.isoformat(),
+                    "created_by": created_by,
+                    "parent": {"id": parent["id"], "name": parent["name"]} if parent else None,
+                    "page_size": page_size,
+                    "page_count": page_count,
+                    "pages_stored": stored,
+                    "db_sha256": db_hash.hexdigest(),
+                    "files": {
+                        "pages.bin": pages_hash.hexdigest(),
+                        "pages.idx": hashlib.sha256(digests).hexdigest(),
+                    },
+                }
+                zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+            os.replace(part, os.path.join(backup_dir, name))
+        finally:
+            _remove_scratch(scratch)
+            if os.path.exists(part):
+                os.remove(part)
+        manifest["name"] = name
+        manifest["archive_bytes"] = os.path.getsize(os.path.join(backup_dir, name))
+        manifest["seconds"] = time.monotonic() - started
+        return manifest
+    finally:
+        _backup_lock.release()
+
+
+def _assemble(chain: List[dict], backup_dir: str, dest_path: str, progress: Callable = None):
+    """Stream the chain's pages into dest_path and verify every checksum"""
+    target = chain[-1]
+    page_size = target["page_size"]
+    record_size = PAGE_HEADER.size + page_size
+    with open(dest_path, "wb") as dest:
+        for manifest in chain:
+            if manifest["format"] != FORMAT_VERSION or manifest["page_size"] != page_size:
+                raise ServiceError(f"Backup {manifest['name']} has an incompatible format or page size.")
+            pages_hash = hashlib.sha256()
+            with zipfile.ZipFile(os.path.join(backup_dir, manifest["name"])) as zf, zf.open("pages.bin") as pages:
+                applied = 0
+                while True:
+                    record = pages.read(record_size)
+                    if not record:
+                        break
+                    if len(record) != record_size:
+                        raise ServiceError(f"Backup {manifest['name']} is truncated.")
+                    pages_hash.update(record)
+                    page_no = PAGE_HEADER.unpack_from(record)[0]
+                    dest.seek((page_no - 1) * page_size)
+                    dest.write(record[PAGE_HEADER.size:])
+                    applied += 1
+                    if progress and applied % STEP_PAGES == 0:
+                        progress(f"restore {manifest['name']}", applied, manifest["pages_stored"])
+            if pages_hash.hexdigest() != manifest["files"]["pages.bin"]:
+                raise ServiceError(f"Backup {manifest['name']} is corrupt (pages.bin checksum mismatch).")
+        dest.truncate(target["page_count"] * page_size)
+
+    db_hash = hashlib.sha256()
+    for page in _iter_pages(dest_path, page_size):
+        db_hash.update(page)
+    if db_hash.hexdigest() != target["db_sha256"]:
+        raise ServiceError(f"Restored database does not match the checksum of {target['name']}.")
+    check = sqlite3.connect(f"file:{dest_path}?immutable=1", uri=True)
+    try:
+        if check.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            raise ServiceError(f"Backup {target['name']} fails the SQLite integrity check.")
+    finally:
+        check.close()
+
+
+def verify_backup(name: str, backup_dir: str = None, progress: Callable = None) -> dict:
+    """Rebuild the backup into a scratch file and check it, without touching the live database"""
+    backup_dir = backup_dir or default_backup_dir()
+    manifests = list_backups(backup_dir)
+    target = next((m for m in manifests if m["name"] == name), None)
+    if target is None:
+        raise NotFound(f"Backup {name} not found.")
+    scratch = os.path.join(backup_dir, f".verify-{uuid.uuid4().hex}.db")
+    try:
+        _assemble(_chain(target, manifests), backup_dir, scratch, progress)
+    finally:
+        _remove_scratch(scratch)
+    return target
+
+
+# --- restore codes --------------------------------------------------------------
+
+def ensure_restore_codes(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS restore_codes (
+            code_hash TEXT PRIMARY KEY,
+            backup_name TEXT NOT NULL,
+            username_bidx TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            used_at TEXT,
+            revoked INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.commit()
+
+
+def _code_hash(code: str) -> str:
+    normalized = code.replace("-", "").replace(" ", "").upper()
+    return hmac.new(derive_key("restore-code"), normalized.encode(), hashlib.sha256).hexdigest()
+
+
+def generate_restore_code(conn, actor: dict, backup_name: str, username: str, backup_dir: str = None) -> str:
+    """Single-use code letting one system administrator restore one backup"""
+    require_permission(actor, "generate_restore_code")
+    if not any(m["name"] == backup_name for m in list_backups(backup_dir)):
+        raise NotFound(f"Backup {backup_name} not found.")
+    user = find_user(conn, username)
+    if user is None or user.role != "sysadmin":
+        raise ValidationError("username", "Restore codes can only be issued to system administrators.")
+
+    raw = "".join(secrets.choice(RESTORE_CODE_ALPHABET) for _ in range(12))
+    code = "-".join(raw[i:i + 4] for i in range(0, 12, 4))
+    now = datetime.now()
+    write_transaction(lambda c: c.execute("""
+        INSERT INTO restore_codes (code_hash, backup_name, username_bidx, created_at, expires_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (_code_hash(code), backup_name, blind_index("username", username),
+          now.isoformat(), (now + RESTORE_CODE_TTL).isoformat())), conn)
+    log_action(actor["username"], f"Generated restore code for {backup_name} ({username})", suspicious=False)
+    return code
+
+
+def revoke_restore_code(conn, actor: dict, code: str):
+    require_permission(actor, "generate_restore_code")
+    cursor = write_transaction(lambda c: c.execute(
+        "UPDATE restore_codes SET revoked = 1 WHERE code_hash = ? AND used_at IS NULL AND revoked = 0",
+        (_code_hash(code),)), conn)
+    if cursor.rowcount != 1:
+        raise NotFound("No unused restore code matches.")
+    log_action(actor["username"], "Revoked a restore code", suspicious=False)
+
+
+def _consume_restore_code(conn, actor: dict, code: str, backup_name: str) -> tuple:
+    """Mark the code used (atomically, so it works once even under concurrent attempts); returns its row"""
+    code_hash = _code_hash(code or "")
+    now = datetime.now().isoformat()
+
+    def consume(c):
+        cursor = c.execute("""
+            UPDATE restore_codes SET used_at = ?
+            WHERE code_hash = ? AND backup_name = ? AND username_bidx = ?
+              AND used_at IS NULL AND revoked = 0 AND expires_at > ?
+        """, (now, code_hash, backup_name, blind_index("username", actor["username"]), now))
+        if cursor.rowcount != 1:
+            return None
+        return c.execute("SELECT * FROM restore_codes WHERE code_hash = ?", (code_hash,)).fetchone()
+
+    row = write_transaction(consume, conn)
+    if row is None:
+        log_action(actor["username"], f"Rejected restore code for {backup_name}", suspicious=True)
+        raise PermissionDenied("Invalid, expired or already used restore code.")
+    return row
+
+
+# --- service entry points -------------------------------------------------------
+
+def backup(conn, actor: dict, kind: str = "full", backup_dir: str = None, progress: Callable = None) -> dict:
+    require_permission(actor, "create_backup")
+    try:
+        manifest = write_backup(db_path_of(conn), kind, backup_dir, actor["username"], progress)
+    except ServiceError:
+        raise
+    except Exception as e:
+        log_action(actor["username"], f"Backup failed: {e}", suspicious=True)
+        raise
+    log_action(actor["username"], f"Created {manifest['kind']} backup {manifest['name']}", suspicious=False)
+    return manifest
+
+
+def _after_restore(conn):
+    """Bring the restored schema up to this version and drop every in-memory copy of the old data"""
+    from services.schema import ensure_schema
+    from services.session_manager import clear_cache
+
+    # The backup's user_version says which steps it has had, but its rows may predate backfills
+    ensure_schema(conn, force=True)
+    clear_cache()
+    decode_cache.clear()
+    reset_spatial_index()
+    reset_fleet_snapshot()
+
+
+def restore(conn, actor: dict, name: str, code: str = None, backup_dir: str = None,
+            progress: Callable = None) -> dict:
+    """Replace the live database with backup `name`; system administrators need a restore code for it"""
+    require_permission(actor, "restore_backup")
+    backup_dir = backup_dir or default_backup_dir(db_path_of(conn))
+    manifests = list_backups(backup_dir)
+    target = next((m for m in manifests if m["name"] == name), None)
+    if target is None:
+        raise NotFound(f"Backup {name} not found.")
+    chain = _chain(target, manifests)
+    code_row = None
+    if has_permission(actor.get("role"), "use_restore_code"):
+        code_row = _consume_restore_code(conn, actor, code, name)
+
+    started = time.monotonic()
+    live_sessions = conn.execute("SELECT token_hash, username_bidx, created_at, expires_at FROM sessions").fetchall()
+    scratch = os.path.join(backup_dir, f".restore-{uuid.uuid4().hex}.db")
+    try:
+        _assemble(chain, backup_dir, scratch, progress)
+        flush_audit_log()
+        source = sqlite3.connect(f"file:{scratch}?immutable=1", uri=True)
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            source.backup(conn)
+        finally:
+            source.close()
+    except Exception as e:
+        log_action(actor["username"], f"Restore of {name} failed: {e}", suspicious=True)
+        raise
+    finally:
+        _remove_scratch(scratch)
+
+    _after_restore(conn)
+    if code_row is not None:
+        # The restored restore_codes table predates this use; record it again so the code stays spent
+        write_transaction(lambda c: c.execute(
+            "INSERT OR REPLACE INTO restore_codes VALUES (?, ?, ?, ?, ?, ?, ?)", code_row), conn)
+
+    def keep_sessions(c):
+        # Logins are not part of the data being restored; sessions of users the backup lacks lapse on their next check
+        c.execute("DELETE FROM sessions")
+        c.executemany("INSERT INTO sessions (token_hash, username_bidx, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                      live_sessions)
+    write_transaction(keep_sessions, conn)
+    log_action(actor["username"], f"Restored backup {name}", suspicious=False)
+    target["seconds"] = time.monotonic() - started
+    return target
+
+
+# --- menu -----------------------------------------------------------------------
+
+def _print_progress():
+    last = {}
+
+    def progress(stage, done, total):
+        percent = int(done * 100 / total) if total else 100
+        if last.get(stage, -10) + 10 <= percent:
+            last[stage] = percent
+            print(f"  {stage}: {percent}%")
+    return progress
+
+
+def _choose_backup(backup_dir: str = None) -> Optional[dict]:
+    manifests = list_backups(backup_dir)[::-1][:20]
+    if not manifests:
+        print("No backups found.")
+        return None
+    for i, m in enumerate(manifests, start=1):
+        print(f"{i:>2}. {m['name']} | {m['kind']} | {m['created'][:19]} | {m['pages_stored']}/{m['page_count']} pages")
+    while True:
+        choice = input("Backup number (empty to cancel): ").strip()
+        if not choice:
+            return None
+        if choice.isdigit() and 1 <= int(choice) <= len(manifests):
+            return manifests[int(choice) - 1]
+        print("Invalid choice.")
+
+
+def create_backup(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("create_backup"):
+        print("Access denied: you do not have permission to create backups.")
+        return
+
+    while True:
+        choice = input("Backup type: 1) Full  2) Differential (since last full)  3) Incremental (since last backup): ").strip()
+        if choice in ("1", "2", "3"):
+            break
+        print("Choose 1, 2 or 3.")
+    kind = KINDS[int(choice) - 1]
+
+    try:
+        manifest = backup(conn, auth.get_current_user(), kind, progress=_print_progress())
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception:
+        print("Backup failed.")
+        return
+    if manifest["kind"] != kind:
+        print(f"No earlier backup to build on, a {manifest['kind']} backup was made instead.")
+    print(f"Backup created: {manifest['name']} ({manifest['pages_stored']}/{manifest['page_count']} pages, "
+          f"{manifest['archive_bytes'] / 1024:.0f} KiB, {manifest['seconds']:.1f}s)")
+
+
+def restore_backup(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("restore_backup"):
+        print("Access denied: you do not have permission to restore backups.")
+        return
+
+    manifest = _choose_backup()
+    if manifest is None:
+        return
+    code = None
+    if auth.can("use_restore_code"):
+        code = input("Restore code: ").strip()
+    confirm = input(f"Replace the current database with {manifest['name']}? (y/n): ").strip().lower()
+    if confirm != "y":
+        print("Restore cancelled.")
+        return
+
+    try:
+        restored = restore(conn, auth.get_current_user(), manifest["name"], code, progress=_print_progress())
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception:
+        print("Restore failed; the current database was left unchanged.")
+        return
+    print(f"Backup {restored['name']} restored in {restored['seconds']:.1f}s.")
+
+
+def manage_restore_codes(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("generate_restore_code"):
+        print("Access denied: you do not have permission to manage restore codes.")
+        return
+
+    while True:
+        choice = input("Restore codes: 1) Generate  2) Revoke: ").strip()
+        if choice in ("1", "2"):
+            break
+        print("Choose 1 or 2.")
+    actor = auth.get_current_user()
+    try:
+        if choice == "1":
+            manifest = _choose_backup()
+            if manifest is None:
+                return
+            username = input("System administrator username: ").strip()
+            code = generate_restore_code(conn, actor, manifest["name"], username)
+            print(f"Restore code for {username}: {code} (valid {RESTORE_CODE_TTL.total_seconds() / 3600:.0f} hours, single use)")
+        else:
+            revoke_restore_code(conn, actor, input("Restore code to revoke: ").strip())
+            print("Restore code revoked.")
+    except ServiceError as e:
+        print(e)
+
+
+# --- command line (cron) ----------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Online backups of the urban mobility database")
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    parser.add_argument("--dir", default=None, help="backup directory (default: backups/ next to the database)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("backup", help="take a backup")
+    run.add_argument("--kind", choices=KINDS, default="incremental")
+    commands.add_parser("list", help="list backups")
+    verify = commands.add_parser("verify", help="rebuild a backup into a scratch file and check it")
+    verify.add_argument("name")
+    args = parser.parse_args(argv)
+    backup_dir = args.dir or default_backup_dir(args.db)
+
+    try:
+        if args.command == "backup":
+            manifest = write_backup(args.db, args.kind, backup_dir)
+            log_action("SYSTEM", f"Created {manifest['kind']} backup {manifest['name']}", suspicious=False,
+                       conn=get_connection(args.db))
+            print(f"{manifest['name']}: {manifest['pages_stored']}/{manifest['page_count']} pages, "
+                  f"{manifest['archive_bytes']} bytes, {manifest['seconds']:.1f}s")
+        elif args.command == "list":
+            for m in list_backups(backup_dir):
+                parent = m["parent"]["name"] if m["parent"] else "-"
+                print(f"{m['name']}\t{m['kind']}\t{m['created']}\t{m['pages_stored']}/{m['page_count']}\tparent: {parent}")
+        else:
+            manifest = verify_backup(args.name, backup_dir)
+            print(f"{manifest['name']}: OK")
+    except ServiceError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import hashlib
+import hmac
+import sqlite3
+from modelEncryption.sealed_rows import SEALED_COLUMNS, open_fields, sealed_select
+from services.crypto_utils import derive_key
+
+# Fernet tokens are randomized, so "WHERE serial_number = encrypt(x)" can never match.
+# Each searchable encrypted column gets a keyed HMAC digest stored next to it; equality
+# lookups go through that digest column, which SQLite can index like any other TEXT column.
+
+_DIGEST_CHARS = 32  # 128-bit truncated HMAC-SHA256, hex encoded
+
+# table -> [(encrypted column, digest column)]
+BLIND_INDEX_COLUMNS = {
+    "users": [("username", "username_bidx")],
+    "scooters": [("serial_number", "serial_bidx")],
+    "travellers": [("first_name", "first_name_bidx"), ("last_name", "last_name_bidx")],
+    "log_entries": [("username", "username_bidx")],
+}
+
+# (index name, table, columns, unique)
+BLIND_INDEXES = [
+    ("idx_users_username_bidx", "users", "username_bidx", True),
+    ("idx_scooters_serial_bidx", "scooters", "serial_bidx", True),
+    ("idx_travellers_name_bidx", "travellers", "last_name_bidx, first_name_bidx", False),
+    ("idx_log_entries_username_bidx", "log_entries", "username_bidx, timestamp", False),
+]
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def normalize(value: str) -> str:
+    return str(value).strip().lower()
+
+
+def blind_index(field: str, value: str) -> str:
+    """Keyed digest of a plaintext value; the field name is mixed in so equal values in different columns differ"""
+    msg = f"{field}\x00{normalize(value)}".encode()
+    return hmac.new(derive_key("blind-index"), msg, hashlib.sha256).hexdigest()[:_DIGEST_CHARS]
+
+
+def _existing_columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _backfill(conn, table: str, enc_col: str, bidx_col: str) -> int:
+    """Fill missing digests for one column in batches, return the number of rows updated"""
+    position = SEALED_COLUMNS[table].index(enc_col)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, {sealed_select(table)} FROM {table} WHERE {bidx_col} IS NULL")
+    updated = 0
+    while True:
+        rows = cursor.fetchmany(BACKFILL_BATCH_SIZE)
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            row_id = row[0]
+            try:
+                params.append((blind_index(enc_col, open_fields(table, row[1:])[position]), row_id))
+            except Exception:
+                print(f"⚠️ Could not decrypt {table}.{enc_col} for row {row_id}, skipping blind index")
+        conn.executemany(f"UPDATE {table} SET {bidx_col} = ? WHERE id = ?", params)
+        updated += len(params)
+    return updated
+
+
+def ensure_blind_indexes(conn) -> int:
+    """Add digest columns and indexes if missing and backfill existing rows (idempotent)"""
+    updated = 0
+    for table, columns in BLIND_INDEX_COLUMNS.items():
+        existing = _existing_columns(conn, table)
+        for enc_col, bidx_col in columns:
+            if bidx_col not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {bidx_col} TEXT")
+            updated += _backfill(conn, table, enc_col, bidx_col)
+
+    for name, table, cols, unique in BLIND_INDEXES:
+        try:
+            conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table}({cols})")
+        except sqlite3.IntegrityError:
+            # Older databases may already hold duplicates the encrypted UNIQUE constraint never caught
+            print(f"⚠️ Duplicate values in {table}({cols}), creating non-unique index {name}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({cols})")
+
+    conn.commit()
+    return updated
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Tuple
+from models.scooter import Scooter
+from models.traveller import Traveller
+from modelEncryption.bulk_decode import decode_rows
+from modelEncryption.scooterEncryption import scooter_to_encrypted_row
+from modelEncryption.travellerEncryption import traveller_to_encrypted_row
+from services.auth_service import require_permission
+from services.blind_index import blind_index
+from services.charging import soc_bounds
+from services.database import write_transaction
+from services.errors import ServiceError, ValidationError
+from services.logCRUD import log_action
+from services.maintenance import next_due
+from services.search_index import ID_CHUNK_SIZE, insert_grams, row_grams, scooter_search_texts, traveller_search_texts
+from services.spatial_index import cell_bidx
+from services.validators import SCOOTER_RULES, TRAVELLER_RULES, validate_fields
+
+# Bulk CSV/JSONL import of scooters and travellers.
+# Records are streamed from the file and validated with the same rules as the prompts.
+# Each batch is encrypted (Fernet, blind indexes, search grams) on the shared bulk_decode
+# pool, then written with executemany in one transaction, so a failure loses at most one batch.
+# Ids are assigned up front inside that transaction so the search grams can go in the same way:
+# one past both MAX(id) and the AUTOINCREMENT sequence, so ids of deleted rows are never reused.
+# Unique keys are checked again under the transaction's write lock, so a row another process
+# inserted meanwhile is reported as a duplicate rather than failing the batch.
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class EntitySpec:
+    table: str
+    permission: str
+    rules: dict
+    columns: str
+    build: Callable            # validated fields -> model
+    encode: Callable           # model -> (row without id, search gram digests, unique key or None)
+    unique_column: Optional[str] = None   # blind index column that must not repeat
+    duplicate_message: str = ""
+
+
+def _encode_scooter(s: Scooter):
+    serial_bidx = blind_index("serial_number", s.serial_number)
+    row = scooter_to_encrypted_row(s)[1:] + (serial_bidx, cell_bidx(s.latitude, s.longitude)) \
+        + soc_bounds(s.target_soc_range) + (s.mileage,) + next_due(s.brand, s.model, s.last_maintenance, s.mileage)
+    grams = row_grams("scooters", scooter_search_texts(s.brand, s.model, s.serial_number, s.latitude, s.longitude))
+    return row, grams, serial_bidx
+
+
+def _encode_traveller(t: Traveller):
+    row = traveller_to_encrypted_row(t)[1:] + (
+        blind_index("first_name", t.first_name), blind_index("last_name", t.last_name))
+    grams = row_grams("travellers", traveller_search_texts(t.first_name, t.last_name, t.city, t.email))
+    return row, grams, None
+
+
+ENTITIES = {
+    "scooters": EntitySpec(
+        table="scooters",
+        permission="create_scooter",
+        rules=SCOOTER_RULES,
+        columns="id, brand, model, serial_number, top_speed, battery_capacity, soc, target_soc_range, "
+                "latitude, longitude, out_of_service, mileage, last_maintenance, in_service_date, "
+                "serial_bidx, geo_cell_bidx, soc_min, soc_max, service_mileage, next_due_date, next_due_mileage",
+        build=lambda fields: Scooter(id=None, in_service_date=datetime.now(), **fields),
+        encode=_encode_scooter,
+        unique_column="serial_bidx",
+        duplicate_message="A scooter with this serial number already exists.",
+    ),
+    "travellers": EntitySpec(
+        table="travellers",
+        permission="add_traveller",
+        rules=TRAVELLER_RULES,
+        columns="id, first_name, last_name, birthday, gender, street_name, house_number, zip_code, city, "
+                "email, mobile_phone, driving_license, registration_date, first_name_bidx, last_name_bidx",
+        build=lambda fields: Traveller(id=None, registration_date=datetime.now(), **fields),
+        encode=_encode_traveller,
+    ),
+}
+
+
+@dataclass
+class ImportResult:
+    entity: str
+    imported: int
+    rejected: int
+    seconds: float
+    reject_report: Optional[str] = None
+
+
+def iter_records(path: str, fmt: str = None) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (line number, record, parse error) from a CSV file with a header row or a JSONL file"""
+    fmt = fmt or ("jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Each line must be a JSON object"
+                continue
+            yield line_no, record, None
+
+
+def _existing_keys(conn, spec: EntitySpec, keys: List[str]) -> set:
+    found = set()
+    for start in range(0, len(keys), ID_CHUNK_SIZE):
+        chunk = keys[start:start + ID_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        found.update(r[0] for r in conn.execute(
+            f"SELECT {spec.unique_column} FROM {spec.table} WHERE {spec.unique_column} IN ({placeholders})", chunk))
+    return found
+
+
+def _next_id(conn, table: str) -> int:
+    """First id AUTOINCREMENT would hand out: past the highest id ever used, not just the highest left"""
+    last = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return max(last, seq[0] if seq else 0) + 1
+
+
+def _insert_batch(conn, spec: EntitySpec, encoded: list) -> List[Optional[int]]:
+    """Insert encoded rows with consecutive new ids; runs inside write_transaction.
+    Returns each row's id, or None if its unique key was taken since the caller checked."""
+    taken = _existing_keys(conn, spec, [enc[2] for enc in encoded]) if spec.unique_column else set()
+    first_id = _next_id(conn, spec.table)
+    assigned, rows = [], []
+    for enc in encoded:
+        if enc[2] in taken:
+            assigned.append(None)
+            continue
+        assigned.append(first_id + len(rows))
+        rows.append((assigned[-1], enc))
+    if rows:
+        placeholders = ", ".join("?" * (len(rows[0][1][0]) + 1))
+        conn.executemany(f"INSERT INTO {spec.table} ({spec.columns}) VALUES ({placeholders})",
+                         ((row_id,) + enc[0] for row_id, enc in rows))
+        insert_grams(conn, spec.table, ((row_id, enc[1]) for row_id, enc in rows))
+    return assigned
+
+
+def import_records(conn, actor: dict, entity: str, path: str, fmt: str = None, report_path: str = None,
+                   batch_size: int = BATCH_SIZE, progress: Callable = None) -> ImportResult:
+    """Validate, encrypt and insert every record of path; rejected rows go to a CSV report"""
+    if entity not in ENTITIES:
+        raise ValidationError("entity", f"Must be one of {', '.join(ENTITIES)}")
+    spec = ENTITIES[entity]
+    require_permission(actor, spec.permission)
+    if not os.path.isfile(path):
+        raise ServiceError(f"File not found: {path}")
+
+    started = time.perf_counter()
+    rejects = []          # (line, field, message)
+    seen_keys = set()
+    imported = 0
+    records = iter_records(path, fmt)
+
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+
+        models, lines = [], []
+        for line_no, record, error in batch:
+            if error:
+                rejects.append((line_no, "", error))
+                continue
+            try:
+                fields = validate_fields(spec.rules, {k: v for k, v in record.items() if k in spec.rules})
+            except ValidationError as e:
+                rejects.append((line_no, e.field, e.message))
+                continue
+            models.append(spec.build(fields))
+            lines.append(line_no)
+
+        failed = {}
+        encoded = decode_rows(models, spec.encode, on_error=lambda i, _, e: failed.setdefault(i, e))
+
+        existing = set()
+        if spec.unique_column:
+            existing = _existing_keys(conn, spec, [enc[2] for enc in encoded if enc is not None])
+        keep = []
+        for i, enc in enumerate(encoded):
+            if enc is None:
+                rejects.append((lines[i], "", f"Could not encrypt record: {failed.get(i)}"))
+                continue
+            key = enc[2]
+            if key is not None:
+                if key in existing or key in seen_keys:
+                    rejects.append((lines[i], "", spec.duplicate_message))
+                    continue
+                seen_keys.add(key)
+            keep.append((lines[i], models[i], enc))
+
+        if keep:
+            ids = write_transaction(lambda c: _insert_batch(c, spec, [enc for _, _, enc in keep]), conn)
+            for row_id, (line_no, model, _) in zip(ids, keep):
+                if row_id is None:
+                    rejects.append((line_no, "", spec.duplicate_message))
+                    continue
+                model.id = row_id
+                imported += 1
+        if progress:
+            progress(imported, len(rejects))
+
+    if rejects:
+        report_path = report_path or f"{path}.rejects.csv"
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "field", "error"])
+            writer.writerows(sorted(rejects))
+    else:
+        report_path = None
+
+    log_action(actor["username"],
+               f"Bulk import of {entity} from {os.path.basename(path)}: {imported} imported, {len(rejects)} rejected",
+               suspicious=False)
+    return ImportResult(entity, imported, len(rejects), time.perf_counter() - started, report_path)
+
+
+def bulk_import(conn, auth):
+    if not auth.require_authentication():
+        return
+    choices = [e for e, spec in ENTITIES.items() if auth.can(spec.permission)]
+    if not choices:
+        print("Access denied: you do not have permission to import data.")
+        return
+
+    print("=== Bulk Import === (CSV with header row, or JSONL)")
+    while True:
+        entity = input(f"Import what? ({'/'.join(choices)}): ").strip().lower()
+        if entity == "cancel":
+            return
+        if entity in choices:
+            break
+        print("Invalid choice.")
+
+    path = input("File path: ").strip()
+    if not path or path.lower() == "cancel":
+        return
+
+    def show_progress(done, rejected):
+        print(f"\r{done} imported, {rejected} rejected...", end="", flush=True)
+
+    try:
+        result = import_records(conn, auth.get_current_user(), entity, path, progress=show_progress)
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception as e:
+        print(f"\nImport failed: {e}")
+        log_action(auth.get_current_user()["username"], f"Bulk import of {entity} failed: {e}", suspicious=True)
+        return
+
+    print(f"\nImported {result.imported} {entity} in {result.seconds:.1f}s.")
+    if result.reject_report:
+        print(f"{result.rejected} row(s) rejected, see {result.reject_report}")
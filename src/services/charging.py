@@ -0,0 +1,119 @@
+from typing import List, Tuple
+from models.scooter import Scooter
+from modelEncryption.scooterEncryption import rows_to_scooters
+from services.auth_service import require_permission
+from services.errors import ServiceError, ValidationError
+from services.logCRUD import log_action
+from services.search_index import fetch_rows_by_id
+
+# Target SoC bounds as plaintext integer columns, so "which scooters need charging" never
+# parses target_soc_range. Partial expression indexes over the deficit (soc_min - soc) and
+# excess (soc - soc_max) of in-service scooters answer the report as an index range scan,
+# already sorted; only the rows on the returned page are decrypted.
+
+BACKFILL_BATCH_SIZE = 1000
+REPORT_LIMIT = 50
+
+MODES = {
+    "below": "soc_min - soc",   # needs charging
+    "above": "soc - soc_max",   # charged above target
+}
+
+
+def soc_bounds(target_soc_range: str) -> Tuple[int, int]:
+    """(min, max) of a validated "20-80" range"""
+    low, high = str(target_soc_range).split("-", 1)
+    return int(low), int(high)
+
+
+def ensure_soc_bounds(conn):
+    """Add soc_min/soc_max, fill them from target_soc_range and create the report indexes"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(scooters)")}
+    for column in ("soc_min", "soc_max"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE scooters ADD COLUMN {column} INTEGER")
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, target_soc_range FROM scooters WHERE soc_min IS NULL OR soc_max IS NULL")
+    while True:
+        rows = cursor.fetchmany(BACKFILL_BATCH_SIZE)
+        if not rows:
+            break
+        updates = []
+        for row_id, target in rows:
+            try:
+                updates.append(soc_bounds(target) + (row_id,))
+            except ValueError:
+                print(f"⚠️ Scooter {row_id} has an invalid target SoC range '{target}', skipped")
+        conn.executemany("UPDATE scooters SET soc_min = ?, soc_max = ? WHERE id = ?", updates)
+
+    for mode, expression in MODES.items():
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_scooters_soc_{mode}
+            ON scooters(({expression}) DESC, id) WHERE out_of_service = 0
+        """)
+    conn.commit()
+
+
+def charging_needed(conn, actor: dict, mode: str = "below", limit: int = REPORT_LIMIT,
+                    offset: int = 0) -> List[Tuple[int, Scooter]]:
+    """(gap in SoC points, Scooter) for in-service scooters outside their target range, largest gap first"""
+    require_permission(actor, "search_scooter")
+    if mode not in MODES:
+        raise ValidationError("mode", f"Must be one of {', '.join(MODES)}")
+    expression = MODES[mode]
+    hits = conn.execute(f"""
+        SELECT id, {expression} FROM scooters INDEXED BY idx_scooters_soc_{mode}
+        WHERE out_of_service = 0 AND {expression} > 0
+        ORDER BY {expression} DESC, id
+        LIMIT ? OFFSET ?
+    """, (limit, offset)).fetchall()
+    scooters = {s.id: s for s in rows_to_scooters(fetch_rows_by_id(conn, "scooters", [i for i, _ in hits])) if s is not None}
+    return [(gap, scooters[i]) for i, gap in hits if i in scooters]
+
+
+def count_charging_needed(conn, mode: str = "below") -> int:
+    expression = MODES[mode]
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM scooters INDEXED BY idx_scooters_soc_{mode}
+        WHERE out_of_service = 0 AND {expression} > 0
+    """).fetchone()[0]
+
+
+def charging_report(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("search_scooter"):
+        print("Access denied: you do not have permission to view scooter reports.")
+        return
+
+    while True:
+        choice = input("Report: 1) Charging needed (below target)  2) Above target: ").strip()
+        if choice in ("1", "2"):
+            break
+        print("Choose 1 or 2.")
+    mode = "below" if choice == "1" else "above"
+    username = auth.get_current_user()["username"]
+
+    try:
+        total = count_charging_needed(conn, mode)
+        hits = charging_needed(conn, auth.get_current_user(), mode)
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception as e:
+        print("Database error while building the report.")
+        log_action(username, f"Charging report failed: {e}", suspicious=True)
+        return
+
+    if not hits:
+        print("All in-service scooters are within their target SoC range.")
+        return
+    label = "Deficit" if mode == "below" else "Excess"
+    print(f"\n{total} in-service scooter(s) {mode} target, largest {label.lower()} first:")
+    for gap, s in hits:
+        print(f"{label}: {gap:>3} | Serial: {s.serial_number} | Brand: {s.brand} | Model: {s.model} | "
+              f"SoC: {s.soc}% | Target: {s.target_soc_range} | Lat: {s.latitude} | Lon: {s.longitude}")
+    if total > len(hits):
+        print(f"... showing the first {len(hits)}.")
+    log_action(username, f"Viewed charging report ({mode} target)", suspicious=False)
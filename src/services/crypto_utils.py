@@ -1,16 +1,186 @@
-from cryptography.fernet import Fernet
+import base64
+import hashlib
+import hmac
+import json
 import os
+import threading
+import time
+from services.instrumentation import timed
+
+# secret.key is the original single key. Once a key rotation has started, secret.keyring takes over:
+#   {"primary": key new tokens are encrypted with,
+#    "decrypt_only": [older (or not yet promoted) keys still accepted by decrypt],
+#    "index_root": key the blind-index and search sub-keys are derived from}
+# index_root never rotates with the Fernet keys, so the digests stored in the database stay valid.
+# On a keyring created from secret.key it is that key: secret.key stays in use for the digests even
+# after a finished rotation has retired it as an encryption key.
+# Running processes pick up keyring changes within KEYRING_CHECK_INTERVAL seconds.
+#
+# seal()/unseal() are the one-blob-per-row alternative to a Fernet token per field:
+#   version (1 byte) | key id (8 bytes) | nonce (12 bytes) | AES-256-GCM ciphertext + tag
+# The AES key is derived from the keyring key named by the id, and the header is part of the
+# associated data. No base64 and a single IV/tag per row, and rotation can tell from the header
+# alone whether a blob is already under the primary key.
+#
+# Nothing is read or imported at import time: the keyring file is read on first use, and the
+# cryptography package is imported and the ciphers built on the first encrypt/decrypt/seal/unseal.
+# A process that only needs the derived index keys (blind indexes, a super admin check) never
+# loads cryptography at all.
+
+KEY_PATH = os.path.join(os.path.dirname(__file__), "secret.key")
+KEYRING_PATH = os.path.join(os.path.dirname(__file__), "secret.keyring")
+KEYRING_CHECK_INTERVAL = 5.0
+SEALED_VERSION = 2
+_NONCE_SIZE = 12
+_HEADER_SIZE = 1 + 8
 
 
 def load_key():
-    key_path = os.path.join(os.path.dirname(__file__), "secret.key")
-    with open(key_path, "rb") as f:
+    with open(KEY_PATH, "rb") as f:
         return f.read()
 
-fernet = Fernet(load_key())
 
+def load_keyring() -> dict:
+    if os.path.exists(KEYRING_PATH):
+        with open(KEYRING_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    key = load_key().decode()
+    return {"primary": key, "decrypt_only": [], "index_root": key}
+
+
+def save_keyring(keyring: dict):
+    """Atomically replace secret.keyring (readable by the owner only)"""
+    part = KEYRING_PATH + ".part"
+    with open(os.open(part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+        json.dump(keyring, f, indent=2)
+    os.replace(part, KEYRING_PATH)
+    refresh_keys(force=True)
+
+
+def key_id(key: str) -> str:
+    """Short fingerprint naming a key in progress records and logs"""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _keyring_mtime():
+    try:
+        return os.stat(KEYRING_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class InvalidToken(Exception):
+    """Stands in for cryptography.fernet.InvalidToken until the ciphers are built, which replaces it"""
+
+
+def _build(keyring: dict):
+    """(MultiFernet, {key id: AESGCM}, primary key id) for a keyring; imports cryptography"""
+    global InvalidToken, InvalidTag
+    from cryptography.exceptions import InvalidTag
+    from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    keys = [keyring["primary"]] + keyring["decrypt_only"]
+    sealers = {bytes.fromhex(key_id(k)): AESGCM(hmac.new(base64.urlsafe_b64decode(k), b"sealed-row",
+                                                         hashlib.sha256).digest()) for k in keys}
+    return MultiFernet([Fernet(k) for k in keys]), sealers, bytes.fromhex(key_id(keyring["primary"]))
+
+
+InvalidTag = InvalidToken  # likewise for cryptography.exceptions.InvalidTag
+_keyring = None            # parsed keyring, read on first use
+_ciphers = None            # _build(_keyring), built on first use
+_derived = {}              # purpose -> derive_key result
+_loaded_mtime = None
+_checked = 0.0
+_reload_lock = threading.Lock()
+
+
+def refresh_keys(force: bool = False) -> bool:
+    """Reload the keyring if its file changed; returns True when the keys were replaced"""
+    global _ciphers, _keyring, _loaded_mtime, _checked
+    if _keyring is not None and not force and time.monotonic() - _checked < KEYRING_CHECK_INTERVAL:
+        return False
+    with _reload_lock:
+        _checked = time.monotonic()
+        mtime = _keyring_mtime()
+        if _keyring is not None and mtime == _loaded_mtime and not force:
+            return False
+        _keyring = load_keyring()
+        _ciphers = None
+        _loaded_mtime = mtime
+        return True
+
+
+def _current_ciphers():
+    """The ciphers of the current keyring, building them if the keyring is new"""
+    global _ciphers
+    refresh_keys()
+    ciphers = _ciphers
+    if ciphers is None:
+        with _reload_lock:
+            if _ciphers is None:
+                _ciphers = _build(_keyring)
+            ciphers = _ciphers
+    return ciphers
+
+
+def current_key_id() -> str:
+    refresh_keys()
+    return key_id(_keyring["primary"])
+
+
+@timed("crypto.encrypt", size=len)
 def encrypt(text: str) -> str:
-    return fernet.encrypt(text.encode()).decode()
+    return _current_ciphers()[0].encrypt(text.encode()).decode()
 
+@timed("crypto.decrypt", size=len)
 def decrypt(token: str) -> str:
-    return fernet.decrypt(token.encode()).decode()
+    fernet = _current_ciphers()[0]
+    try:
+        return fernet.decrypt(token.encode()).decode()
+    except InvalidToken:
+        # The token may come from a key promoted by another process since our last check
+        if refresh_keys(force=True):
+            return _current_ciphers()[0].decrypt(token.encode()).decode()
+        raise
+
+def rotate_token(token: str) -> str:
+    """Re-encrypt a token under the primary key (whichever keyring key it was made with)"""
+    return _current_ciphers()[0].rotate(token.encode()).decode()
+
+def derive_key(purpose: str) -> bytes:
+    """Derive a purpose-bound sub-key from the index root (never reuse the Fernet key directly)"""
+    key = _derived.get(purpose)
+    if key is None:
+        if _keyring is None:
+            refresh_keys()
+        # index_root never changes with rotation, so a derived key stays valid for the process
+        key = _derived[purpose] = hmac.new(_keyring["index_root"].encode(), purpose.encode(), hashlib.sha256).digest()
+    return key
+
+@timed("crypto.seal", size=lambda data, context: len(data))
+def seal(data: bytes, context: bytes) -> bytes:
+    """Authenticated blob of data under the primary key; context (e.g. the table name) must match on unseal"""
+    _, sealers, primary_id = _current_ciphers()
+    header = bytes([SEALED_VERSION]) + primary_id
+    nonce = os.urandom(_NONCE_SIZE)
+    return header + nonce + sealers[primary_id].encrypt(nonce, data, header + context)
+
+@timed("crypto.unseal", size=lambda blob, context: len(blob))
+def unseal(blob: bytes, context: bytes) -> bytes:
+    sealers = _current_ciphers()[1]
+    if len(blob) < _HEADER_SIZE + _NONCE_SIZE or blob[0] != SEALED_VERSION:
+        raise InvalidToken
+    header, nonce = blob[:_HEADER_SIZE], blob[_HEADER_SIZE:_HEADER_SIZE + _NONCE_SIZE]
+    sealer = sealers.get(header[1:])
+    if sealer is None and refresh_keys(force=True):
+        sealer = _current_ciphers()[1].get(header[1:])
+    if sealer is None:
+        raise InvalidToken
+    try:
+        return sealer.decrypt(nonce, blob[_HEADER_SIZE + _NONCE_SIZE:], header + context)
+    except InvalidTag:
+        raise InvalidToken
+
+def sealed_with_primary(blob: bytes) -> bool:
+    return blob[1:_HEADER_SIZE] == _current_ciphers()[2]
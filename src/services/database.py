@@ -0,0 +1,130 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable
+from services.instrumentation import InstrumentedConnection
+
+# Owns the SQLite connection lifecycle.
+# Each thread gets its own connection per database file (sqlite3 connections must not be
+# shared between concurrent threads), configured for concurrent use: WAL journaling so
+# readers never block the writer, a busy timeout plus retry with backoff on SQLITE_BUSY,
+# and a larger prepared-statement cache. Connections are InstrumentedConnections, so statement
+# timings are recorded whenever instrumentation is switched on.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "urban_mobility.db")
+
+BUSY_TIMEOUT_MS = 5000
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05      # seconds, doubled per retry with jitter
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",       # safe with WAL: durable at checkpoints, no fsync per commit
+    "cache_size": -64000,          # negative = KiB, i.e. 64 MB page cache
+    "mmap_size": 268435456,        # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": BUSY_TIMEOUT_MS,
+}
+
+_local = threading.local()
+_all_connections = []
+_all_lock = threading.Lock()
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """Open a new connection with the standard PRAGMA settings"""
+    conn = sqlite3.connect(
+        db_path or DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,  # only so close_all() can run at shutdown; each thread uses its own
+        factory=InstrumentedConnection,
+    )
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_connection(db_path: str = None) -> sqlite3.Connection:
+    """The calling thread's pooled connection to db_path, opened on first use"""
+    db_path = db_path or DB_PATH
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = pool[db_path] = connect(db_path)
+        with _all_lock:
+            _all_connections.append(conn)
+    return conn
+
+
+def db_path_of(conn: sqlite3.Connection) -> str:
+    """File behind a connection's main database (None for :memory:)"""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main" and path:
+            return path
+    return None
+
+
+def close_connection(db_path: str = None):
+    """Close the calling thread's connection to db_path"""
+    pool = getattr(_local, "connections", {})
+    conn = pool.pop(db_path or DB_PATH, None)
+    if conn is not None:
+        with _all_lock:
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+        conn.close()
+
+
+def close_all():
+    """Close every pooled connection (process shutdown)"""
+    with _all_lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    getattr(_local, "connections", {}).clear()
+
+
+def is_busy_error(e: Exception) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and (
+        "locked" in str(e) or "busy" in str(e)
+    )
+
+
+def write_transaction(fn: Callable, conn: sqlite3.Connection = None, retries: int = BUSY_RETRIES):
+    """Run fn(conn) in one write transaction and commit; on SQLITE_BUSY roll back and retry with backoff.
+
+    BEGIN IMMEDIATE takes the write lock up front, which avoids the read-to-write upgrade
+    deadlock that a busy handler cannot resolve. If the connection already has an open
+    transaction, fn joins it and the caller stays responsible for committing.
+    """
+    conn = conn or get_connection()
+    if conn.in_transaction:
+        return fn(conn)
+    delay = BUSY_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn)
+            conn.commit()
+            return result
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not is_busy_error(e) or attempt == retries:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
@@ -0,0 +1,174 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Callable
+from models.log_entry import LogEntry
+from models.scooter import Scooter
+from models.traveller import Traveller
+from modelEncryption.logEncryption import iter_rows_to_logentries
+from modelEncryption.scooterEncryption import iter_rows_to_scooters
+from modelEncryption.travellerEncryption import iter_rows_to_travellers
+from services.auth_service import require_permission
+from services.errors import ServiceError, ValidationError
+from services.logCRUD import log_action
+from services.stream_utils import iter_cursor
+
+# Streaming export of decrypted tables to CSV or JSONL, optionally gzip-compressed.
+# Rows are read with fetchmany and decrypted on the bulk_decode pool in order, bypassing the
+# decode cache, so memory stays flat however large the table is. Output goes to a .part file
+# that is renamed into place only once the export has completed.
+
+BATCH_SIZE = 1000
+PROGRESS_EVERY = 10000
+
+
+@dataclass
+class ExportSpec:
+    model: type
+    table: str
+    permission: str
+    query: str
+    decode: Callable    # iter_rows_to_X
+
+
+EXPORTS = {
+    "scooters": ExportSpec(Scooter, "scooters", "export_scooters", "SELECT * FROM scooters ORDER BY id", iter_rows_to_scooters),
+    "travellers": ExportSpec(Traveller, "travellers", "export_travellers", "SELECT * FROM travellers ORDER BY id", iter_rows_to_travellers),
+    "logs": ExportSpec(LogEntry, "log_entries", "export_logs",
+                       "SELECT timestamp, username, activity, additional_info, suspicious FROM log_entries ORDER BY id",
+                       iter_rows_to_logentries),
+}
+
+
+@dataclass
+class ExportResult:
+    entity: str
+    path: str
+    exported: int
+    failed: int
+    seconds: float
+
+
+def _to_record(model) -> dict:
+    return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in asdict(model).items()}
+
+
+@contextmanager
+def _open_output(path: str, compress: bool):
+    """Text stream on a file created readable by its owner only: exports hold decrypted data"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as raw:
+        if compress:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz, \
+                    io.TextIOWrapper(gz, encoding="utf-8", newline="") as out:
+                yield out
+        else:
+            with io.TextIOWrapper(raw, encoding="utf-8", newline="") as out:
+                yield out
+
+
+def export_table(conn, actor: dict, entity: str, path: str, fmt: str = None, compress: bool = None,
+                 workers: int = None, progress: Callable = None) -> ExportResult:
+    """Write every row of entity to path; fmt and compression default from the file name"""
+    if entity not in EXPORTS:
+        raise ValidationError("entity", f"Must be one of {', '.join(EXPORTS)}")
+    spec = EXPORTS[entity]
+    require_permission(actor, spec.permission)
+
+    if compress is None:
+        compress = path.endswith(".gz")
+    base = path[:-3] if path.endswith(".gz") else path
+    fmt = fmt or ("jsonl" if base.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    if fmt not in ("csv", "jsonl"):
+        raise ValidationError("format", "Must be csv or jsonl")
+
+    started = time.perf_counter()
+    total = conn.execute(f"SELECT COUNT(*) FROM {spec.table}").fetchone()[0]
+    failed = []
+    exported = 0
+    part_path = path + ".part"
+
+    cursor = conn.cursor()
+    cursor.execute(spec.query)
+    rows = iter_cursor(cursor, BATCH_SIZE)
+    models = spec.decode(rows, workers=workers, on_error=lambda i, row, e: failed.append(i), cache=False)
+
+    try:
+        with _open_output(part_path, compress) as out:
+            if fmt == "csv":
+                writer = csv.DictWriter(out, fieldnames=[f.name for f in fields(spec.model)])
+                writer.writeheader()
+                write = writer.writerow
+            else:
+                write = lambda record: out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            for model in models:
+                if model is None:
+                    continue
+                write(_to_record(model))
+                exported += 1
+                if progress and exported % PROGRESS_EVERY == 0:
+                    progress(exported, total)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        cursor.close()
+
+    if progress:
+        progress(exported, total)
+    log_action(actor["username"],
+               f"Exported {exported} {entity} to {os.path.basename(path)}"
+               + (f" ({len(failed)} undecryptable rows skipped)" if failed else ""),
+               suspicious=bool(failed))
+    return ExportResult(entity, path, exported, len(failed), time.perf_counter() - started)
+
+
+def export_data(conn, auth):
+    if not auth.require_authentication():
+        return
+    choices = [e for e, spec in EXPORTS.items() if auth.can(spec.permission)]
+    if not choices:
+        print("Access denied: you do not have permission to export data.")
+        return
+
+    print("=== Export === (file name decides the format: .csv or .jsonl, add .gz to compress)")
+    while True:
+        entity = input(f"Export what? ({'/'.join(choices)}): ").strip().lower()
+        if entity == "cancel":
+            return
+        if entity in choices:
+            break
+        print("Invalid choice.")
+
+    path = input(f"Output file [{entity}.csv.gz]: ").strip() or f"{entity}.csv.gz"
+    if path.lower() == "cancel":
+        return
+    if os.path.exists(path) and input(f"{path} exists. Overwrite? (yes/no): ").strip().lower() != "yes":
+        print("Export cancelled.")
+        return
+
+    def show_progress(done, total):
+        print(f"\r{done}/{total} rows exported...", end="", flush=True)
+
+    try:
+        result = export_table(conn, auth.get_current_user(), entity, path, progress=show_progress)
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception as e:
+        print(f"\nExport failed: {e}")
+        log_action(auth.get_current_user()["username"], f"Export of {entity} failed: {e}", suspicious=True)
+        return
+
+    print(f"\nExported {result.exported} {entity} to {result.path} in {result.seconds:.1f}s.")
+    if result.failed:
+        print(f"{result.failed} row(s) could not be decrypted and were skipped.")
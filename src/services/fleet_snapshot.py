@@ -0,0 +1,350 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+from modelEncryption.scooterEncryption import iter_rows_to_scooters
+from services.auth_service import require_permission
+from services.errors import ServiceError
+from services.stream_utils import iter_cursor
+
+# Columnar in-memory copy of the scooters table for fleet-wide analytics.
+# Every numeric attribute is a NumPy array indexed by position, brand and model are
+# dictionary-encoded to int32 codes, and aggregates/filters are vectorized over those arrays.
+# A trigger stamps each inserted or updated scooter with a change sequence number, so
+# refresh() only decrypts rows changed since the snapshot was taken. Deletes are counted
+# separately, so the id sweep that finds deleted rows only runs after one has happened.
+# NumPy is the largest import of the application, so it is imported by the first snapshot
+# rather than by every process that merely imports this module.
+
+BATCH_SIZE = 1000
+
+TRACKED_COLUMNS = (
+    "brand, model, serial_number, top_speed, battery_capacity, soc, target_soc_range, "
+    "latitude, longitude, out_of_service, mileage, last_maintenance"
+)
+
+NUMERIC_COLUMNS = ("soc", "battery_capacity", "top_speed", "mileage", "lat", "lon", "soc_min", "soc_max")
+
+
+def ensure_change_tracking(conn):
+    """Add scooters.change_seq with its counters and triggers; existing rows start at their id"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(scooters)")}
+    conn.execute("CREATE TABLE IF NOT EXISTS change_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    if "change_seq" not in columns:
+        conn.execute("ALTER TABLE scooters ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE scooters SET change_seq = id")
+    conn.execute("""
+        INSERT OR IGNORE INTO change_counters (name, value)
+        SELECT 'scooters', COALESCE(MAX(change_seq), 0) FROM scooters
+    """)
+    conn.execute("INSERT OR IGNORE INTO change_counters (name, value) VALUES ('scooters_deleted', 0)")
+    for event in ("INSERT", f"UPDATE OF {TRACKED_COLUMNS}"):
+        name = "trg_scooters_seq_" + event.split()[0].lower()
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON scooters
+            BEGIN
+                UPDATE change_counters SET value = value + 1 WHERE name = 'scooters';
+                UPDATE scooters SET change_seq = (SELECT value FROM change_counters WHERE name = 'scooters')
+                WHERE id = NEW.id;
+            END
+        """)
+    # A delete has no row to stamp; moving the counter tells readers (the spatial index) to look,
+    # and the delete count tells the snapshot to sweep for removed ids
+    conn.execute("DROP TRIGGER IF EXISTS trg_scooters_seq_delete")
+    conn.execute("""
+        CREATE TRIGGER trg_scooters_seq_delete AFTER DELETE ON scooters
+        BEGIN
+            UPDATE change_counters SET value = value + 1 WHERE name IN ('scooters', 'scooters_deleted');
+        END
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scooters_change_seq ON scooters(change_seq)")
+    conn.commit()
+
+
+def parse_soc_range(text: str) -> Tuple[int, int]:
+    try:
+        low, high = (int(x) for x in str(text).split("-", 1))
+        return low, high
+    except ValueError:
+        return -1, -1
+
+
+class _Codes:
+    """Dictionary encoding of a string column"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str) -> int:
+        return self.index.get(value, -1)
+
+
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy as np
+
+
+class FleetSnapshot:
+    def __init__(self):
+        _import_numpy()
+        self.version = 0
+        self.deletes = 0         # scooters_deleted counter at the last id sweep
+        self.ids = np.empty(0, dtype=np.int64)
+        self.soc = np.empty(0, dtype=np.int16)
+        self.battery_capacity = np.empty(0, dtype=np.float64)
+        self.top_speed = np.empty(0, dtype=np.float64)
+        self.mileage = np.empty(0, dtype=np.float64)
+        self.lat = np.empty(0, dtype=np.float64)
+        self.lon = np.empty(0, dtype=np.float64)
+        self.out_of_service = np.empty(0, dtype=bool)
+        self.soc_min = np.empty(0, dtype=np.int16)
+        self.soc_max = np.empty(0, dtype=np.int16)
+        self.brand = np.empty(0, dtype=np.int32)
+        self.model = np.empty(0, dtype=np.int32)
+        self.brands = _Codes()
+        self.models = _Codes()
+        self._pos: Dict[int, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- loading --------------------------------------------------------------
+
+    @classmethod
+    def load(cls, conn) -> "FleetSnapshot":
+        snapshot = cls()
+        snapshot.refresh(conn)
+        return snapshot
+
+    def _columns(self, scooters) -> dict:
+        n = len(scooters)
+        cols = {
+            "ids": np.fromiter((s.id for s in scooters), np.int64, n),
+            "soc": np.fromiter((s.soc for s in scooters), np.int16, n),
+            "battery_capacity": np.fromiter((s.battery_capacity for s in scooters), np.float64, n),
+            "top_speed": np.fromiter((s.top_speed for s in scooters), np.float64, n),
+            "mileage": np.fromiter((s.mileage for s in scooters), np.float64, n),
+            "lat": np.fromiter((s.latitude for s in scooters), np.float64, n),
+            "lon": np.fromiter((s.longitude for s in scooters), np.float64, n),
+            "out_of_service": np.fromiter((bool(s.out_of_service) for s in scooters), bool, n),
+            "brand": np.fromiter((self.brands.code(s.brand) for s in scooters), np.int32, n),
+            "model": np.fromiter((self.models.code(s.model) for s in scooters), np.int32, n),
+        }
+        bounds = np.array([parse_soc_range(s.target_soc_range) for s in scooters], dtype=np.int16).reshape(n, 2)
+        cols["soc_min"], cols["soc_max"] = bounds[:, 0], bounds[:, 1]
+        return cols
+
+    def refresh(self, conn) -> Tuple[int, int]:
+        """Apply inserts, updates and deletes since the last load; returns (changed, deleted)"""
+        with self._lock:
+            counters = dict(conn.execute(
+                "SELECT name, value FROM change_counters WHERE name IN ('scooters', 'scooters_deleted')"))
+            if len(counters) < 2:
+                raise ServiceError("Change tracking is not set up; run ensure_change_tracking first.")
+            latest, deletes = counters["scooters"], counters["scooters_deleted"]
+
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM scooters WHERE change_seq > ? AND change_seq <= ? ORDER BY id",
+                           (self.version, latest))
+            changed = [s for s in iter_rows_to_scooters(iter_cursor(cursor, BATCH_SIZE), cache=False) if s is not None]
+
+            deleted = 0
+            if deletes != self.deletes and len(self.ids):
+                live = np.fromiter((r[0] for r in conn.execute("SELECT id FROM scooters")), np.int64)
+                keep = np.isin(self.ids, live)
+                deleted = int(len(self.ids) - keep.sum())
+                if deleted:
+                    self._apply_mask(keep)
+
+            if changed:
+                cols = self._columns(changed)
+                positions = np.fromiter((self._pos.get(i, -1) for i in cols["ids"]), np.int64, len(changed))
+                existing = positions >= 0
+                for name, values in cols.items():
+                    getattr(self, name)[positions[existing]] = values[existing]
+                new = ~existing
+                if new.any():
+                    for name, values in cols.items():
+                        setattr(self, name, np.concatenate([getattr(self, name), values[new]]))
+                    self._reindex()
+
+            self.version, self.deletes = latest, deletes
+            return len(changed), deleted
+
+    def _apply_mask(self, keep: "np.ndarray"):
+        for name in ("ids", "brand", "model", "out_of_service") + NUMERIC_COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        self._reindex()
+
+    def _reindex(self):
+        self._pos = {int(i): p for p, i in enumerate(self.ids)}
+
+    # --- queries --------------------------------------------------------------
+
+    def mask(self, brand: str = None, model: str = None, out_of_service: bool = None,
+             soc_below: int = None, soc_above: int = None, below_target: bool = None,
+             above_target: bool = None, bbox: Tuple[float, float, float, float] = None) -> "np.ndarray":
+        """Boolean row filter; every given condition must hold. bbox is (lat_min, lat_max, lon_min, lon_max)"""
+        with self._lock:
+            return self._mask(brand, model, out_of_service, soc_below, soc_above, below_target, above_target, bbox)
+
+    def _mask(self, brand, model, out_of_service, soc_below, soc_above, below_target, above_target, bbox):
+        m = np.ones(len(self.ids), dtype=bool)
+        if brand is not None:
+            m &= self.brand == self.brands.lookup(brand)
+        if model is not None:
+            m &= self.model == self.models.lookup(model)
+        if out_of_service is not None:
+            m &= self.out_of_service == out_of_service
+        if soc_below is not None:
+            m &= self.soc < soc_below
+        if soc_above is not None:
+            m &= self.soc > soc_above
+        if below_target is not None:
+            m &= (self.soc < self.soc_min) == below_target
+        if above_target is not None:
+            m &= (self.soc > self.soc_max) == above_target
+        if bbox is not None:
+            lat_min, lat_max, lon_min, lon_max = bbox
+            m &= (self.lat >= lat_min) & (self.lat <= lat_max) & (self.lon >= lon_min) & (self.lon <= lon_max)
+        return m
+
+    def select_ids(self, mask: "np.ndarray" = None) -> List[int]:
+        return (self.ids if mask is None else self.ids[mask]).tolist()
+
+    def summary(self, mask: "np.ndarray" = None) -> dict:
+        with self._lock:
+            m = np.ones(len(self.ids), dtype=bool) if mask is None else mask
+            count = int(m.sum())
+            if not count:
+                return {"count": 0}
+            soc = self.soc[m]
+            return {
+                "count": count,
+                "out_of_service": int(self.out_of_service[m].sum()),
+                "avg_soc": float(soc.mean()),
+                "below_target": int((soc < self.soc_min[m]).sum()),
+                "above_target": int((soc > self.soc_max[m]).sum()),
+                "avg_mileage": float(self.mileage[m].mean()),
+                "total_mileage": float(self.mileage[m].sum()),
+                "total_battery_wh": float(self.battery_capacity[m].sum()),
+                "stored_energy_wh": float((self.battery_capacity[m] * soc / 100.0).sum()),
+            }
+
+    def by_brand(self, column: str = "mileage", mask: "np.ndarray" = None) -> Dict[str, dict]:
+        """count/mean/min/max/median of a numeric column per brand"""
+        if column not in NUMERIC_COLUMNS:
+            raise ServiceError(f"Unknown column '{column}'")
+        with self._lock:
+            m = np.ones(len(self.ids), dtype=bool) if mask is None else mask
+            codes, values = self.brand[m], getattr(self, column)[m].astype(np.float64)
+            if not len(codes):
+                return {}
+            counts = np.bincount(codes, minlength=len(self.brands.values))
+            sums = np.bincount(codes, weights=values, minlength=len(self.brands.values))
+            order = np.argsort(codes, kind="stable")
+            sorted_codes, sorted_values = codes[order], values[order]
+            starts = np.searchsorted(sorted_codes, np.arange(len(self.brands.values)))
+            result = {}
+            for code, brand in enumerate(self.brands.values):
+                if not counts[code]:
+                    continue
+                group = sorted_values[starts[code]:starts[code] + counts[code]]
+                result[brand] = {
+                    "count": int(counts[code]),
+                    "mean": float(sums[code] / counts[code]),
+                    "min": float(group.min()),
+                    "max": float(group.max()),
+                    "median": float(np.median(group)),
+                }
+            return result
+
+    def distribution(self, column: str = "mileage", bins: int = 10, by_brand: bool = False,
+                     mask: "np.ndarray" = None) -> dict:
+        """Histogram (edges, counts) of a numeric column, overall or per brand with shared edges"""
+        if column not in NUMERIC_COLUMNS:
+            raise ServiceError(f"Unknown column '{column}'")
+        with self._lock:
+            m = np.ones(len(self.ids), dtype=bool) if mask is None else mask
+            values = getattr(self, column)[m]
+            if not len(values):
+                return {"edges": [], "counts": []}
+            edges = np.histogram_bin_edges(values, bins=bins)
+            if not by_brand:
+                return {"edges": edges.tolist(), "counts": np.histogram(values, edges)[0].tolist()}
+            codes = self.brand[m]
+            return {
+                "edges": edges.tolist(),
+                "counts": {brand: np.histogram(values[codes == code], edges)[0].tolist()
+                           for code, brand in enumerate(self.brands.values) if (codes == code).any()},
+            }
+
+
+_snapshot: Optional[FleetSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_fleet_snapshot(conn) -> FleetSnapshot:
+    """Process-wide snapshot, loaded on first use and refreshed incrementally afterwards"""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = FleetSnapshot.load(conn)
+        else:
+            _snapshot.refresh(conn)
+        return _snapshot
+
+
+def reset_fleet_snapshot():
+    """Forget the snapshot so the next call reloads it; change_seq is not monotonic across a restore"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def fleet_summary(conn, actor: dict) -> dict:
+    require_permission(actor, "search_scooter")
+    snapshot = get_fleet_snapshot(conn)
+    return {"fleet": snapshot.summary(), "mileage_by_brand": snapshot.by_brand("mileage"),
+            "soc_by_brand": snapshot.by_brand("soc")}
+
+
+def show_fleet_stats(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("search_scooter"):
+        print("Access denied: you do not have permission to view fleet statistics.")
+        return
+
+    try:
+        stats = fleet_summary(conn, auth.get_current_user())
+    except ServiceError as e:
+        print(e)
+        return
+
+    fleet = stats["fleet"]
+    print("\n=== Fleet Statistics ===")
+    if not fleet["count"]:
+        print("No scooters registered.")
+        return
+    print(f"Scooters: {fleet['count']} | Out of service: {fleet['out_of_service']} | "
+          f"Avg SoC: {fleet['avg_soc']:.1f}% | Below target: {fleet['below_target']} | "
+          f"Above target: {fleet['above_target']}")
+    print(f"Avg mileage: {fleet['avg_mileage']:.1f} km | Total mileage: {fleet['total_mileage']:.0f} km | "
+          f"Stored energy: {fleet['stored_energy_wh'] / 1000:.1f} of {fleet['total_battery_wh'] / 1000:.1f} kWh")
+    print("\nPer brand:")
+    for brand, m in sorted(stats["mileage_by_brand"].items()):
+        soc = stats["soc_by_brand"][brand]
+        print(f"{brand}: {m['count']} scooters | mileage avg {m['mean']:.1f} / median {m['median']:.1f} / "
+              f"max {m['max']:.1f} km | avg SoC {soc['mean']:.1f}%")
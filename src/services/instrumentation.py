@@ -0,0 +1,284 @@
+import atexit
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+# Timers and counters for the hot paths: Fernet/AES-GCM encryption, SQL statements, bcrypt and
+# the console menu commands. Each metric is keyed by name and one label (the statement verb,
+# the menu command, ...) and keeps a call count, an error count, the total time, the bytes
+# handled and a latency histogram.
+# Recording is off until enable() (or URBAN_METRICS, see configure_from_env); while off, an
+# instrumented call costs one flag check. The switch can be flipped at any time, also from
+# outside the process with SIGUSR1 once configure_from_env has installed the handler.
+# A MetricsExporter thread rewrites a snapshot file every interval: Prometheus text format when
+# the path ends in .prom, JSON otherwise, replaced atomically so a scraper never reads half.
+#
+# SQL time is that of execute()/executemany(): preparing and running a statement up to its first
+# row. Fetching further rows is not included.
+
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+EXPORT_INTERVAL = 15.0
+PROMETHEUS_PREFIX = "urban_mobility"
+ENV_VAR = "URBAN_METRICS"      # export path; setting it turns recording on at startup
+
+_enabled = False
+_metrics: Dict[Tuple[str, str], "_Metric"] = {}
+_lock = threading.Lock()
+
+
+class _Metric:
+    __slots__ = ("count", "errors", "seconds", "bytes", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # last one is +Inf
+
+    def as_dict(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, n in zip(BUCKETS + ("+Inf",), self.buckets):
+            running += n
+            cumulative[str(bound)] = running
+        return {"count": self.count, "errors": self.errors, "seconds": round(self.seconds, 6),
+                "bytes": self.bytes, "buckets": cumulative}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Forget everything recorded so far"""
+    with _lock:
+        _metrics.clear()
+
+
+def observe(name: str, seconds: float, label: str = "", nbytes: int = 0, error: bool = False):
+    """Record one call (does nothing while recording is off)"""
+    if not _enabled:
+        return
+    with _lock:
+        metric = _metrics.get((name, label))
+        if metric is None:
+            metric = _metrics[(name, label)] = _Metric()
+        metric.count += 1
+        metric.errors += error
+        metric.seconds += seconds
+        metric.bytes += nbytes
+        metric.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+def timed(name: str, size: Callable = None, label: str = ""):
+    """Decorator recording every call of a function; size(*args) gives the bytes it handles"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            error = True
+            try:
+                result = fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                observe(name, time.perf_counter() - started, label, size(*args) if size else 0, error)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def timer(name: str, label: str = ""):
+    """Record the time spent in a with-block"""
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    error = True
+    try:
+        yield
+        error = False
+    finally:
+        observe(name, time.perf_counter() - started, label, 0, error)
+
+
+def snapshot() -> dict:
+    """{name: {label: counters}} of everything recorded so far"""
+    with _lock:
+        items = [(name, label, metric.as_dict()) for (name, label), metric in _metrics.items()]
+    result = {}
+    for name, label, values in sorted(items):
+        result.setdefault(name, {})[label] = values
+    return result
+
+
+# --- SQL --------------------------------------------------------------------------
+
+def _verb(sql: str) -> str:
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+
+
+def _timed_sql(method, self, sql, *args):
+    if not _enabled:
+        return method(self, sql, *args)
+    started = time.perf_counter()
+    error = True
+    try:
+        result = method(self, sql, *args)
+        error = False
+        return result
+    finally:
+        observe("sql.execute", time.perf_counter() - started, _verb(sql), 0, error)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, *args):
+        return _timed_sql(sqlite3.Cursor.execute, self, sql, *args)
+
+    def executemany(self, sql, *args):
+        return _timed_sql(sqlite3.Cursor.executemany, self, sql, *args)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection factory timing execute()/executemany() on the connection and its cursors"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return _timed_sql(sqlite3.Connection.execute, self, sql, *args)
+
+    def executemany(self, sql, *args):
+        return _timed_sql(sqlite3.Connection.executemany, self, sql, *args)
+
+
+# --- export -----------------------------------------------------------------------
+
+def _prometheus_name(name: str) -> str:
+    return f"{PROMETHEUS_PREFIX}_{name.replace('.', '_')}"
+
+
+def _prometheus_label(label: str, extra: str = "") -> str:
+    escaped = label.replace("\\", "\\\\").replace('"', '\\"')
+    return "{" + f'op="{escaped}"' + (f",{extra}" if extra else "") + "}"
+
+
+def to_prometheus(metrics: dict) -> str:
+    lines = [f"# TYPE {PROMETHEUS_PREFIX}_instrumentation_enabled gauge",
+             f"{PROMETHEUS_PREFIX}_instrumentation_enabled {int(_enabled)}"]
+    for name, labels in metrics.items():
+        base = _prometheus_name(name)
+        lines.append(f"# TYPE {base}_seconds histogram")
+        for label, values in labels.items():
+            for bound, count in values["buckets"].items():
+                le = 'le="' + bound + '"'
+                lines.append(f"{base}_seconds_bucket{_prometheus_label(label, le)} {count}")
+            lines.append(f"{base}_seconds_sum{_prometheus_label(label)} {values['seconds']}")
+            lines.append(f"{base}_seconds_count{_prometheus_label(label)} {values['count']}")
+        for counter in ("errors", "bytes"):
+            lines.append(f"# TYPE {base}_{counter}_total counter")
+            for label, values in labels.items():
+                lines.append(f"{base}_{counter}_total{_prometheus_label(label)} {values[counter]}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path: str):
+    """Write the current snapshot to path (Prometheus text for .prom, else JSON), atomically"""
+    metrics = snapshot()
+    if path.endswith(".prom"):
+        text = to_prometheus(metrics)
+    else:
+        text = json.dumps({"generated": datetime.now().isoformat(timespec="seconds"), "enabled": _enabled,
+                           "metrics": metrics}, indent=2)
+    part = path + ".part"
+    with open(part, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(part, path)
+
+
+class MetricsExporter:
+    def __init__(self, path: str, interval: float = EXPORT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._export()
+        self._export()   # final snapshot at shutdown
+
+    def _export(self):
+        try:
+            export(self.path)
+        except OSError as e:
+            print(f"⚠️ Metrics export failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_metrics_exporter(path: str, interval: float = EXPORT_INTERVAL) -> MetricsExporter:
+    """Start the process-wide exporter (idempotent)"""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = MetricsExporter(path, interval)
+        return _exporter
+
+
+def stop_metrics_exporter():
+    global _exporter
+    with _exporter_lock:
+        exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.close()
+
+
+def _toggle(signum, frame):
+    if _enabled:
+        disable()
+    else:
+        enable()
+
+
+def configure_from_env() -> Optional[str]:
+    """If URBAN_METRICS names an export file: start recording and exporting to it, and let SIGUSR1
+    switch recording off and on. Returns the path, or None when the variable is unset."""
+    path = os.environ.get(ENV_VAR)
+    if not path:
+        return None
+    enable()
+    start_metrics_exporter(path)
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, _toggle)
+    return path
+
+
+atexit.register(stop_metrics_exporter)
@@ -0,0 +1,277 @@
+import argparse
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from modelEncryption.bulk_decode import decode_rows
+from modelEncryption.sealed_rows import SEALED_COLUMNS, is_sealed, open_fields, seal_fields, sealed_blob
+from services import crypto_utils
+from services.database import get_connection, write_transaction
+from services.logCRUD import log_action
+
+# Live key rotation.
+#   start   adds a new key to the keyring as decrypt-only, waits until every running process
+#           has reloaded the keyring, then promotes it to primary (the old key stays readable)
+#   run     re-encrypts every encrypted column under the primary key; resumable. Rows keep
+#           their storage format: field tokens are rotated, sealed blobs re-sealed (and skipped
+#           when their header already names the primary key)
+#   status  progress per table
+#   finish  checks that no token still needs an old key, then drops the old keys
+#
+# Rotation covers the encryption keys only. The digests in the database (blind indexes, search
+# grams, grid cells, restore codes) are keyed by the keyring's index_root, which never changes:
+# on a keyring created from secret.key it is that original key, so secret.key stays live after
+# `finish` "retires" it and must remain as protected as the current keys. start, status and
+# finish say so in their output.
+#
+# `run` walks each table by id in bounded batches. A batch is decrypted and re-encrypted on the
+# shared bulk_decode pool, then written in one transaction together with its checkpoint, so a
+# crash resumes after the last committed batch. Each UPDATE only applies if the row still holds
+# the tokens it read, so a concurrent edit (already under the primary key) is never overwritten.
+#
+#   python -m services.key_rotation start | run [--max-rows-per-sec N] | status | finish
+
+BATCH_SIZE = 500
+GRACE = 2 * crypto_utils.KEYRING_CHECK_INTERVAL
+
+ENCRYPTED_COLUMNS = SEALED_COLUMNS
+
+
+def ensure_rotation_progress(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS key_rotation_progress (
+            table_name TEXT PRIMARY KEY,
+            key_id TEXT NOT NULL,
+            last_id INTEGER NOT NULL,
+            rotated INTEGER NOT NULL,
+            skipped INTEGER NOT NULL,
+            failed INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+class Throttle:
+    """Paces work to at most `rate` rows per second (no limit when rate is None)"""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate
+        self.rows = 0
+        self.started = time.monotonic()
+
+    def wait(self, rows: int):
+        if not self.rate:
+            return
+        self.rows += rows
+        ahead = self.rows / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _rotate_row(table: str, row: tuple) -> tuple:
+    """(new values..., id, old values...) for a conditional UPDATE; () if already under the primary key"""
+    row_id, stored = row[0], row[1:]
+    blob = sealed_blob(table, stored)
+    if blob is not None:
+        if crypto_utils.sealed_with_primary(blob):
+            return ()
+        rotated = seal_fields(table, open_fields(table, stored), "sealed")
+    else:
+        rotated = tuple(crypto_utils.rotate_token(t) if t is not None else None for t in stored)
+    return rotated + (row_id,) + stored
+
+
+def _progress(conn, table: str, key: str) -> tuple:
+    row = conn.execute(
+        "SELECT last_id, rotated, skipped, failed, done FROM key_rotation_progress WHERE table_name = ? AND key_id = ?",
+        (table, key)).fetchone()
+    return row or (0, 0, 0, 0, 0)
+
+
+def rotate_table(conn, table: str, batch_size: int = BATCH_SIZE, workers: int = None,
+                 throttle: Throttle = None, progress: Callable = None) -> tuple:
+    """Re-encrypt one table from its checkpoint on; returns (rotated, skipped, failed)"""
+    key = crypto_utils.current_key_id()
+    columns = ENCRYPTED_COLUMNS[table]
+    last_id, rotated, skipped, failed, done = _progress(conn, table, key)
+    if done:
+        return rotated, skipped, failed
+    assignments = ", ".join(f"{c} = ?" for c in columns)
+    unchanged = " AND ".join(f"{c} IS ?" for c in columns)
+    total = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE id > ?", (last_id,)).fetchone()[0]
+    seen = 0
+
+    while True:
+        rows = conn.execute(f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                            (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        results = decode_rows(rows, lambda row: _rotate_row(table, row), workers)
+        updates = [r for r in results if r]
+        batch_last = rows[-1][0]
+        batch_failed = sum(1 for r in results if r is None)
+
+        def write(c):
+            cursor = c.executemany(f"UPDATE {table} SET {assignments} WHERE id = ? AND {unchanged}", updates)
+            applied = cursor.rowcount
+            c.execute("""
+                INSERT OR REPLACE INTO key_rotation_progress
+                    (table_name, key_id, last_id, rotated, skipped, failed, done, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+            """, (table, key, batch_last, rotated + applied, skipped + len(updates) - applied,
+                  failed + batch_failed, datetime.now().isoformat()))
+            return applied
+
+        applied = write_transaction(write, conn)
+        rotated += applied
+        skipped += len(updates) - applied
+        failed += batch_failed
+        last_id = batch_last
+        seen += len(rows)
+        if progress:
+            progress(table, seen, total)
+        if throttle:
+            throttle.wait(len(rows))
+
+    write_transaction(lambda c: c.execute("""
+        INSERT OR REPLACE INTO key_rotation_progress
+            (table_name, key_id, last_id, rotated, skipped, failed, done, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+    """, (table, key, last_id, rotated, skipped, failed, datetime.now().isoformat())), conn)
+    return rotated, skipped, failed
+
+
+def run_rotation(conn, batch_size: int = BATCH_SIZE, workers: int = None, max_rows_per_sec: float = None,
+                 progress: Callable = None) -> dict:
+    """Rotate every table (resuming where a previous run stopped); returns {table: (rotated, skipped, failed)}"""
+    ensure_rotation_progress(conn)
+    throttle = Throttle(max_rows_per_sec)
+    return {table: rotate_table(conn, table, batch_size, workers, throttle, progress) for table in ENCRYPTED_COLUMNS}
+
+
+def start_rotation(grace: float = GRACE) -> str:
+    """Stage a new key, give running processes `grace` seconds to load it, then promote it; returns its id"""
+    keyring = crypto_utils.load_keyring()
+    new_key = Fernet.generate_key().decode()
+    keyring["decrypt_only"] = keyring["decrypt_only"] + [new_key]
+    crypto_utils.save_keyring(keyring)
+    time.sleep(grace)   # until then another process could see a token it cannot decrypt yet
+    keyring["decrypt_only"] = [keyring["primary"]] + [k for k in keyring["decrypt_only"] if k != new_key]
+    keyring["primary"] = new_key
+    crypto_utils.save_keyring(keyring)
+    return crypto_utils.key_id(new_key)
+
+
+def stale_tokens(conn, workers: int = None) -> int:
+    """Number of tokens (or sealed blobs) the primary key alone cannot decrypt"""
+    primary = Fernet(crypto_utils.load_keyring()["primary"])
+
+    def unreadable(row):
+        count = 0
+        for token in row:
+            if is_sealed(token):
+                count += not crypto_utils.sealed_with_primary(token)
+                continue
+            if not token:   # NULL, or the '' placeholders beside a sealed blob
+                continue
+            try:
+                primary.decrypt(token.encode())
+            except InvalidToken:
+                count += 1
+        return count
+
+    stale = 0
+    for table, columns in ENCRYPTED_COLUMNS.items():
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE * 8)
+            if not rows:
+                break
+            stale += sum(n if n is not None else len(columns) for n in decode_rows(rows, unreadable, workers))
+    return stale
+
+
+def finish_rotation(conn, workers: int = None) -> int:
+    """Drop the old keys once nothing needs them; returns how many keys were retired"""
+    ensure_rotation_progress(conn)
+    key = crypto_utils.current_key_id()
+    pending = [t for t in ENCRYPTED_COLUMNS if not _progress(conn, t, key)[4]]
+    if pending:
+        raise RuntimeError(f"Rotation has not completed for: {', '.join(pending)}")
+    stale = stale_tokens(conn, workers)
+    if stale:
+        raise RuntimeError(f"{stale} token(s) still need an old key; run the rotation again")
+    keyring = crypto_utils.load_keyring()
+    retired = len(keyring["decrypt_only"])
+    keyring["decrypt_only"] = []
+    crypto_utils.save_keyring(keyring)
+    return retired
+
+
+def index_root_note() -> str:
+    keyring = crypto_utils.load_keyring()
+    root = keyring["index_root"]
+    try:
+        original = crypto_utils.load_key().decode() == root
+    except OSError:
+        original = False
+    return (f"Note: index root {crypto_utils.key_id(root)}"
+            + (" (the original secret.key)" if original else "")
+            + " is not rotated; blind indexes, search grams and restore codes stay keyed by it, so keep it secret.")
+
+
+def _print_progress(table, done, total):
+    if done == total or done % (BATCH_SIZE * 20) == 0:
+        print(f"  {table}: {done}/{total}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Rotate the field encryption key")
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    start = commands.add_parser("start", help="add a new primary key (old keys stay readable)")
+    start.add_argument("--grace", type=float, default=GRACE, help="seconds for running processes to load the new key")
+    run = commands.add_parser("run", help="re-encrypt all data under the primary key (resumable)")
+    run.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    run.add_argument("--workers", type=int, default=None)
+    run.add_argument("--max-rows-per-sec", type=float, default=None, help="throttle for running next to live traffic")
+    commands.add_parser("status", help="show rotation progress")
+    commands.add_parser("finish", help="verify and retire the old keys")
+    args = parser.parse_args(argv)
+    conn = get_connection(args.db)
+
+    try:
+        if args.command == "start":
+            new_id = start_rotation(args.grace)
+            log_action("SYSTEM", f"Key rotation started, new primary key {new_id}", suspicious=False, conn=conn)
+            print(f"New primary key {new_id}. Run `python -m services.key_rotation run` next.")
+            print(index_root_note())
+        elif args.command == "run":
+            started = time.monotonic()
+            results = run_rotation(conn, args.batch_size, args.workers, args.max_rows_per_sec, _print_progress)
+            for table, (rotated, skipped, failed) in results.items():
+                print(f"{table}: rotated {rotated}, changed concurrently {skipped}, failed {failed}")
+            print(f"Done in {time.monotonic() - started:.1f}s.")
+            log_action("SYSTEM", f"Key rotation pass to {crypto_utils.current_key_id()} completed", suspicious=False, conn=conn)
+        elif args.command == "status":
+            ensure_rotation_progress(conn)
+            key = crypto_utils.current_key_id()
+            print(f"Primary key {key}, {len(crypto_utils.load_keyring()['decrypt_only'])} old key(s) still readable")
+            for table in ENCRYPTED_COLUMNS:
+                last_id, rotated, skipped, failed, done = _progress(conn, table, key)
+                state = "done" if done else f"at id {last_id}"
+                print(f"  {table}: {state}, rotated {rotated}, changed concurrently {skipped}, failed {failed}")
+            print(index_root_note())
+        else:
+            retired = finish_rotation(conn, None)
+            log_action("SYSTEM", f"Key rotation finished, {retired} old key(s) retired", suspicious=False, conn=conn)
+            print(f"Retired {retired} old key(s).")
+            print(index_root_note())
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
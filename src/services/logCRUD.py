@@ -1,11 +1,157 @@
-from datetime import datetime
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from models.log_entry import LogEntry
-from modelEncryption.logEncryption import logentry_to_encrypted_row
+from modelEncryption.logEncryption import logentry_to_encrypted_row, rows_to_logentries
+from services import database
+from services.blind_index import blind_index
+from services.database import get_connection, close_connection, db_path_of, write_transaction
+
+# Audit events are group-committed by a background writer: log_action only enqueues,
+# the writer thread encrypts and inserts a whole batch with executemany in one
+# transaction. A full queue blocks the caller (backpressure) instead of dropping events.
+# A batch that cannot be written is retried with a capped backoff (the queue fills and
+# callers block meanwhile); only after the last attempt is it dropped and counted as failed.
+# There is one writer per database file.
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 256
+FLUSH_INTERVAL = 0.5  # seconds an event may wait before its batch is written
+WRITE_RETRIES = 5
+WRITE_BACKOFF = 0.1   # seconds, doubled per retry up to MAX_WRITE_BACKOFF
+MAX_WRITE_BACKOFF = 2.0
+
+_FLUSH = object()
+_STOP = object()
+
+
+class AuditLogWriter:
+    def __init__(self, db_path: str = None, queue_size: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, log: LogEntry):
+        self.queue.put(log)  # blocks while the queue is full
+
+    def flush(self):
+        """Block until every event submitted so far is committed"""
+        if self._thread.is_alive():
+            self.queue.put(_FLUSH)
+            self.queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        conn = get_connection(self.db_path)
+        try:
+            stopping = False
+            while not stopping:
+                batch, handled = [], 0
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    handled += 1
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if item is _FLUSH:
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                try:
+                    self._write(conn, batch)
+                finally:
+                    for _ in range(handled):
+                        self.queue.task_done()
+        finally:
+            close_connection(self.db_path)
+
+    def _write(self, conn, batch):
+        """Insert batch, retrying with backoff; never raises, so one bad batch cannot end the thread"""
+        if not batch:
+            return
+        delay = WRITE_BACKOFF
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                rows = [logentry_to_encrypted_row(log) + (blind_index("username", log.username),) for log in batch]
+                write_transaction(lambda conn: conn.executemany("""
+                    INSERT INTO log_entries (timestamp, username, activity, additional_info, suspicious, username_bidx)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows), conn)
+                self.written += len(batch)
+                return
+            except sqlite3.Error as e:
+                error = e
+            except Exception as e:   # cannot be encrypted or bound: retrying will not help
+                error = e
+                break
+            if attempt < WRITE_RETRIES:
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_WRITE_BACKOFF)
+        self.failed += len(batch)
+        print(f"⚠️ Failed to log {len(batch)} action(s): {error}")
+
+
+_writers: Dict[str, AuditLogWriter] = {}
+_writer_lock = threading.Lock()
+
+
+def _writer_key(db_path: str = None) -> str:
+    return os.path.abspath(db_path or database.DB_PATH)
+
+
+def start_audit_writer(db_path: str = None) -> AuditLogWriter:
+    """Start the writer for db_path (idempotent)"""
+    key = _writer_key(db_path)
+    with _writer_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = AuditLogWriter(key)
+        return writer
+
+
+def flush_audit_log():
+    with _writer_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+def stop_audit_writer():
+    with _writer_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(stop_audit_writer)
+
 
 def log_action(username: str, activity: str, suspicious: bool = False, additional_info: str = "", conn=None):
-    
-    if conn is None:
-        raise ValueError("Database connection must be provided to log_action")
 
     log = LogEntry(
         timestamp=datetime.now(),
@@ -15,12 +161,112 @@ def log_action(username: str, activity: str, suspicious: bool = False, additiona
         suspicious=suspicious
     )
 
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT INTO logs (timestamp, username, activity, additional_info, suspicious)
-            VALUES (?, ?, ?, ?, ?)
-        """, logentry_to_encrypted_row(log))
-        conn.commit()
-    except Exception as e:
-        print(f"⚠️ Failed to log action: {e}")
+    start_audit_writer(db_path_of(conn) if conn is not None else None).submit(log)
+
+
+# --- Log viewer -----------------------------------------------------------------
+# Keyset pagination over (timestamp, id), newest first. Time range and the suspicious
+# flag are answered from indexes on the plaintext columns, the user filter from the
+# username blind index; only the rows of the requested page are decrypted.
+
+LOG_PAGE_SIZE = 25
+
+
+def ensure_log_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_entries_timestamp ON log_entries(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_entries_suspicious ON log_entries(suspicious, timestamp)")
+    conn.commit()
+
+
+def query_logs(conn, since: datetime = None, until: datetime = None, suspicious: bool = None,
+               username: str = None, after: Tuple[str, int] = None,
+               page_size: int = LOG_PAGE_SIZE) -> Tuple[List[Tuple[int, LogEntry]], Optional[Tuple[str, int]]]:
+    """One page of (id, LogEntry) pairs plus the keyset cursor for the next page (None when exhausted)"""
+    where, params = [], []
+    if since is not None:
+        where.append("timestamp >= ?")
+        params.append(since.isoformat())
+    if until is not None:
+        where.append("timestamp < ?")
+        params.append(until.isoformat())
+    if suspicious is not None:
+        where.append("suspicious = ?")
+        params.append(1 if suspicious else 0)
+    if username:
+        where.append("username_bidx = ?")
+        params.append(blind_index("username", username))
+    if after is not None:
+        where.append("(timestamp, id) < (?, ?)")
+        params.extend(after)
+
+    rows = conn.execute(f"""
+        SELECT id, timestamp, username, activity, additional_info, suspicious
+        FROM log_entries
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """, (*params, page_size + 1)).fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    entries = rows_to_logentries([row[1:] for row in rows])
+    page = [(row[0], entry) for row, entry in zip(rows, entries) if entry is not None]
+    next_cursor = (rows[-1][1], rows[-1][0]) if has_more else None
+    return page, next_cursor
+
+
+def _prompt_date(label: str) -> Optional[datetime]:
+    while True:
+        val = input(f"{label} (YYYY-MM-DD, blank for none): ").strip()
+        if not val:
+            return None
+        try:
+            return datetime.strptime(val, "%Y-%m-%d")
+        except ValueError:
+            print("Format must be YYYY-MM-DD.")
+
+
+def view_logs(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("view_logs"):
+        print("Access denied: you do not have permission to view logs.")
+        return
+
+    username = auth.get_current_user()["username"]
+    flush_audit_log()  # show events that are still buffered
+
+    print("=== View Logs === (leave a filter blank to skip it)")
+    since = _prompt_date("From date")
+    until = _prompt_date("To date")
+    if until is not None:
+        until += timedelta(days=1)  # inclusive end date
+    only_suspicious = input("Only suspicious entries? (yes/no): ").strip().lower() == "yes"
+    user_filter = input("Username (blank for all): ").strip().lower() or None
+
+    after, page_no = None, 1
+    while True:
+        try:
+            page, after = query_logs(conn, since, until, True if only_suspicious else None, user_filter, after)
+        except Exception as e:
+            print("Database error while reading logs.")
+            log_action(username, f"Log view failed: {e}", suspicious=True)
+            return
+
+        if not page and page_no == 1:
+            print("No log entries found.")
+            break
+
+        print(f"\n--- Page {page_no} ---")
+        for log_id, entry in page:
+            flag = "⚠️ " if entry.suspicious else ""
+            info = f" | {entry.additional_info}" if entry.additional_info else ""
+            print(f"{flag}#{log_id} | {entry.timestamp:%Y-%m-%d %H:%M:%S} | {entry.username} | {entry.activity}{info}")
+
+        if after is None:
+            break
+        if input("Next page? (y/n): ").strip().lower() != "y":
+            break
+        page_no += 1
+
+    log_action(username, "Viewed logs", suspicious=False)
@@ -0,0 +1,112 @@
+import math
+import os
+import time
+from services.blind_index import blind_index
+from services.database import write_transaction
+
+# Login throttling shared by every process on the database.
+# Each attempt takes a token from two buckets, one for the username and one for the source
+# (client address, or the console). Both are updated in one write transaction, so concurrent
+# processes cannot overshoot the limits; a successful login refills the username's bucket.
+# An empty bucket rejects the attempt at once with the time until its next token, so nothing
+# sleeps in the login path. Buckets are keyed by blind-index digests, never the plain values.
+#
+# A bucket that has refilled completely carries no information, so each row records the wheel
+# tick (TICK seconds) at which that happens. sweep() drops every row whose tick has passed through
+# the index on that column, at most once per tick per process: the cost is the number of expired
+# rows, never a scan of the live ones.
+
+USER_CAPACITY = 3          # failed attempts in a row per username
+USER_REFILL = 300          # seconds for an empty username bucket to refill completely
+SOURCE_CAPACITY = 20       # attempts in a burst per source, across usernames
+SOURCE_REFILL = 300
+TICK = 60
+
+_swept_tick = 0
+
+
+def ensure_login_throttle(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS login_throttle (
+            bucket TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            expires_tick INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_login_throttle_expires_tick ON login_throttle(expires_tick)")
+    conn.commit()
+
+
+def console_source() -> str:
+    """Source of a console login: the SSH client address if there is one"""
+    ssh = os.environ.get("SSH_CLIENT", "").split()
+    return ssh[0] if ssh else "console"
+
+
+def _buckets(username: str, source: str) -> list:
+    return [(f"user:{blind_index('throttle_user', username)}", USER_CAPACITY, USER_REFILL),
+            (f"source:{blind_index('throttle_source', source)}", SOURCE_CAPACITY, SOURCE_REFILL)]
+
+
+def _tokens(conn, bucket: str, capacity: int, refill: float, now: float) -> float:
+    row = conn.execute("SELECT tokens, updated_at FROM login_throttle WHERE bucket = ?", (bucket,)).fetchone()
+    if row is None:
+        return capacity
+    return min(capacity, row[0] + (now - row[1]) * capacity / refill)
+
+
+def _wait(buckets: list, tokens: list) -> float:
+    """Seconds until every bucket holds a whole token again"""
+    return max([(1 - t) * refill / capacity for (_, capacity, refill), t in zip(buckets, tokens) if t < 1],
+               default=0.0)
+
+
+def retry_after(conn, username: str, source: str) -> float:
+    """Seconds before an attempt for username from source would be accepted (0.0: now); takes nothing"""
+    now = time.time()
+    buckets = _buckets(username, source)
+    return _wait(buckets, [_tokens(conn, b, c, r, now) for b, c, r in buckets])
+
+
+def acquire(conn, username: str, source: str) -> float:
+    """Take a token for one login attempt; returns 0.0 if allowed, else the seconds to wait"""
+    now = time.time()
+    buckets = _buckets(username, source)
+
+    def take(c):
+        tokens = [_tokens(c, b, capacity, refill, now) for b, capacity, refill in buckets]
+        wait = _wait(buckets, tokens)
+        if wait:
+            return wait
+        for (bucket, capacity, refill), t in zip(buckets, tokens):
+            full_at = now + (capacity - t + 1) * refill / capacity
+            c.execute("INSERT OR REPLACE INTO login_throttle (bucket, tokens, updated_at, expires_tick) VALUES (?, ?, ?, ?)",
+                      (bucket, t - 1, now, math.ceil(full_at / TICK)))
+        return 0.0
+
+    wait = write_transaction(take, conn)
+    sweep(conn, now)
+    return wait
+
+
+def reset(conn, username: str):
+    """Refill username's bucket after a successful login"""
+    write_transaction(lambda c: c.execute("DELETE FROM login_throttle WHERE bucket = ?",
+                                          (_buckets(username, "")[0][0],)), conn)
+
+
+def sweep(conn, now: float = None) -> int:
+    """Drop the buckets of every wheel tick that has passed; returns the number removed"""
+    global _swept_tick
+    tick = int((now or time.time()) // TICK)
+    if tick <= _swept_tick:
+        return 0
+    _swept_tick = tick
+    return write_transaction(
+        lambda c: c.execute("DELETE FROM login_throttle WHERE expires_tick <= ?", (tick,)).rowcount, conn)
+
+
+def format_wait(seconds: float) -> str:
+    seconds = math.ceil(seconds)
+    return f"{seconds // 60}m {seconds % 60}s"
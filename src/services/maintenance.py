@@ -0,0 +1,251 @@
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+from models.scooter import Scooter
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.scooterEncryption import rows_to_scooters
+from modelEncryption.sealed_rows import open_fields, sealed_select
+from services.auth_service import require_permission
+from services.blind_index import blind_index
+from services.database import write_transaction
+from services.errors import ServiceError, ValidationError
+from services.logCRUD import log_action
+from services.maintenance_config import DUE_SOON_DAYS, DUE_SOON_KM, MAINTENANCE_RULES
+from services.search_index import ID_CHUNK_SIZE, fetch_rows_by_id
+from services.validators import is_date
+
+# Maintenance schedule kept next to each scooter as plaintext columns:
+#   service_mileage   odometer reading at the last service
+#   next_due_date     last_maintenance + the rule's interval in days
+#   next_due_mileage  service_mileage + the rule's interval in km
+# Every write path (service layer, bulk import, mark serviced) refreshes them, so the
+# "due" report is two index range scans, on next_due_date and on the km left
+# (next_due_mileage - mileage), and only the rows on the returned page are decrypted.
+# Telemetry only moves `mileage`, which the km-left index follows by itself.
+
+BACKFILL_BATCH_SIZE = 1000
+REPORT_LIMIT = 50
+
+
+def rule_for(brand: str, model: str) -> dict:
+    """First configured rule matching brand/model"""
+    for rule in MAINTENANCE_RULES:
+        if rule.get("brand") not in (None, brand) or rule.get("model") not in (None, model):
+            continue
+        return rule
+    return {"days": None, "km": None}
+
+
+def next_due(brand: str, model: str, last_maintenance: str, service_mileage: float) -> Tuple[Optional[str], Optional[float]]:
+    """(next_due_date, next_due_mileage) under the matching rule; None where the rule has no limit"""
+    rule = rule_for(brand, model)
+    due_date = due_mileage = None
+    if rule.get("days") is not None and last_maintenance:
+        due_date = (date.fromisoformat(last_maintenance) + timedelta(days=rule["days"])).isoformat()
+    if rule.get("km") is not None and service_mileage is not None:
+        due_mileage = float(service_mileage) + rule["km"]
+    return due_date, due_mileage
+
+
+def km_interval(brand: str, model: str) -> Optional[float]:
+    return rule_for(brand, model).get("km")
+
+
+def _rules_fingerprint() -> str:
+    return hashlib.sha256(json.dumps(MAINTENANCE_RULES, sort_keys=True).encode()).hexdigest()
+
+
+def _rules_need_names() -> bool:
+    return any(r.get("brand") is not None or r.get("model") is not None for r in MAINTENANCE_RULES)
+
+
+def ensure_maintenance_schedule(conn):
+    """Add the schedule columns and indexes, and recompute the schedule when the rules changed"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(scooters)")}
+    for column, kind in (("service_mileage", "REAL"), ("next_due_date", "TEXT"), ("next_due_mileage", "REAL")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE scooters ADD COLUMN {column} {kind}")
+    # Without service history, the odometer at migration time is the best known service reading
+    conn.execute("UPDATE scooters SET service_mileage = COALESCE(mileage, 0) WHERE service_mileage IS NULL")
+
+    sync_maintenance_rules(conn)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scooters_next_due_date ON scooters(next_due_date, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scooters_km_to_service ON scooters((next_due_mileage - mileage), id)")
+    conn.commit()
+
+
+def sync_maintenance_rules(conn):
+    """Recompute the schedule if MAINTENANCE_RULES changed since it was last applied (one read otherwise)"""
+    conn.execute("CREATE TABLE IF NOT EXISTS app_settings (key TEXT PRIMARY KEY, value TEXT)")
+    applied = conn.execute("SELECT value FROM app_settings WHERE key = 'maintenance_rules'").fetchone()
+    fingerprint = _rules_fingerprint()
+    if applied is None or applied[0] != fingerprint:
+        _reschedule_all(conn)
+        conn.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES ('maintenance_rules', ?)", (fingerprint,))
+        conn.commit()
+
+
+def _reschedule_all(conn):
+    """Recompute every scooter's schedule; brand/model are only decrypted when a rule names them"""
+    names = _rules_need_names()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, last_maintenance, service_mileage, {sealed_select('scooters')} FROM scooters")
+    while True:
+        rows = cursor.fetchmany(BACKFILL_BATCH_SIZE)
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            row_id, last_maintenance, service_mileage = row[:3]
+            try:
+                brand, model = open_fields("scooters", row[3:])[:2] if names else (None, None)
+                updates.append(next_due(brand, model, last_maintenance, service_mileage) + (row_id,))
+            except ValueError:
+                print(f"⚠️ Scooter {row_id} has an invalid last maintenance date '{last_maintenance}', skipped")
+        conn.executemany("UPDATE scooters SET next_due_date = ?, next_due_mileage = ? WHERE id = ?", updates)
+
+
+def _horizon(days: int, today: date = None) -> str:
+    return ((today or date.today()) + timedelta(days=days)).isoformat()
+
+
+def due_ids(conn, days: int = DUE_SOON_DAYS, km: float = DUE_SOON_KM, today: date = None,
+            limit: int = None, offset: int = 0) -> List[tuple]:
+    """(id, next_due_date, km left) of scooters due within `days` or `km`, most urgent first"""
+    return conn.execute("""
+        SELECT id, due, km_left FROM (
+            SELECT id, next_due_date AS due, next_due_mileage - mileage AS km_left
+            FROM scooters INDEXED BY idx_scooters_next_due_date WHERE next_due_date <= ?
+            UNION
+            SELECT id, next_due_date, next_due_mileage - mileage
+            FROM scooters INDEXED BY idx_scooters_km_to_service WHERE next_due_mileage - mileage <= ?
+        )
+        ORDER BY due IS NULL, due, km_left IS NULL, km_left, id
+        LIMIT ? OFFSET ?
+    """, (_horizon(days, today), km, -1 if limit is None else limit, offset)).fetchall()
+
+
+def count_due(conn, days: int = DUE_SOON_DAYS, km: float = DUE_SOON_KM, today: date = None) -> int:
+    """Number of scooters due within `days` or `km`, counted from the two indexes alone"""
+    return conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT id FROM scooters INDEXED BY idx_scooters_next_due_date WHERE next_due_date <= ?
+            UNION
+            SELECT id FROM scooters INDEXED BY idx_scooters_km_to_service WHERE next_due_mileage - mileage <= ?
+        )
+    """, (_horizon(days, today), km)).fetchone()[0]
+
+
+def maintenance_due(conn, actor: dict, days: int = DUE_SOON_DAYS, km: float = DUE_SOON_KM,
+                    limit: int = REPORT_LIMIT, offset: int = 0) -> Tuple[int, List[Tuple[Optional[str], Optional[float], Scooter]]]:
+    """(total, [(next_due_date, km left, Scooter)]) of scooters due within `days` or `km`"""
+    require_permission(actor, "search_scooter")
+    page = due_ids(conn, days, km, limit=limit, offset=offset)
+    total = count_due(conn, days, km)
+    scooters = {s.id: s for s in rows_to_scooters(fetch_rows_by_id(conn, "scooters", [h[0] for h in page])) if s is not None}
+    return total, [(due, left, scooters[i]) for i, due, left in page if i in scooters]
+
+
+def mark_serviced(conn, actor: dict, serials: Iterable[str], service_date: str = None) -> Tuple[int, List[str]]:
+    """Record a service at the current odometer for many scooters in one transaction; returns (updated, unknown serials)"""
+    require_permission(actor, "update_scooter")
+    service_date = service_date or date.today().isoformat()
+    if not is_date(service_date):
+        raise ValidationError("service_date", "Date must be in YYYY-MM-DD format.")
+    if service_date > date.today().isoformat():
+        raise ValidationError("service_date", "Service date cannot be in the future.")
+    keys = {blind_index("serial_number", s.strip()): s.strip() for s in serials if s.strip()}
+
+    found = {}
+    key_list = list(keys)
+    for start in range(0, len(key_list), ID_CHUNK_SIZE):
+        chunk = key_list[start:start + ID_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(
+                f"SELECT id, mileage, serial_bidx, {sealed_select('scooters')} FROM scooters WHERE serial_bidx IN ({placeholders})",
+                chunk):
+            brand, model = open_fields("scooters", row[3:])[:2]
+            found[row[2]] = (row[0], brand, model, row[1])
+
+    updates = [(service_date, mileage) + next_due(brand, model, service_date, mileage) + (row_id,)
+               for row_id, brand, model, mileage in found.values()]
+
+    def write(c):
+        c.executemany("""
+            UPDATE scooters SET last_maintenance = ?, service_mileage = ?, next_due_date = ?, next_due_mileage = ?
+            WHERE id = ?
+        """, updates)
+
+    username = actor["username"]
+    try:
+        write_transaction(write, conn)
+    except Exception as e:
+        log_action(username, f"Marking {len(updates)} scooter(s) serviced failed: {e}", suspicious=True)
+        raise
+    for params in updates:
+        decode_cache.invalidate("scooters", params[-1])
+    missing = sorted(serial for key, serial in keys.items() if key not in found)
+    log_action(username, f"Marked {len(updates)} scooter(s) serviced on {service_date}", suspicious=False)
+    return len(updates), missing
+
+
+def maintenance_report(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("search_scooter"):
+        print("Access denied: you do not have permission to view scooter reports.")
+        return
+    username = auth.get_current_user()["username"]
+
+    try:
+        total, hits = maintenance_due(conn, auth.get_current_user())
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception as e:
+        print("Database error while building the report.")
+        log_action(username, f"Maintenance report failed: {e}", suspicious=True)
+        return
+
+    if not hits:
+        print(f"No scooters are due for maintenance within {DUE_SOON_DAYS} days or {DUE_SOON_KM} km.")
+        return
+    today = date.today().isoformat()
+    print(f"\n{total} scooter(s) due within {DUE_SOON_DAYS} days or {DUE_SOON_KM} km, most urgent first:")
+    for due, left, s in hits:
+        status = "OVERDUE" if (due is not None and due < today) or (left is not None and left <= 0) else "due soon"
+        km_text = f"{left:.1f} km" if left is not None else "-"
+        print(f"{status:<8} | Serial: {s.serial_number} | Brand: {s.brand} | Model: {s.model} | "
+              f"Last maintenance: {s.last_maintenance} | Next due: {due or '-'} | Km left: {km_text}")
+    if total > len(hits):
+        print(f"... showing the first {len(hits)}.")
+    log_action(username, "Viewed maintenance report", suspicious=False)
+
+
+def mark_serviced_menu(conn, auth):
+    if not auth.require_authentication():
+        return
+    if not auth.can("update_scooter"):
+        print("Access denied: you do not have permission to update scooters.")
+        return
+
+    serials = input("Serial numbers (comma-separated): ").split(",")
+    while True:
+        service_date = input("Service date (YYYY-MM-DD, empty for today): ").strip()
+        if not service_date or is_date(service_date):
+            break
+        print("Date must be in YYYY-MM-DD format.")
+
+    try:
+        updated, missing = mark_serviced(conn, auth.get_current_user(), serials, service_date or None)
+    except ServiceError as e:
+        print(e)
+        return
+    except Exception:
+        print("Database error while marking scooters serviced.")
+        return
+    print(f"Marked {updated} scooter(s) serviced.")
+    if missing:
+        print(f"Unknown serial number(s): {', '.join(missing)}")
@@ -0,0 +1,10 @@
+# Maintenance intervals. The first rule whose brand/model match (None = any) applies.
+# A scooter is due when either limit is reached: `days` since last_maintenance or `km`
+# ridden since it was last serviced. Leave one of them None to use only the other.
+MAINTENANCE_RULES = [
+    {"brand": None, "model": None, "days": 180, "km": 1000},
+]
+
+# "Due this week" window of the maintenance report
+DUE_SOON_DAYS = 7
+DUE_SOON_KM = 50
@@ -0,0 +1,144 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from services.database import get_connection
+from services.errors import Overloaded
+from services.instrumentation import timed
+
+# Password hashing with a host-calibrated bcrypt cost.
+# The cost is picked so one hash takes about TARGET_MS on this machine (never below MIN_COST) and
+# stored in app_settings; every bcrypt hash carries its own cost ("$2b$12$..."), so hashes made
+# under an older setting keep verifying, and those weaker than the current cost are re-hashed on
+# the next successful login (auth_service.authenticate). A stronger hash is never downgraded.
+# bcrypt releases the GIL, so checks run on a small pool of their own: one per core, with at most
+# QUEUED_PER_WORKER more waiting per worker. Beyond that a login is rejected at once with
+# Overloaded instead of queueing, so no login waits longer than about (1 + QUEUED_PER_WORKER)
+# hash times, however large the burst.
+# bcrypt itself is imported on the first hash or check, not when a process starts.
+#
+#   python -m services.password_hashing calibrate [--target-ms N] | status
+
+TARGET_MS = 250
+DEFAULT_COST = 12        # until ensure_password_hashing has loaded the calibrated cost
+MIN_COST = DEFAULT_COST  # a slow host must not lower the cost below the default
+MAX_COST = 16
+VERIFY_WORKERS = min(4, os.cpu_count() or 1)
+QUEUED_PER_WORKER = 2
+
+_cost: Optional[int] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(VERIFY_WORKERS * (1 + QUEUED_PER_WORKER))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def _run(fn, *args):
+    """fn(*args) on the bcrypt pool, or Overloaded if its queue is full"""
+    if not _slots.acquire(blocking=False):
+        raise Overloaded("Too many logins in progress, please try again shortly.")
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def current_cost() -> int:
+    return _cost or DEFAULT_COST
+
+
+def cost_of(hashed: str) -> int:
+    """Work factor recorded in a bcrypt hash"""
+    return int(hashed.split("$")[2])
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True if hashed was made with a lower cost than the calibrated one"""
+    return _cost is not None and cost_of(hashed) < _cost
+
+
+@timed("bcrypt.hash")
+def hash_password(password: str) -> str:
+    import bcrypt
+    return _run(bcrypt.hashpw, password.encode(), bcrypt.gensalt(current_cost())).decode()
+
+
+@timed("bcrypt.verify")
+def verify_password(password: str, hashed: str) -> bool:
+    import bcrypt
+    return _run(bcrypt.checkpw, password.encode(), hashed.encode())
+
+
+def calibrate(target_ms: float = TARGET_MS) -> int:
+    """Highest cost whose hash takes at most target_ms here (each step doubles the time)"""
+    import bcrypt
+    cost = MIN_COST
+    started = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(cost))
+    elapsed = (time.perf_counter() - started) * 1000
+    while cost < MAX_COST and elapsed * 2 <= target_ms:
+        cost += 1
+        elapsed *= 2
+    return cost
+
+
+def _save_cost(conn, cost: int):
+    conn.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES ('bcrypt_cost', ?)", (str(cost),))
+    conn.commit()
+
+
+def ensure_password_hashing(conn):
+    """Load the calibrated cost, calibrating once on a database that has none yet"""
+    global _cost
+    conn.execute("CREATE TABLE IF NOT EXISTS app_settings (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute("SELECT value FROM app_settings WHERE key = 'bcrypt_cost'").fetchone()
+    if row is None:
+        _cost = calibrate()
+        _save_cost(conn, _cost)
+    else:
+        _cost = max(int(row[0]), MIN_COST)
+
+
+def cost_counts(conn) -> dict:
+    """{cost: number of users whose hash uses it}"""
+    counts = {}
+    for (hashed,) in conn.execute("SELECT password_hash FROM users"):
+        cost = cost_of(hashed)
+        counts[cost] = counts.get(cost, 0) + 1
+    return counts
+
+
+def main(argv: Optional[List[str]] = None):
+    global _cost
+    parser = argparse.ArgumentParser(description="Calibrate the bcrypt cost for this host")
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("calibrate", help="measure this host and store the new cost")
+    run.add_argument("--target-ms", type=float, default=TARGET_MS)
+    commands.add_parser("status", help="calibrated cost and the costs of stored hashes")
+    args = parser.parse_args(argv)
+    conn = get_connection(args.db)
+    ensure_password_hashing(conn)
+
+    if args.command == "calibrate":
+        previous = _cost
+        _cost = calibrate(args.target_ms)
+        _save_cost(conn, _cost)
+        print(f"bcrypt cost {previous} -> {_cost}; existing hashes are upgraded at each user's next login.")
+    else:
+        print(f"Calibrated cost {_cost}")
+        for cost, count in sorted(cost_counts(conn).items()):
+            print(f"  cost {cost}: {count} user(s)")
+
+
+if __name__ == "__main__":
+    main()
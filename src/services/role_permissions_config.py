@@ -20,6 +20,10 @@ ROLE_PERMISSIONS = {
         "delete_engineer": True,
         "reset_engineer_password": True,
 
+        "export_scooters": True,
+        "export_travellers": True,
+        "export_logs": True,
+
         "view_logs": True,
         "generate_restore_code": True,
         "use_restore_code": False,  # only sysadmin can use the code
@@ -47,6 +51,10 @@ ROLE_PERMISSIONS = {
         "delete_engineer": True,
         "reset_engineer_password": True,
 
+        "export_scooters": True,
+        "export_travellers": True,
+        "export_logs": True,
+
         "view_logs": True,
         "generate_restore_code": False,
         "use_restore_code": True,   # only sysadmin may use code to restore
@@ -74,6 +82,10 @@ ROLE_PERMISSIONS = {
         "delete_engineer": False,
         "reset_engineer_password": False,
 
+        "export_scooters": True,
+        "export_travellers": False,
+        "export_logs": False,
+
         "view_logs": False,
         "generate_restore_code": False,
         "use_restore_code": False,
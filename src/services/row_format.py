@@ -0,0 +1,136 @@
+import argparse
+import time
+from typing import Callable, List, Optional
+from modelEncryption.bulk_decode import decode_rows
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.sealed_rows import SEAL_COLUMN, SEALED_COLUMNS, open_fields, seal_fields
+from services.database import get_connection, write_transaction
+from services.key_rotation import BATCH_SIZE, Throttle
+from services.logCRUD import log_action
+
+# Converts stored rows between the formats of modelEncryption.sealed_rows.
+#   status                  rows per table in each format, and the database size
+#   migrate --to FORMAT     rewrites every row that is not in FORMAT yet ("sealed" or "fields")
+#
+# Same batch walk as key_rotation: rows are opened and re-encoded on the bulk_decode pool and each
+# UPDATE only applies if the row still holds what was read, so a concurrent edit wins. Rows already
+# in the target format are skipped, which makes an interrupted run safe to repeat. New writes use
+# sealed_rows.ROW_FORMAT, so set that to the target format first. --vacuum rebuilds the file
+# afterwards to hand the space freed by sealing back to the filesystem.
+#
+#   python -m services.row_format status | migrate --to sealed [--max-rows-per-sec N] [--vacuum]
+
+FORMATS = ("sealed", "fields")
+
+
+def _format_filter(table: str, target: str) -> str:
+    column = SEAL_COLUMN[table]
+    return f"typeof({column}) != 'blob'" if target == "sealed" else f"typeof({column}) = 'blob'"
+
+
+def format_counts(conn) -> dict:
+    """{table: (sealed rows, field-token rows)}"""
+    counts = {}
+    for table, column in SEAL_COLUMN.items():
+        sealed, total = conn.execute(
+            f"SELECT COALESCE(SUM(typeof({column}) = 'blob'), 0), COUNT(*) FROM {table}").fetchone()
+        counts[table] = (sealed, total - sealed)
+    return counts
+
+
+def database_size(conn) -> int:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_size * pages
+
+
+def _convert_row(table: str, target: str, row: tuple) -> tuple:
+    """(new values..., id, old values...) for a conditional UPDATE"""
+    row_id, stored = row[0], row[1:]
+    return seal_fields(table, open_fields(table, stored), target) + (row_id,) + stored
+
+
+def migrate_table(conn, table: str, target: str, batch_size: int = BATCH_SIZE, workers: int = None,
+                  throttle: Throttle = None, progress: Callable = None) -> tuple:
+    """Convert one table to `target`; returns (converted, skipped, failed)"""
+    columns = SEALED_COLUMNS[table]
+    assignments = ", ".join(f"{c} = ?" for c in columns)
+    unchanged = " AND ".join(f"{c} IS ?" for c in columns)
+    pending = _format_filter(table, target)
+    total = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {pending}").fetchone()[0]
+    converted = skipped = failed = seen = 0
+    last_id = 0
+
+    while True:
+        rows = conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > ? AND {pending} ORDER BY id LIMIT ?",
+            (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        results = decode_rows(rows, lambda row: _convert_row(table, target, row), workers)
+        updates = [r for r in results if r is not None]
+        applied = write_transaction(
+            lambda c: c.executemany(f"UPDATE {table} SET {assignments} WHERE id = ? AND {unchanged}", updates).rowcount,
+            conn)
+        converted += applied
+        skipped += len(updates) - applied
+        failed += len(rows) - len(updates)
+        last_id = rows[-1][0]
+        seen += len(rows)
+        if progress:
+            progress(table, seen, total)
+        if throttle:
+            throttle.wait(len(rows))
+    return converted, skipped, failed
+
+
+def migrate(conn, target: str, batch_size: int = BATCH_SIZE, workers: int = None, max_rows_per_sec: float = None,
+            progress: Callable = None) -> dict:
+    """Convert every table to `target`; returns {table: (converted, skipped, failed)}"""
+    if target not in FORMATS:
+        raise ValueError(f"Unknown row format: {target}")
+    throttle = Throttle(max_rows_per_sec)
+    results = {table: migrate_table(conn, table, target, batch_size, workers, throttle, progress)
+               for table in SEALED_COLUMNS}
+    decode_cache.clear()
+    return results
+
+
+def _print_progress(table, done, total):
+    if done == total or done % (BATCH_SIZE * 20) == 0:
+        print(f"  {table}: {done}/{total}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert stored rows between field tokens and sealed rows")
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="rows per format")
+    run = commands.add_parser("migrate", help="convert all rows (resumable)")
+    run.add_argument("--to", choices=FORMATS, default="sealed")
+    run.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    run.add_argument("--workers", type=int, default=None)
+    run.add_argument("--max-rows-per-sec", type=float, default=None, help="throttle for running next to live traffic")
+    run.add_argument("--vacuum", action="store_true", help="compact the database file afterwards")
+    args = parser.parse_args(argv)
+    conn = get_connection(args.db)
+
+    if args.command == "status":
+        for table, (sealed, fields) in format_counts(conn).items():
+            print(f"  {table}: {sealed} sealed, {fields} field tokens")
+        print(f"Database size {database_size(conn) / 1e6:.1f} MB")
+        return
+
+    before = database_size(conn)
+    started = time.monotonic()
+    results = migrate(conn, args.to, args.batch_size, args.workers, args.max_rows_per_sec, _print_progress)
+    for table, (converted, skipped, failed) in results.items():
+        print(f"{table}: converted {converted}, changed concurrently {skipped}, failed {failed}")
+    if args.vacuum:
+        conn.execute("VACUUM")
+    print(f"Done in {time.monotonic() - started:.1f}s, {before / 1e6:.1f} MB -> {database_size(conn) / 1e6:.1f} MB.")
+    log_action("SYSTEM", f"Rows migrated to the {args.to} format", suspicious=False, conn=conn)
+
+
+if __name__ == "__main__":
+    main()
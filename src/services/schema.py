@@ -0,0 +1,56 @@
+from services.backup_restore import ensure_restore_codes
+from services.blind_index import ensure_blind_indexes
+from services.charging import ensure_soc_bounds
+from services.fleet_snapshot import ensure_change_tracking
+from services.logCRUD import ensure_log_indexes
+from services.login_throttle import ensure_login_throttle
+from services.maintenance import ensure_maintenance_schedule, sync_maintenance_rules
+from services.password_hashing import ensure_password_hashing
+from services.search_index import ensure_search_index
+from services.session_manager import ensure_sessions
+from services.spatial_index import ensure_spatial_index
+
+# The one list of schema steps every entry point runs (Main, init_db, the API server, restore).
+# The steps are idempotent but not free: each inspects table_info and several scan for rows to
+# backfill. PRAGMA user_version records the SCHEMA_VERSION a database has been brought to, so a
+# launch against an up-to-date database skips them all and only loads its per-process settings.
+# Bump SCHEMA_VERSION whenever a step is added or changes what it creates.
+
+SCHEMA_VERSION = 3
+
+MIGRATIONS = [
+    ensure_blind_indexes,          # blind-index digest columns for equality lookups on encrypted fields
+    ensure_search_index,           # keyed trigram index for substring search
+    ensure_spatial_index,          # keyed grid-cell digest for location queries
+    ensure_log_indexes,            # plaintext timestamp / suspicious-flag indexes for the log viewer
+    ensure_change_tracking,        # change sequence on scooters for incremental snapshot / spatial index refresh
+    ensure_soc_bounds,             # integer target SoC bounds for the charging report
+    ensure_maintenance_schedule,   # next-due columns and indexes for the maintenance report
+    ensure_restore_codes,          # single-use restore codes issued by the super admin
+    ensure_login_throttle,         # shared login throttle buckets
+    ensure_sessions,               # login sessions (hashed tokens) shared by all processes
+]
+
+# Run on every launch: each costs a single read once the database is set up
+SETTINGS = [
+    ensure_password_hashing,       # bcrypt cost calibrated to this host
+    sync_maintenance_rules,        # reschedule if maintenance_config changed
+]
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def ensure_schema(conn, force: bool = False) -> bool:
+    """Run the schema steps if the database is behind SCHEMA_VERSION (or force), then load the
+    settings; returns True if the steps ran"""
+    migrate = force or schema_version(conn) < SCHEMA_VERSION
+    if migrate:
+        for ensure in MIGRATIONS:
+            ensure(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    for load in SETTINGS:
+        load(conn)
+    return migrate
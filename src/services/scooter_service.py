@@ -0,0 +1,189 @@
+import math
+from datetime import datetime
+from typing import Iterator, List, Tuple
+from models.scooter import Scooter
+from modelEncryption.scooterEncryption import scooter_to_encrypted_row, row_to_scooter, rows_to_scooters, iter_rows_to_scooters
+from modelEncryption.decode_cache import decode_cache
+from services.auth_service import require_permission
+from services.blind_index import blind_index
+from services.charging import soc_bounds
+from services.database import write_transaction
+from services.errors import Conflict, NotFound, PermissionDenied, ValidationError
+from services.logCRUD import log_action
+from services.maintenance import km_interval, next_due
+from services.search_index import candidate_ids, fetch_rows_by_id, index_row, remove_row, scooter_search_texts
+from services.spatial_index import cell_bidx, nearest_scooters as spatial_nearest, scooters_within_radius
+from services.stream_utils import iter_cursor, limit_offset
+from services.validators import LATITUDE_RANGE, LONGITUDE_RANGE, SCOOTER_RULES, validate_fields
+
+# Scooter operations without any terminal I/O: validated arguments in, models out,
+# ServiceError subclasses for anything the caller should report.
+
+# Role-based editable fields
+EDITABLE_FIELDS = {
+    "engineer": {
+        "top_speed", "battery_capacity", "soc", "target_soc_range",
+        "latitude", "longitude", "out_of_service", "mileage", "last_maintenance"
+    },
+    "superadmin": {
+        "brand", "model", "serial_number", "top_speed", "battery_capacity", "soc",
+        "target_soc_range", "latitude", "longitude", "out_of_service", "mileage", "last_maintenance"
+    }
+}
+EDITABLE_FIELDS["sysadmin"] = EDITABLE_FIELDS["superadmin"]
+
+
+def editable_fields(role: str) -> set:
+    return EDITABLE_FIELDS.get(role, set())
+
+
+def get_scooter(conn, serial: str) -> Scooter:
+    row = conn.execute("SELECT * FROM scooters WHERE serial_bidx = ?", (blind_index("serial_number", serial),)).fetchone()
+    if not row:
+        raise NotFound("Scooter not found.")
+    return row_to_scooter(row)
+
+
+def _write_scooter(conn, s: Scooter):
+    """Insert (id None) or update one scooter together with its blind, search, geo and maintenance columns"""
+    indexes = (blind_index("serial_number", s.serial_number), cell_bidx(float(s.latitude), float(s.longitude))) \
+        + soc_bounds(s.target_soc_range)
+    due_date, due_mileage = next_due(s.brand, s.model, s.last_maintenance, s.mileage)
+    if s.id is None:
+        cursor = conn.execute('''
+            INSERT INTO scooters (
+                brand, model, serial_number, top_speed,
+                battery_capacity, soc, target_soc_range,
+                latitude, longitude, out_of_service,
+                mileage, last_maintenance, in_service_date, serial_bidx, geo_cell_bidx,
+                soc_min, soc_max, service_mileage, next_due_date, next_due_mileage
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', scooter_to_encrypted_row(s)[1:] + indexes + (s.mileage, due_date, due_mileage))
+        s.id = cursor.lastrowid
+    else:
+        # A new last_maintenance date counts as a service at the current odometer reading
+        serviced = "CASE WHEN last_maintenance IS ? THEN service_mileage ELSE ? END"
+        conn.execute(f'''
+            UPDATE scooters SET
+                brand = ?, model = ?, serial_number = ?, top_speed = ?, battery_capacity = ?,
+                soc = ?, target_soc_range = ?, latitude = ?, longitude = ?, out_of_service = ?,
+                mileage = ?, last_maintenance = ?, serial_bidx = ?, geo_cell_bidx = ?,
+                soc_min = ?, soc_max = ?, next_due_date = ?,
+                next_due_mileage = {serviced} + ?, service_mileage = {serviced}
+            WHERE id = ?
+        ''', scooter_to_encrypted_row(s)[1:-1] + indexes + (
+            due_date, s.last_maintenance, s.mileage, km_interval(s.brand, s.model),
+            s.last_maintenance, s.mileage, s.id))
+    index_row(conn, "scooters", s.id, scooter_search_texts(
+        s.brand, s.model, s.serial_number, s.latitude, s.longitude))
+
+
+def create_scooter(conn, actor: dict, data: dict) -> Scooter:
+    require_permission(actor, "create_scooter")
+    fields = validate_fields(SCOOTER_RULES, data)
+    scooter = Scooter(id=None, in_service_date=datetime.now(), **fields)
+    try:
+        write_transaction(lambda c: _write_scooter(c, scooter), conn)
+    except Exception as e:
+        log_action(actor["username"], f"Failed to add scooter {scooter.serial_number}: {e}", suspicious=True)
+        if "UNIQUE" in str(e):
+            raise Conflict("A scooter with this serial number already exists.")
+        raise
+    decode_cache.invalidate("scooters", scooter.id)
+    log_action(actor["username"], f"Added scooter {scooter.serial_number}", suspicious=False)
+    return scooter
+
+
+def update_scooter(conn, actor: dict, serial: str, changes: dict) -> Scooter:
+    require_permission(actor, "update_scooter")
+    allowed = editable_fields(actor.get("role"))
+    forbidden = sorted(set(changes) - allowed)
+    if forbidden:
+        raise PermissionDenied(f"Access denied: you may not edit {', '.join(forbidden)}.")
+    fields = validate_fields(SCOOTER_RULES, changes, required=False)
+
+    scooter = get_scooter(conn, serial)
+    for k, v in fields.items():
+        setattr(scooter, k, v)
+    try:
+        write_transaction(lambda c: _write_scooter(c, scooter), conn)
+    except Exception as e:
+        log_action(actor["username"], f"Error updating scooter {serial}: {e}", suspicious=True)
+        if "UNIQUE" in str(e):
+            raise Conflict("A scooter with this serial number already exists.")
+        raise
+    decode_cache.invalidate("scooters", scooter.id)
+    log_action(actor["username"], f"Updated scooter {serial}", suspicious=False)
+    return scooter
+
+
+def delete_scooter(conn, actor: dict, serial: str):
+    require_permission(actor, "delete_scooter")
+    scooter = get_scooter(conn, serial)
+
+    def write(c):
+        c.execute("DELETE FROM scooters WHERE id = ?", (scooter.id,))
+        remove_row(c, "scooters", scooter.id)
+
+    try:
+        write_transaction(write, conn)
+    except Exception as e:
+        log_action(actor["username"], f"Error deleting scooter {serial}: {e}", suspicious=True)
+        raise
+    decode_cache.invalidate("scooters", scooter.id)
+    log_action(actor["username"], f"Deleted scooter {serial}", suspicious=False)
+
+
+def iter_scooter_matches(conn, term: str, limit: int = None, offset: int = 0) -> Iterator[Scooter]:
+    """Stream scooters whose brand/model/serial/GPS contains term, stopping once limit matches are produced"""
+    term = term.strip().lower()
+    # Trigram index narrows the scan to candidate rows; terms under 3 chars fall back to a full scan
+    ids = candidate_ids(conn, "scooters", term)
+    if ids is None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM scooters ORDER BY id")
+        rows = iter_cursor(cursor)
+    else:
+        rows = fetch_rows_by_id(conn, "scooters", ids)
+
+    def matches(scooter):
+        searchable = " ".join([
+            scooter.brand,
+            scooter.model,
+            scooter.serial_number,
+            str(scooter.latitude),
+            str(scooter.longitude)
+        ]).lower()
+        return term in searchable
+
+    found = (s for s in iter_rows_to_scooters(rows) if s is not None and matches(s))
+    return limit_offset(found, limit, offset)
+
+
+def search_scooters(conn, actor: dict, term: str, limit: int = None, offset: int = 0) -> Iterator[Scooter]:
+    require_permission(actor, "search_scooter")
+    term = term.strip().lower()
+    if not term:
+        raise ValidationError("term", "Search term cannot be empty.")
+    log_action(actor["username"], f"Searched scooters with term '{term}'", suspicious=False)
+    return iter_scooter_matches(conn, term, limit, offset)
+
+
+def nearby_scooters(conn, actor: dict, lat: float, lon: float, n: int = None,
+                    radius_km: float = None) -> List[Tuple[float, Scooter]]:
+    """(distance_km, Scooter) pairs: the n nearest, or all within radius_km"""
+    require_permission(actor, "search_scooter")
+    if (n is None) == (radius_km is None):
+        raise ValidationError("query", "Give either a count or a radius.")
+    if n is not None and not 0 < n <= 100:
+        raise ValidationError("n", "Enter number between 1 and 100.")
+    if radius_km is not None and not 0 < radius_km <= 50:
+        raise ValidationError("radius_km", "Enter a radius between 0 and 50 km.")
+    for field, value, (low, high) in (("lat", lat, LATITUDE_RANGE), ("lon", lon, LONGITUDE_RANGE)):
+        if not (math.isfinite(value) and low <= value <= high):
+            raise ValidationError(field, f"Must be inside the service area ({low:.5f}–{high:.5f}).")
+
+    hits = spatial_nearest(conn, lat, lon, n) if n is not None else scooters_within_radius(conn, lat, lon, radius_km)
+    scooters = {s.id: s for s in rows_to_scooters(fetch_rows_by_id(conn, "scooters", [i for _, i in hits])) if s is not None}
+    log_action(actor["username"], f"Searched scooters near ({lat}, {lon})", suspicious=False)
+    return [(d, scooters[i]) for d, i in hits if i in scooters]
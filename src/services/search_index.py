@@ -0,0 +1,164 @@
+import argparse
+import functools
+import hashlib
+import hmac
+from typing import Iterable, List, Optional
+from modelEncryption.sealed_rows import open_fields, sealed_select
+from services.crypto_utils import derive_key
+from services.database import get_connection, write_transaction
+
+# Keyed trigram index for substring search over encrypted columns.
+# Every row stores HMAC(trigram) digests of its searchable text in search_grams; a query
+# term is split into the same trigrams, the matching row ids are intersected in SQL and
+# only those candidate rows are decrypted and re-checked by the caller.
+
+GRAM_SIZE = 3
+ID_CHUNK_SIZE = 500
+REBUILD_BATCH_SIZE = 1000
+
+
+def scooter_search_texts(brand, model, serial_number, latitude, longitude) -> List[str]:
+    # Same combined string search_scooters matches against, so cross-field terms still hit
+    return [" ".join([brand, model, serial_number, str(latitude), str(longitude)])]
+
+
+def traveller_search_texts(first_name, last_name, city, email) -> List[str]:
+    return [f"{first_name} {last_name}", city, email]
+
+
+def trigrams(text: str) -> set:
+    text = text.lower()
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+@functools.lru_cache(maxsize=1 << 16)  # trigrams repeat heavily across rows (digits, common words)
+def gram_digest(entity: str, gram: str) -> int:
+    """64-bit keyed digest of a trigram, stored as a signed SQLite INTEGER"""
+    digest = hmac.new(derive_key("search-index"), f"{entity}\x00{gram}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def _create_search_tables(conn) -> bool:
+    """Create the gram table if needed, return True if it did not exist yet"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_grams'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_grams (
+            entity TEXT NOT NULL,
+            gram INTEGER NOT NULL,
+            row_id INTEGER NOT NULL,
+            PRIMARY KEY (entity, gram, row_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_search_grams_row ON search_grams(entity, row_id)")
+    conn.commit()
+    return exists is None
+
+
+def ensure_search_index(conn):
+    """Create the gram table; on first creation index whatever data already exists"""
+    if _create_search_tables(conn):
+        rebuild_search_index(conn)
+        conn.commit()
+
+
+def row_grams(entity: str, texts: Iterable[str]) -> List[int]:
+    """Keyed digests of every trigram in texts, ready to store for one row"""
+    grams = set()
+    for text in texts:
+        grams |= trigrams(text)
+    return [gram_digest(entity, g) for g in grams]
+
+
+def insert_grams(conn, entity: str, rows: Iterable):
+    """Store precomputed (row_id, digests) pairs for rows that have no grams yet"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO search_grams (entity, gram, row_id) VALUES (?, ?, ?)",
+        ((entity, digest, row_id) for row_id, digests in rows for digest in digests)
+    )
+
+
+def index_row(conn, entity: str, row_id: int, texts: Iterable[str]):
+    """Replace the grams of one row; the caller commits together with the data change"""
+    remove_row(conn, entity, row_id)
+    insert_grams(conn, entity, [(row_id, row_grams(entity, texts))])
+
+
+def remove_row(conn, entity: str, row_id: int):
+    conn.execute("DELETE FROM search_grams WHERE entity = ? AND row_id = ?", (entity, row_id))
+
+
+def candidate_ids(conn, entity: str, term: str) -> Optional[List[int]]:
+    """Row ids whose text contains every trigram of term, or None if term is too short to use the index"""
+    grams = trigrams(term)
+    if not grams:
+        return None
+    digests = [gram_digest(entity, g) for g in grams]
+    placeholders = ", ".join("?" * len(digests))
+    rows = conn.execute(f"""
+        SELECT row_id FROM search_grams
+        WHERE entity = ? AND gram IN ({placeholders})
+        GROUP BY row_id
+        HAVING COUNT(*) = ?
+    """, (entity, *digests, len(digests))).fetchall()
+    return [r[0] for r in rows]
+
+
+def fetch_rows_by_id(conn, table: str, ids: List[int], columns: str = "*"):
+    """Yield rows for the given ids in id order, chunked to stay under SQLite's variable limit"""
+    ids = sorted(ids)
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        yield from conn.execute(f"SELECT {columns} FROM {table} WHERE id IN ({placeholders}) ORDER BY id", chunk)
+
+
+def _rebuild_entity(conn, entity: str, query: str, to_texts) -> int:
+    conn.execute("DELETE FROM search_grams WHERE entity = ?", (entity,))
+    cursor = conn.cursor()
+    cursor.execute(query)
+    count = 0
+    while True:
+        rows = cursor.fetchmany(REBUILD_BATCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            try:
+                index_row(conn, entity, row[0], to_texts(open_fields(entity, row[1:])))
+                count += 1
+            except Exception:
+                print(f"⚠️ Could not decrypt {entity} row {row[0]}, not indexed")
+    return count
+
+
+def rebuild_search_index(conn) -> dict:
+    """Drop and re-create the grams for all scooters and travellers; the caller commits"""
+    counts = {
+        "scooters": _rebuild_entity(
+            conn, "scooters",
+            f"SELECT id, {sealed_select('scooters')} FROM scooters",
+            lambda v: scooter_search_texts(*v)
+        ),
+        "travellers": _rebuild_entity(
+            conn, "travellers",
+            f"SELECT id, {sealed_select('travellers')} FROM travellers",
+            lambda v: traveller_search_texts(v[0], v[1], v[5], v[6])
+        ),
+    }
+    return counts
+
+
+def main(argv: Optional[List[str]] = None):
+    from services.schema import ensure_schema   # schema imports this module
+    parser = argparse.ArgumentParser(description="Rebuild the keyed search index")
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    args = parser.parse_args(argv)
+    conn = get_connection(args.db)
+    ensure_schema(conn)
+    counts = write_transaction(rebuild_search_index, conn)
+    print(f"Search index rebuilt: {counts['scooters']} scooters, {counts['travellers']} travellers")
+
+
+if __name__ == "__main__":
+    main()
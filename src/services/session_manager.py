@@ -0,0 +1,223 @@
+import atexit
+import hashlib
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from models.user import User
+from modelEncryption.userEncryption import row_to_user
+from services.auth_service import USER_COLUMNS, find_user, require_permission
+from services.blind_index import blind_index
+from services.database import close_connection, get_connection, write_transaction
+from services.errors import NotFound
+from services.logCRUD import log_action
+from services.role_permissions_config import ROLE_PERMISSIONS
+
+# Login sessions shared by every process on the database.
+# A session token is random and handed to the client once; the sessions table stores only its
+# SHA-256 next to the user's username digest. Each process caches the sessions it has resolved
+# (actor, role and permission set), so checking a request is a dict lookup. A cached session is
+# re-read from the table every CHECK_INTERVAL seconds, together with the user's current role,
+# which is how a revocation, role change or deleted account made elsewhere reaches this process.
+# Expiry slides: every use pushes it IDLE_TIMEOUT ahead (written back at that same re-read), up
+# to MAX_LIFETIME after login. A background sweeper deletes expired rows and evicts them here.
+
+IDLE_TIMEOUT = 1800        # 30 minutes without a request
+MAX_LIFETIME = 12 * 3600
+CHECK_INTERVAL = 30
+SWEEP_INTERVAL = 60
+
+
+@dataclass
+class Session:
+    token_hash: str
+    actor: dict                # username, role, first_name, last_name, login_time
+    permissions: frozenset
+    created_at: float
+    expires_at: float
+    checked_at: float
+
+    def can(self, action: str) -> bool:
+        return action in self.permissions
+
+
+_USER_SELECT = ", ".join(f"u.{column.strip()}" for column in USER_COLUMNS.split(","))
+_cache: Dict[str, Session] = {}
+_cache_lock = threading.Lock()
+
+
+def ensure_sessions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            token_hash TEXT PRIMARY KEY,
+            username_bidx TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username_bidx ON sessions(username_bidx)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)")
+    conn.commit()
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _session(token_hash: str, user: User, created_at: float, expires_at: float, now: float) -> Session:
+    actor = {"username": user.username, "role": user.role, "first_name": user.first_name,
+             "last_name": user.last_name, "login_time": created_at}
+    permissions = frozenset(a for a, allowed in ROLE_PERMISSIONS.get(user.role, {}).items() if allowed)
+    return Session(token_hash, actor, permissions, created_at, expires_at, now)
+
+
+def create_session(conn, user: User) -> str:
+    """Start a session for an authenticated user; returns its token"""
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    session = _session(_hash(token), user, now, now + IDLE_TIMEOUT, now)
+    write_transaction(lambda c: c.execute(
+        "INSERT INTO sessions (token_hash, username_bidx, created_at, expires_at) VALUES (?, ?, ?, ?)",
+        (session.token_hash, blind_index("username", user.username), now, session.expires_at)), conn)
+    with _cache_lock:
+        _cache[session.token_hash] = session
+    return token
+
+
+def _reload(conn, token_hash: str, expires_at: float, now: float) -> Optional[Session]:
+    """Re-read a session and its user, storing the slid expiry; None if it is gone or expired"""
+    row = conn.execute(f"""
+        SELECT s.created_at, s.expires_at, {_USER_SELECT}
+        FROM sessions s JOIN users u ON u.username_bidx = s.username_bidx
+        WHERE s.token_hash = ?
+    """, (token_hash,)).fetchone()
+    if row is None:
+        return None
+    created_at = row[0]
+    # The stored expiry lags the uses since the last re-read, which only slid the cached one
+    if min(max(expires_at, row[1]), created_at + MAX_LIFETIME) <= now:
+        return None
+    expires_at = min(now + IDLE_TIMEOUT, created_at + MAX_LIFETIME)
+    if expires_at > row[1]:
+        write_transaction(lambda c: c.execute(
+            "UPDATE sessions SET expires_at = ? WHERE token_hash = ?", (expires_at, token_hash)), conn)
+    return _session(token_hash, row_to_user(row[2:]), created_at, expires_at, now)
+
+
+def resolve(conn, token: str) -> Optional[Session]:
+    """The live session for token (its expiry pushed forward), or None"""
+    if not token:
+        return None
+    token_hash = _hash(token)
+    now = time.time()
+    with _cache_lock:
+        session = _cache.get(token_hash)
+    if session is not None and session.expires_at <= now:
+        session = None
+    elif session is None or now - session.checked_at >= CHECK_INTERVAL:
+        session = _reload(conn, token_hash, session.expires_at if session else 0.0, now)
+    if session is None:
+        with _cache_lock:
+            _cache.pop(token_hash, None)
+        return None
+    session.expires_at = min(now + IDLE_TIMEOUT, session.created_at + MAX_LIFETIME)
+    with _cache_lock:
+        _cache[token_hash] = session
+    return session
+
+
+def revoke(conn, token: str):
+    """End one session (logout)"""
+    token_hash = _hash(token)
+    write_transaction(lambda c: c.execute("DELETE FROM sessions WHERE token_hash = ?", (token_hash,)), conn)
+    with _cache_lock:
+        _cache.pop(token_hash, None)
+
+
+def end_user_sessions(conn, username: str, keep_token: str = None) -> int:
+    """End every session of username but keep_token's; returns how many were ended"""
+    keep = _hash(keep_token) if keep_token else ""
+    ended = write_transaction(lambda c: c.execute(
+        "DELETE FROM sessions WHERE username_bidx = ? AND token_hash != ?",
+        (blind_index("username", username), keep)).rowcount, conn)
+    with _cache_lock:
+        for token_hash in [h for h, s in _cache.items() if s.actor["username"] == username and h != keep]:
+            del _cache[token_hash]
+    return ended
+
+
+def revoke_user_sessions(conn, actor: dict, username: str) -> int:
+    """Log username out everywhere: allowed for oneself, or for an account the actor may update"""
+    username = username.strip().lower()
+    if username != actor["username"]:
+        user = find_user(conn, username)
+        if user is None:
+            raise NotFound(f"User '{username}' not found.")
+        require_permission(actor, f"update_{user.role}")
+    ended = end_user_sessions(conn, username)
+    log_action(actor["username"], f"Revoked {ended} session(s) of '{username}'", suspicious=False)
+    return ended
+
+
+def sweep(conn) -> int:
+    """Delete expired sessions and evict them from the cache; returns the number of rows removed"""
+    now = time.time()
+    removed = write_transaction(lambda c: c.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount, conn)
+    with _cache_lock:
+        for token_hash in [h for h, s in _cache.items() if s.expires_at <= now]:
+            del _cache[token_hash]
+    return removed
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+class SessionSweeper:
+    def __init__(self, db_path: str = None, interval: float = SWEEP_INTERVAL):
+        self.db_path = db_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        conn = get_connection(self.db_path)
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    sweep(conn)
+                except Exception as e:
+                    print(f"⚠️ Session sweep failed: {e}")
+        finally:
+            close_connection(self.db_path)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_session_sweeper(db_path: str = None) -> SessionSweeper:
+    """Start the process-wide sweeper (idempotent)"""
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = SessionSweeper(db_path)
+        return _sweeper
+
+
+def stop_session_sweeper():
+    global _sweeper
+    with _sweeper_lock:
+        sweeper, _sweeper = _sweeper, None
+    if sweeper is not None:
+        sweeper.close()
+
+
+atexit.register(stop_session_sweeper)
@@ -0,0 +1,247 @@
+import heapq
+import math
+import threading
+from collections import defaultdict
+from typing import List, Optional, Tuple
+from services.blind_index import blind_index
+from services.errors import ServiceError
+from modelEncryption.sealed_rows import open_fields, sealed_select
+
+# Coordinates are stored encrypted, so SQLite cannot range-scan them.
+# Two layers make location queries sub-linear:
+#  - geo_cell_bidx: keyed digest of the quantized grid cell, indexed, so a radius query
+#    only decrypts rows in the cells the circle overlaps
+#  - SpatialIndex: in-memory grid buckets over decrypted coordinates for repeated
+#    nearest / radius queries. Each query first reads the scooters change counter (see
+#    fleet_snapshot.ensure_change_tracking) and re-reads only rows changed since, so inserts,
+#    moves and deletes made by any process (telemetry, bulk import, restore) are seen.
+
+CELL_SIZE = 0.005  # degrees, roughly 550m north-south around Rotterdam
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+BACKFILL_BATCH_SIZE = 1000
+
+
+def cell_of(lat: float, lon: float, cell_size: float = CELL_SIZE) -> Tuple[int, int]:
+    return math.floor(lat / cell_size), math.floor(lon / cell_size)
+
+
+def _coordinates(stored) -> Tuple[float, float]:
+    """(lat, lon) from the stored sensitive columns of a scooter row"""
+    _, _, _, lat, lon = open_fields("scooters", stored)
+    return float(lat), float(lon)
+
+
+def cell_bidx(lat: float, lon: float) -> str:
+    ci, cj = cell_of(lat, lon)
+    return blind_index("geo_cell", f"{ci}:{cj}")
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def cells_in_radius(lat: float, lon: float, radius_km: float, cell_size: float = CELL_SIZE):
+    """All grid cells the circle's bounding box overlaps"""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    i0, j0 = cell_of(lat - dlat, lon - dlon, cell_size)
+    i1, j1 = cell_of(lat + dlat, lon + dlon, cell_size)
+    return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+
+class SpatialIndex:
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(dict)  # (ci, cj) -> {scooter_id: (lat, lon)}
+        self.positions = {}             # scooter_id -> (lat, lon, cell)
+        self.version = None             # scooters change counter the index reflects (None: not loaded)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, scooter_id: int, lat: float, lon: float):
+        with self._lock:
+            self.remove(scooter_id)
+            cell = cell_of(lat, lon, self.cell_size)
+            self.cells[cell][scooter_id] = (lat, lon)
+            self.positions[scooter_id] = (lat, lon, cell)
+
+    def remove(self, scooter_id: int):
+        with self._lock:
+            entry = self.positions.pop(scooter_id, None)
+            if entry is None:
+                return
+            bucket = self.cells[entry[2]]
+            bucket.pop(scooter_id, None)
+            if not bucket:
+                del self.cells[entry[2]]
+
+    def refresh(self, conn) -> int:
+        """Catch up with changes made by any process since the last refresh; returns rows re-read.
+        One counter read when nothing changed."""
+        latest = conn.execute("SELECT value FROM change_counters WHERE name = 'scooters'").fetchone()
+        if latest is None:
+            raise ServiceError("Change tracking is not set up; run ensure_change_tracking first.")
+        latest = latest[0]
+        with self._lock:
+            if latest == self.version:
+                return 0
+            if self.version is None or latest < self.version:
+                # First load, or the counter went back (restore): start over
+                self.cells.clear()
+                self.positions.clear()
+                since = -1
+            else:
+                since = self.version
+            cursor = conn.execute(f"SELECT id, {sealed_select('scooters')} FROM scooters "
+                                  f"WHERE change_seq > ? AND change_seq <= ?", (since, latest))
+            changed = 0
+            for row in cursor:
+                changed += 1
+                try:
+                    self.add(row[0], *_coordinates(row[1:]))
+                except Exception:
+                    self.remove(row[0])
+            # Deletes only move the counter; drop ids that are gone
+            if len(self.positions) != conn.execute("SELECT COUNT(*) FROM scooters").fetchone()[0]:
+                live = {r[0] for r in conn.execute("SELECT id FROM scooters")}
+                for scooter_id in [i for i in self.positions if i not in live]:
+                    self.remove(scooter_id)
+            self.version = latest
+            return changed
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, int]]:
+        """(distance_km, scooter_id) pairs inside the radius, closest first"""
+        hits = []
+        with self._lock:
+            for cell in cells_in_radius(lat, lon, radius_km, self.cell_size):
+                for scooter_id, (slat, slon) in self.cells.get(cell, {}).items():
+                    d = haversine_km(lat, lon, slat, slon)
+                    if d <= radius_km:
+                        hits.append((d, scooter_id))
+        hits.sort()
+        return hits
+
+    def _ring(self, center: Tuple[int, int], k: int):
+        ci, cj = center
+        if k == 0:
+            yield center
+            return
+        for j in range(cj - k, cj + k + 1):
+            yield ci - k, j
+            yield ci + k, j
+        for i in range(ci - k + 1, ci + k):
+            yield i, cj - k
+            yield i, cj + k
+
+    def _scan(self, lat: float, lon: float, n: int) -> List[Tuple[float, int]]:
+        return heapq.nsmallest(n, ((haversine_km(lat, lon, slat, slon), scooter_id)
+                                   for scooter_id, (slat, slon, _) in self.positions.items()))
+
+    def nearest(self, lat: float, lon: float, n: int = 5) -> List[Tuple[float, int]]:
+        """The n closest scooters, found by expanding rings of cells around the point.
+        Once the rings have covered more cells than the fleet occupies (a point far from the fleet),
+        a linear scan is cheaper, so the cost is bounded by the fleet size whatever the distance."""
+        with self._lock:
+            if n <= 0 or not self.positions:
+                return []
+            center = cell_of(lat, lon, self.cell_size)
+            # Any cell outside ring k is at least k whole cells away along one axis
+            cell_km = self.cell_size * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6)
+            found, seen, k = [], 0, 0
+            while seen < len(self.positions):
+                if (2 * k + 1) ** 2 > len(self.cells):
+                    return self._scan(lat, lon, n)
+                for cell in self._ring(center, k):
+                    bucket = self.cells.get(cell)
+                    if not bucket:
+                        continue
+                    seen += len(bucket)
+                    for scooter_id, (slat, slon) in bucket.items():
+                        found.append((haversine_km(lat, lon, slat, slon), scooter_id))
+                if len(found) >= n:
+                    found.sort()
+                    del found[n:]
+                    if found[-1][0] <= k * cell_km:
+                        break
+                k += 1
+            found.sort()
+            return found[:n]
+
+
+_index: Optional[SpatialIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_spatial_index(conn) -> SpatialIndex:
+    """Process-wide index, built from decrypted coordinates on first use and refreshed from the
+    scooters change counter on every use, so writes by other processes are seen"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SpatialIndex()
+        index = _index
+    index.refresh(conn)
+    return index
+
+
+def reset_spatial_index():
+    """Drop the in-memory index; it is rebuilt on next use (after a restore)"""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def scooters_within_radius(conn, lat: float, lon: float, radius_km: float) -> List[Tuple[float, int]]:
+    """Radius query; uses the in-memory index if built, else decrypts only rows in overlapping cells"""
+    if _index is not None:
+        return get_spatial_index(conn).within_radius(lat, lon, radius_km)
+    digests = [blind_index("geo_cell", f"{i}:{j}") for i, j in cells_in_radius(lat, lon, radius_km)]
+    hits = []
+    for start in range(0, len(digests), 500):
+        chunk = digests[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(
+                f"SELECT id, {sealed_select('scooters')} FROM scooters WHERE geo_cell_bidx IN ({placeholders})", chunk):
+            try:
+                d = haversine_km(lat, lon, *_coordinates(row[1:]))
+            except Exception:
+                continue
+            if d <= radius_km:
+                hits.append((d, row[0]))
+    hits.sort()
+    return hits
+
+
+def nearest_scooters(conn, lat: float, lon: float, n: int = 5) -> List[Tuple[float, int]]:
+    return get_spatial_index(conn).nearest(lat, lon, n)
+
+
+def ensure_spatial_index(conn) -> int:
+    """Add and backfill the geo_cell_bidx column and its index (idempotent)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(scooters)")}
+    if "geo_cell_bidx" not in columns:
+        conn.execute("ALTER TABLE scooters ADD COLUMN geo_cell_bidx TEXT")
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, {sealed_select('scooters')} FROM scooters WHERE geo_cell_bidx IS NULL")
+    updated = 0
+    while True:
+        rows = cursor.fetchmany(BACKFILL_BATCH_SIZE)
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            try:
+                params.append((cell_bidx(*_coordinates(row[1:])), row[0]))
+            except Exception:
+                print(f"⚠️ Could not decrypt coordinates for scooter {row[0]}, skipping geo cell")
+        conn.executemany("UPDATE scooters SET geo_cell_bidx = ? WHERE id = ?", params)
+        updated += len(params)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scooters_geo_cell_bidx ON scooters(geo_cell_bidx)")
+    conn.commit()
+    return updated
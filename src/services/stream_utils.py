@@ -0,0 +1,36 @@
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+# Small generator stages for bounded-memory pipelines:
+# fetchmany batches -> decode -> filter -> limit/offset -> caller.
+
+FETCH_BATCH_SIZE = 500
+PAGE_SIZE = 20
+
+
+def iter_cursor(cursor, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[tuple]:
+    """Yield rows of an executed cursor using fetchmany instead of fetchall"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def limit_offset(items: Iterable, limit: int = None, offset: int = 0) -> Iterator:
+    """Skip offset items, then stop after limit; upstream stages stop pulling once this is exhausted"""
+    stop = None if limit is None else offset + limit
+    return islice(items, offset, stop)
+
+
+def print_pages(items: Iterable, render: Callable, page_size: int = PAGE_SIZE) -> int:
+    """Print items as they arrive, asking after each full page whether to continue; returns the number shown"""
+    shown = 0
+    for item in items:
+        print(render(item))
+        shown += 1
+        if shown % page_size == 0:
+            more = input("Show more results? (y/n): ").strip().lower()
+            if more != "y":
+                break
+    return shown
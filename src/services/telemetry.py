@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from modelEncryption.decode_cache import decode_cache
+from modelEncryption.sealed_rows import SEALED_COLUMNS, open_fields, seal_fields, sealed_select
+from services.blind_index import blind_index
+from services.database import close_connection, get_connection, write_transaction
+from services.errors import ValidationError
+from services.logCRUD import log_action
+from services.search_index import ID_CHUNK_SIZE, insert_grams, remove_row, row_grams, scooter_search_texts
+from services.spatial_index import cell_bidx
+from services.validators import SCOOTER_RULES, validate_field
+
+# Telemetry ingestion: scooters report SoC, GPS and mileage as JSON lines, e.g.
+#   {"serial": "SEG1234567", "soc": 64, "lat": 51.92250, "lon": 4.47917, "mileage": 1234.5, "ts": 1760000000.0}
+# Reports are coalesced per scooter within a flush window (newest ts wins per field), then each
+# window is applied as partial UPDATEs in one transaction: only changed columns are written, and
+# only a GPS change touches the encrypted columns (re-sealed from their current values).
+#
+#   python -m services.telemetry --file reports.jsonl | --stdin | --socket /tmp/telemetry.sock
+
+WINDOW = 1.0            # seconds between flushes
+MAX_PENDING = 20000     # flush early once this many scooters have pending updates
+REPORT_INTERVAL = 10.0  # seconds between metric lines in the CLI
+SCOOTER_CACHE_TTL = 60  # seconds before serial lookups are reloaded (renamed/deleted scooters)
+FLUSH_ATTEMPTS = 3      # flushes a scooter's pending update takes part in before it is given up as lost
+
+FIELDS = {"soc": "soc", "mileage": "mileage", "lat": "latitude", "lon": "longitude"}
+ENTRY_KEYS = ("received", "attempts")   # bookkeeping in a pending entry, not columns
+
+
+class TelemetryIngestor:
+    def __init__(self, db_path: str = None, window: float = WINDOW, max_pending: int = MAX_PENDING):
+        self.db_path = db_path
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: Dict[str, dict] = {}     # serial -> {column: (ts, value)}, "received": first arrival,
+                                                #   "attempts": failed flushes so far
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._scooters: Dict[str, tuple] = {}   # serial_bidx -> (id, brand, model, serial)
+        self._scooters_loaded = time.monotonic()
+        self.metrics = {
+            "received": 0, "rejected": 0, "coalesced": 0, "unknown_serial": 0,
+            "rows_updated": 0, "flushes": 0, "failed_flushes": 0, "lost_updates": 0,
+            "last_flush_ms": 0.0, "max_lag_ms": 0.0, "last_lag_ms": 0.0,
+        }
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="telemetry-flusher", daemon=True)
+        self._thread.start()
+
+    # --- intake ---------------------------------------------------------------
+
+    def submit(self, report: dict) -> bool:
+        """Queue one report; returns False (and counts it) if it is malformed"""
+        try:
+            serial = str(report["serial"]).strip()
+            ts = float(report.get("ts") or time.time())
+            if ("lat" in report) != ("lon" in report):
+                raise ValidationError("lat", "lat and lon must be reported together")
+            values = {column: validate_field(SCOOTER_RULES, column, report[key])
+                      for key, column in FIELDS.items() if key in report}
+            if not values:
+                raise ValidationError("serial", "Report has no telemetry fields")
+        except (KeyError, TypeError, ValueError, ValidationError):
+            with self._lock:
+                self.metrics["rejected"] += 1
+            return False
+
+        with self._lock:
+            self.metrics["received"] += 1
+            entry = self._pending.get(serial)
+            if entry is None:
+                entry = self._pending[serial] = {"received": time.monotonic()}
+            else:
+                self.metrics["coalesced"] += 1
+            for column, value in values.items():
+                if column not in entry or entry[column][0] <= ts:
+                    entry[column] = (ts, value)
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+        return True
+
+    def submit_line(self, line: str) -> bool:
+        line = line.strip()
+        if not line:
+            return True
+        try:
+            report = json.loads(line)
+        except ValueError:
+            report = None
+        if not isinstance(report, dict):
+            with self._lock:
+                self.metrics["rejected"] += 1
+            return False
+        return self.submit(report)
+
+    def consume(self, lines: Iterable[str]):
+        for line in lines:
+            self.submit_line(line)
+
+    # --- flushing -------------------------------------------------------------
+
+    def _run(self):
+        conn = get_connection(self.db_path)
+        try:
+            while True:
+                self._wake.wait(self.window)
+                self._wake.clear()
+                self.flush(conn)
+                if self._stopping:
+                    self.flush(conn)
+                    with self._lock:
+                        left, self._pending = len(self._pending), {}
+                        self.metrics["lost_updates"] += left
+                    if left:
+                        print(f"⚠️ {left} scooter update(s) could not be written before shutdown and were lost")
+                    return
+        finally:
+            close_connection(self.db_path)
+
+    def _resolve(self, conn, serials: List[str]) -> Dict[str, tuple]:
+        """serial -> (id, brand, model, serial), loading unknown scooters in chunks"""
+        if time.monotonic() - self._scooters_loaded > SCOOTER_CACHE_TTL:
+            self._scooters.clear()
+            self._scooters_loaded = time.monotonic()
+        keys = {s: blind_index("serial_number", s) for s in serials}
+        missing = [k for k in keys.values() if k not in self._scooters]
+        for start in range(0, len(missing), ID_CHUNK_SIZE):
+            chunk = missing[start:start + ID_CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            for row in conn.execute(
+                    f"SELECT id, serial_bidx, {sealed_select('scooters')} FROM scooters WHERE serial_bidx IN ({placeholders})",
+                    chunk):
+                brand, model, serial, _, _ = open_fields("scooters", row[2:])
+                self._scooters[row[1]] = (row[0], brand, model, serial)
+        return {s: self._scooters[k] for s, k in keys.items() if k in self._scooters}
+
+    def flush(self, conn=None):
+        """Apply everything pending in one transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        conn = conn or get_connection(self.db_path)
+        started = time.monotonic()
+        try:
+            updated, known = self._apply(conn, pending)
+        except Exception as e:
+            lost = self._requeue(pending)
+            with self._lock:
+                self.metrics["failed_flushes"] += 1
+                self.metrics["lost_updates"] += lost
+            print(f"⚠️ Telemetry flush of {len(pending)} scooter(s) failed, will retry: {e}"
+                  + (f" ({lost} given up after {FLUSH_ATTEMPTS} attempts)" if lost else ""))
+            return
+
+        now = time.monotonic()
+        lag = max(now - entry["received"] for entry in pending.values()) * 1000
+        with self._lock:
+            self.metrics["unknown_serial"] += len(pending) - len(known)
+            self.metrics["rows_updated"] += updated
+            self.metrics["flushes"] += 1
+            self.metrics["last_flush_ms"] = (now - started) * 1000
+            self.metrics["last_lag_ms"] = lag
+            self.metrics["max_lag_ms"] = max(self.metrics["max_lag_ms"], lag)
+
+    def _apply(self, conn, pending: Dict[str, dict]):
+        """Write one window; returns (rows updated, known serials)"""
+        known = self._resolve(conn, list(pending))
+        statements: Dict[tuple, list] = {}   # changed column set -> parameter rows
+        moved: Dict[int, tuple] = {}          # id -> new (lat, lon)
+        for serial, entry in pending.items():
+            if serial not in known:
+                continue
+            row_id = known[serial][0]
+            columns = sorted(c for c in entry if c not in ENTRY_KEYS + ("latitude", "longitude"))
+            params = [entry[column][1] for column in columns]
+            if "latitude" in entry:
+                lat, lon = entry["latitude"][1], entry["longitude"][1]
+                columns.append("geo_cell_bidx")
+                params.append(cell_bidx(lat, lon))
+                moved[row_id] = (lat, lon)
+            statements.setdefault(tuple(columns), []).append(tuple(params) + (row_id,))
+
+        def write(c):
+            for columns, rows in statements.items():
+                assignments = ", ".join(f"{column} = ?" for column in columns)
+                c.executemany(f"UPDATE scooters SET {assignments} WHERE id = ?", rows)
+            if moved:
+                sealed, grams = _reseal_moved(c, moved)
+                assignments = ", ".join(f"{column} = ?" for column in SEALED_COLUMNS["scooters"])
+                c.executemany(f"UPDATE scooters SET {assignments} WHERE id = ?", sealed)
+                for row_id in moved:
+                    remove_row(c, "scooters", row_id)
+                insert_grams(c, "scooters", grams)
+
+        write_transaction(write, conn)
+        for rows in statements.values():
+            for params in rows:
+                decode_cache.invalidate("scooters", params[-1])
+        return sum(len(rows) for rows in statements.values()), known
+
+    def _requeue(self, pending: Dict[str, dict]) -> int:
+        """Put a failed window back for the next flush, under reports that arrived since (newest ts
+        still wins per field); returns how many scooters were dropped after FLUSH_ATTEMPTS"""
+        lost = 0
+        with self._lock:
+            for serial, entry in pending.items():
+                attempts = entry.get("attempts", 0) + 1
+                if attempts >= FLUSH_ATTEMPTS:
+                    lost += 1
+                    continue
+                newer = self._pending.get(serial)
+                if newer is None:
+                    self._pending[serial] = dict(entry, attempts=attempts)
+                    continue
+                for column, value in entry.items():
+                    if column not in ENTRY_KEYS and (column not in newer or newer[column][0] < value[0]):
+                        newer[column] = value
+                newer["received"] = min(newer["received"], entry["received"])
+                newer["attempts"] = attempts
+        return lost
+
+    def snapshot(self) -> dict:
+        """Counters plus throughput since start"""
+        with self._lock:
+            data = dict(self.metrics)
+            data["pending"] = len(self._pending)
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        data["reports_per_sec"] = data["received"] / elapsed
+        data["rows_per_sec"] = data["rows_updated"] / elapsed
+        return data
+
+    def close(self):
+        """Flush what is pending and stop the flusher thread"""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+
+
+def _reseal_moved(conn, moved: Dict[int, tuple]):
+    """(sealed column values + id, (id, search grams)) for scooters with new coordinates"""
+    sealed, grams = [], []
+    ids = list(moved)
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(
+                f"SELECT id, {sealed_select('scooters')} FROM scooters WHERE id IN ({placeholders})", chunk):
+            brand, model, serial_number, _, _ = open_fields("scooters", row[1:])
+            lat, lon = moved[row[0]]
+            sealed.append(seal_fields("scooters", (brand, model, serial_number, str(lat), str(lon))) + (row[0],))
+            grams.append((row[0], row_grams("scooters", scooter_search_texts(brand, model, serial_number, lat, lon))))
+    return sealed, grams
+
+
+def format_metrics(m: dict) -> str:
+    return (f"received={m['received']} ({m['reports_per_sec']:.0f}/s) updated={m['rows_updated']} "
+            f"({m['rows_per_sec']:.0f}/s) coalesced={m['coalesced']} rejected={m['rejected']} "
+            f"unknown={m['unknown_serial']} lost={m['lost_updates']} pending={m['pending']} flush={m['last_flush_ms']:.1f}ms "
+            f"lag={m['last_lag_ms']:.0f}ms (max {m['max_lag_ms']:.0f}ms)")
+
+
+def serve_socket(ingestor: TelemetryIngestor, path: str):
+    """Accept any number of local clients on a Unix socket, one JSON report per line"""
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+
+    def handle(client):
+        with client, client.makefile("r", encoding="utf-8") as lines:
+            ingestor.consume(lines)
+
+    try:
+        while True:
+            client, _ = server.accept()
+            threading.Thread(target=handle, args=(client,), daemon=True).start()
+    finally:
+        server.close()
+        os.remove(path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingest scooter telemetry (JSON lines)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="read reports from a file")
+    source.add_argument("--stdin", action="store_true", help="read reports from standard input")
+    source.add_argument("--socket", help="listen on a Unix socket at this path")
+    parser.add_argument("--window", type=float, default=WINDOW, help="seconds between flushes")
+    parser.add_argument("--db", default=None, help="database file (default: urban_mobility.db)")
+    args = parser.parse_args(argv)
+
+    ingestor = TelemetryIngestor(args.db, args.window)
+    done = threading.Event()
+
+    def report():
+        while not done.wait(REPORT_INTERVAL):
+            print(format_metrics(ingestor.snapshot()), file=sys.stderr)
+
+    threading.Thread(target=report, name="telemetry-metrics", daemon=True).start()
+    try:
+        if args.socket:
+            serve_socket(ingestor, args.socket)
+        elif args.stdin:
+            ingestor.consume(sys.stdin)
+        else:
+            with open(args.file, encoding="utf-8") as f:
+                ingestor.consume(f)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        done.set()
+        ingestor.close()
+        metrics = ingestor.snapshot()
+        print(format_metrics(metrics), file=sys.stderr)
+        log_action("SYSTEM", f"Telemetry ingestion: {metrics['received']} reports, "
+                             f"{metrics['rows_updated']} scooter updates, {metrics['rejected']} rejected",
+                   suspicious=False, conn=get_connection(args.db))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from datetime import datetime
+from typing import Iterator
+from models.traveller import Traveller
+from modelEncryption.travellerEncryption import traveller_to_encrypted_row, row_to_traveller, iter_rows_to_travellers
+from modelEncryption.decode_cache import decode_cache
+from services.auth_service import require_permission
+from services.blind_index import blind_index
+from services.database import write_transaction
+from services.errors import NotFound, ValidationError
+from services.logCRUD import log_action
+from services.search_index import candidate_ids, fetch_rows_by_id, index_row, remove_row, traveller_search_texts
+from services.stream_utils import iter_cursor, limit_offset
+from services.validators import TRAVELLER_RULES, validate_fields
+
+# Traveller operations without any terminal I/O, see scooter_service.
+
+
+def get_traveller(conn, traveller_id: int) -> Traveller:
+    row = conn.execute("SELECT * FROM travellers WHERE id = ?", (int(traveller_id),)).fetchone()
+    if not row:
+        raise NotFound(f"No traveller found with ID {traveller_id}.")
+    return row_to_traveller(row)
+
+
+def find_traveller_by_name(conn, first_name: str, last_name: str) -> Traveller:
+    row = conn.execute(
+        "SELECT * FROM travellers WHERE last_name_bidx = ? AND first_name_bidx = ?",
+        (blind_index("last_name", last_name), blind_index("first_name", first_name))
+    ).fetchone()
+    if not row:
+        raise NotFound("No matching traveller found.")
+    return row_to_traveller(row)
+
+
+def _write_traveller(conn, t: Traveller):
+    """Insert (id None) or update one traveller together with its blind and search indexes"""
+    indexes = (blind_index("first_name", t.first_name), blind_index("last_name", t.last_name))
+    if t.id is None:
+        cursor = conn.execute('''
+            INSERT INTO travellers (
+                first_name, last_name, birthday, gender,
+                street_name, house_number, zip_code, city,
+                email, mobile_phone, driving_license, registration_date,
+                first_name_bidx, last_name_bidx
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', traveller_to_encrypted_row(t)[1:] + indexes)
+        t.id = cursor.lastrowid
+    else:
+        conn.execute("""
+            UPDATE travellers SET
+                first_name = ?, last_name = ?, birthday = ?, gender = ?,
+                street_name = ?, house_number = ?, zip_code = ?, city = ?,
+                email = ?, mobile_phone = ?, driving_license = ?,
+                first_name_bidx = ?, last_name_bidx = ?
+            WHERE id = ?
+        """, traveller_to_encrypted_row(t)[1:-1] + indexes + (t.id,))
+    index_row(conn, "travellers", t.id, traveller_search_texts(t.first_name, t.last_name, t.city, t.email))
+
+
+def add_traveller(conn, actor: dict, data: dict) -> Traveller:
+    require_permission(actor, "add_traveller")
+    traveller = Traveller(id=None, registration_date=datetime.now(), **validate_fields(TRAVELLER_RULES, data))
+    try:
+        write_transaction(lambda c: _write_traveller(c, traveller), conn)
+    except Exception as e:
+        log_action(actor["username"], f"Error adding traveller: {e}", suspicious=True)
+        raise
+    decode_cache.invalidate("travellers", traveller.id)
+    log_action(actor["username"], "Added new traveller", suspicious=False)
+    return traveller
+
+
+def update_traveller(conn, actor: dict, traveller_id: int, changes: dict) -> Traveller:
+    require_permission(actor, "update_traveller")
+    fields = validate_fields(TRAVELLER_RULES, changes, required=False)
+    traveller = get_traveller(conn, traveller_id)
+    for k, v in fields.items():
+        setattr(traveller, k, v)
+    try:
+        write_transaction(lambda c: _write_traveller(c, traveller), conn)
+    except Exception as e:
+        log_action(actor["username"], f"Error updating traveller ID {traveller.id}: {e}", suspicious=True)
+        raise
+    decode_cache.invalidate("travellers", traveller.id)
+    log_action(actor["username"], f"Updated traveller ID {traveller.id}", suspicious=False)
+    return traveller
+
+
+def delete_traveller(conn, actor: dict, traveller_id: int):
+    require_permission(actor, "delete_traveller")
+    traveller = get_traveller(conn, traveller_id)
+
+    def write(c):
+        c.execute("DELETE FROM travellers WHERE id = ?", (traveller.id,))
+        remove_row(c, "travellers", traveller.id)
+
+    try:
+        write_transaction(write, conn)
+    except Exception as e:
+        log_action(actor["username"], f"Error deleting traveller ID {traveller.id}: {e}", suspicious=True)
+        raise
+    decode_cache.invalidate("travellers", traveller.id)
+    log_action(actor["username"], f"Deleted traveller ID {traveller.id}", suspicious=False)
+
+
+def iter_traveller_matches(conn, term: str, limit: int = None, offset: int = 0) -> Iterator[Traveller]:
+    """Stream travellers whose id/name/email/city contains term, stopping once limit matches are produced"""
+    term = term.strip().lower()
+    # Trigram index narrows the scan to candidate rows; IDs are plaintext and matched in SQL
+    ids = candidate_ids(conn, "travellers", term)
+    cursor = conn.cursor()
+    if ids is None:
+        cursor.execute("SELECT * FROM travellers ORDER BY id")
+        rows = iter_cursor(cursor)
+    else:
+        if term.isdigit():
+            cursor.execute("SELECT id FROM travellers WHERE CAST(id AS TEXT) LIKE ?", (f"%{term}%",))
+            ids = set(ids) | {r[0] for r in cursor.fetchall()}
+        rows = fetch_rows_by_id(conn, "travellers", ids)
+
+    def matches(traveller):
+        first_name = traveller.first_name.lower()
+        last_name = traveller.last_name.lower()
+        return (term in str(traveller.id) or
+                term in first_name or
+                term in last_name or
+                term in f"{first_name} {last_name}" or
+                term in traveller.email.lower() or
+                term in traveller.city.lower())
+
+    found = (t for t in iter_rows_to_travellers(rows) if t is not None and matches(t))
+    return limit_offset(found, limit, offset)
+
+
+def search_travellers(conn, actor: dict, term: str, limit: int = None, offset: int = 0) -> Iterator[Traveller]:
+    require_permission(actor, "search_traveller")
+    term = term.strip().lower()
+    if not term:
+        raise ValidationError("term", "Search term cannot be empty.")
+    log_action(actor["username"], f"Searched travellers with partial key '{term}'", suspicious=False)
+    return iter_traveller_matches(conn, term, limit, offset)
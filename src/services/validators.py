@@ -0,0 +1,117 @@
+import re
+from datetime import date
+from typing import Dict, Tuple
+from services.errors import ValidationError
+
+# Field rules shared by the interactive prompts, the service layer and bulk import.
+# Each rule is (validator on the stripped string value, error message, converter).
+
+Citylist = [
+    "amsterdam", "rotterdam", "schiedam", "utrecht", "eindhoven",
+    "tilburg", "groningen", "almere", "breda", "nijmegen"
+]
+
+
+def is_number(x: str) -> bool:
+    return x.replace('.', '', 1).isdigit()
+
+
+def is_date(x: str) -> bool:
+    if not re.fullmatch(r'\d{4}-\d{2}-\d{2}', x):
+        return False
+    try:
+        date.fromisoformat(x)
+    except ValueError:
+        return False
+    return True
+
+
+def is_soc_range(x: str) -> bool:
+    if not re.fullmatch(r'\d{1,3}-\d{1,3}', x):
+        return False
+    min_soc, max_soc = map(int, x.split("-"))
+    return 0 <= min_soc < max_soc <= 100
+
+
+def is_coordinate(x: str, low: float, high: float) -> bool:
+    return bool(re.fullmatch(r'^-?\d{1,3}\.\d{5}$', x)) and low <= float(x) <= high
+
+
+def to_bool(x: str) -> bool:
+    return x.lower() in ("yes", "true", "1")
+
+
+# Service area (Rotterdam): scooter coordinates and location queries must fall inside it
+LATITUDE_RANGE = (51.85, 52.00)
+LONGITUDE_RANGE = (4.40, 4.60)
+
+SCOOTER_RULES: Dict[str, Tuple] = {
+    "brand": (str.isalpha, "Only letters allowed.", str),
+    "model": (str.isalnum, "Only letters/numbers allowed.", str),
+    "serial_number": (lambda x: bool(re.fullmatch(r"[A-Za-z0-9]{10,17}", x)), "Must be 10–17 alphanumeric characters.", str),
+    "top_speed": (lambda x: x.isdigit() and 0 < int(x) <= 200, "Enter number between 1 and 200.", int),
+    "battery_capacity": (lambda x: is_number(x) and float(x) > 0, "Must be a positive number.", float),
+    "soc": (lambda x: x.isdigit() and 0 <= int(x) <= 100, "Must be between 0 and 100.", int),
+    "target_soc_range": (is_soc_range, "Invalid range. Format: 20-80 (0 ≤ min < max ≤ 100).", str),
+    "latitude": (lambda x: is_coordinate(x, *LATITUDE_RANGE), "Invalid or out-of-bounds latitude (51.85000–52.00000).", float),
+    "longitude": (lambda x: is_coordinate(x, *LONGITUDE_RANGE), "Invalid or out-of-bounds longitude (4.40000–4.60000).", float),
+    "out_of_service": (lambda x: x.lower() in ("yes", "no", "true", "false", "1", "0"), "Enter 'yes' or 'no'", to_bool),
+    "mileage": (lambda x: is_number(x) and float(x) >= 0, "Must be 0 or more.", float),
+    "last_maintenance": (is_date, "Format must be YYYY-MM-DD.", str),
+}
+
+TRAVELLER_RULES: Dict[str, Tuple] = {
+    "first_name": (str.isalpha, "Only letters allowed", str),
+    "last_name": (str.isalpha, "Only letters allowed", str),
+    "birthday": (is_date, "Invalid date format (YYYY-MM-DD)", str),
+    "gender": (lambda x: x.lower() in ("male", "female"), "Must be 'male' or 'female'", str.lower),
+    "street_name": (lambda x: x.replace(" ", "").isalpha(), "Only letters and spaces allowed", str),
+    "house_number": (str.isdigit, "Only digits allowed", str),
+    "zip_code": (lambda x: bool(re.fullmatch(r"\d{4}[A-Z]{2}", x)), "Invalid zip format (1234AB)", str),
+    "city": (lambda x: x.lower() in Citylist, "City not allowed", str.lower),
+    "email": (lambda x: bool(re.fullmatch(r"^[\w\.-]+@[\w\.-]+\.\w{2,}$", x)), "Invalid email format", str),
+    "mobile_phone": (lambda x: bool(re.fullmatch(r"^6\d{8}$", x)), "Must be 9 digits, starting with 6", str),
+    "driving_license": (lambda x: bool(re.fullmatch(r"^[A-Z]{1,2}\d{7,8}$", x)), "Invalid license format", str),
+}
+
+
+COORDINATE_FIELDS = ("latitude", "longitude")
+
+
+def _as_text(value, field: str = None) -> str:
+    """Normalise JSON/CSV values to the string form the prompts validate"""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float) and field in COORDINATE_FIELDS:
+        return f"{value:.5f}"
+    return str(value).strip()
+
+
+def is_valid(rules: dict, field: str, value) -> bool:
+    validator = rules[field][0]
+    try:
+        return bool(validator(_as_text(value, field)))
+    except ValueError:
+        return False
+
+
+def validate_field(rules: dict, field: str, value):
+    """Return the converted value or raise ValidationError"""
+    if field not in rules:
+        raise ValidationError(field, "Unknown field")
+    if value is None or _as_text(value, field) == "":
+        raise ValidationError(field, "Value is required")
+    _, message, convert = rules[field]
+    text = _as_text(value, field)
+    if not is_valid(rules, field, text):
+        raise ValidationError(field, message)
+    return convert(text)
+
+
+def validate_fields(rules: dict, data: dict, required: bool = True) -> dict:
+    """Validate a whole record; with required=True every rule must be present"""
+    if required:
+        missing = [f for f in rules if f not in data]
+        if missing:
+            raise ValidationError(missing[0], "Value is required")
+    return {field: validate_field(rules, field, value) for field, value in data.items()}
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from init_db import initialize
+from modelEncryption.decode_cache import decode_cache
+from services import crypto_utils, database, password_hashing, session_manager
+from services.fleet_snapshot import reset_fleet_snapshot
+from services.logCRUD import stop_audit_writer
+from services.search_index import gram_digest
+from services.spatial_index import reset_spatial_index
+
+# Every test runs against its own database and key files in tmp_path: the checked-in
+# urban_mobility.db and services/secret.key are never opened.
+
+SUPER_ADMIN = {"username": "super_admin", "role": "superadmin"}
+TEST_BCRYPT_COST = 4   # the minimum bcrypt accepts (MIN_COST is lowered to match); skips calibration
+
+
+def _clear_caches():
+    decode_cache.clear()
+    gram_digest.cache_clear()
+    session_manager.clear_cache()
+    reset_spatial_index()
+    reset_fleet_snapshot()
+
+
+@pytest.fixture(autouse=True)
+def keys(tmp_path, monkeypatch):
+    """A fresh secret.key (and room for a keyring) per test"""
+    key_path = tmp_path / "secret.key"
+    key_path.write_bytes(Fernet.generate_key())
+    monkeypatch.setattr(crypto_utils, "KEY_PATH", str(key_path))
+    monkeypatch.setattr(crypto_utils, "KEYRING_PATH", str(tmp_path / "secret.keyring"))
+    monkeypatch.setattr(crypto_utils, "_keyring", None)
+    monkeypatch.setattr(crypto_utils, "_ciphers", None)
+    monkeypatch.setattr(crypto_utils, "_loaded_mtime", None)
+    monkeypatch.setattr(crypto_utils, "_derived", {})
+    _clear_caches()
+    yield key_path
+    _clear_caches()
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A database at the current schema version; also the default for connections and the audit log"""
+    path = str(tmp_path / "test.db")
+    seed = sqlite3.connect(path)
+    seed.execute("CREATE TABLE app_settings (key TEXT PRIMARY KEY, value TEXT)")
+    seed.execute("INSERT INTO app_settings (key, value) VALUES ('bcrypt_cost', ?)", (str(TEST_BCRYPT_COST),))
+    seed.commit()
+    seed.close()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(password_hashing, "_cost", None)
+    monkeypatch.setattr(password_hashing, "MIN_COST", TEST_BCRYPT_COST)
+    initialize(path)
+    yield path
+    stop_audit_writer()
+    database.close_all()
+
+
+@pytest.fixture
+def conn(db_path):
+    return database.get_connection(db_path)
+
+
+def scooter_fields(serial: str, **overrides) -> dict:
+    """Valid create_scooter input, as the prompts would pass it"""
+    fields = {
+        "brand": "Segway", "model": "Max", "serial_number": serial, "top_speed": "25",
+        "battery_capacity": "500", "soc": "40", "target_soc_range": "20-80",
+        "latitude": "51.92250", "longitude": "4.47917", "out_of_service": "no",
+        "mileage": "100", "last_maintenance": "2024-01-01",
+    }
+    fields.update(overrides)
+    return fields
+
+
+class Clock:
+    """time.time() under the test's control"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("time.time", clock)
+    return clock
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from services import api_server
+from services.api_server import ApiServer
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", 50000)
+
+
+def _exchange(raw: bytes, db_path=None):
+    """Feed raw bytes to one connection; returns [(status, payload)] for each response written"""
+    async def run():
+        reader = asyncio.StreamReader(limit=1024)
+        reader.feed_data(raw)
+        reader.feed_eof()
+        writer = FakeWriter()
+        server = ApiServer(db_path, workers=1)
+        try:
+            await server.handle_connection(reader, writer)
+        finally:
+            server.close()
+        assert writer.closed
+        return writer.data
+
+    data = asyncio.run(run())
+    responses = []
+    while data:
+        head, _, rest = data.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        length = int(next(l for l in lines if l.startswith("Content-Length")).split(":")[1])
+        responses.append((int(lines[0].split()[1]), json.loads(rest[:length])))
+        data = rest[length:]
+    return responses
+
+
+def _request(headers: str, body: bytes = b"") -> bytes:
+    return f"POST /nowhere HTTP/1.1\r\n{headers}\r\n".encode("latin-1") + body
+
+
+def test_well_formed_requests_are_routed_on_one_connection(db_path):
+    raw = b"GET /nowhere HTTP/1.1\r\nHost: x\r\n\r\n" + _request("Content-Length: 2\r\n", b"{}")
+    assert [status for status, _ in _exchange(raw, db_path)] == [404, 404]
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3", " 4 2", "+4", "²"])
+def test_invalid_content_length_is_400(length):
+    assert _exchange(_request(f"Content-Length: {length}\r\n", b"{}"))[0][0] == 400
+
+
+def test_oversized_content_length_is_413_without_reading_the_body():
+    status, payload = _exchange(_request(f"Content-Length: {api_server.MAX_BODY + 1}\r\n"))[0]
+    assert status == 413 and "too large" in payload["error"]
+
+
+@pytest.mark.parametrize("raw, status", [
+    (b"GARBAGE\r\n\r\n", 400),
+    (_request("no colon here\r\n"), 400),
+    (_request("X-Long: " + "a" * 4096 + "\r\n"), 431),
+    (_request("".join(f"X-{i}: v\r\n" for i in range(api_server.MAX_HEADERS + 1))), 431),
+    (_request("Content-Length: 3\r\n", b"[1]"), 400),
+    (_request("Content-Length: 4\r\n", b"\xff\xfe{}"), 400),
+    (_request("Content-Length: 20000\r\n", b"[" * 20000), 400),
+])
+def test_malformed_requests_get_an_error_response(raw, status):
+    assert _exchange(raw)[0][0] == status
+
+
+def test_truncated_body_closes_the_connection_quietly():
+    assert _exchange(_request("Content-Length: 10\r\n", b"{}")) == []
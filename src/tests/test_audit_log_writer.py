@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+from init_db import initialize
+from services import database, logCRUD
+from services.logCRUD import AuditLogWriter, flush_audit_log, log_action, query_logs
+
+
+def _count(path):
+    return database.get_connection(path).execute("SELECT COUNT(*) FROM log_entries").fetchone()[0]
+
+
+def test_flush_commits_everything_submitted(db_path):
+    before = _count(db_path)
+    for i in range(300):   # more than one batch
+        log_action("super_admin", f"event {i}")
+    flush_audit_log()
+    assert _count(db_path) == before + 300
+    entries, _ = query_logs(database.get_connection(db_path), page_size=1)
+    assert entries[0][1].activity == "event 299"
+
+
+def test_full_queue_blocks_the_caller(db_path, monkeypatch):
+    release = threading.Event()
+    original = logCRUD.write_transaction
+
+    def slow_write(fn, conn):
+        release.wait()
+        return original(fn, conn)
+
+    monkeypatch.setattr(logCRUD, "write_transaction", slow_write)
+    writer = AuditLogWriter(db_path, queue_size=2, batch_size=1, flush_interval=0.01)
+    events = [logCRUD.LogEntry(timestamp=datetime.now(), username="u", activity=str(i), additional_info="", suspicious=False)
+              for i in range(6)]
+    submitter = threading.Thread(target=lambda: [writer.submit(e) for e in events])
+    submitter.start()
+    submitter.join(0.3)
+    assert submitter.is_alive()   # one event in the writer, two queued, the rest waiting
+    release.set()
+    submitter.join()
+    writer.close()
+    assert (writer.written, writer.failed) == (6, 0)
+
+
+def test_failed_batch_is_retried(db_path, monkeypatch):
+    monkeypatch.setattr(logCRUD, "WRITE_BACKOFF", 0)
+    original = logCRUD.write_transaction
+    failures = [sqlite3.OperationalError("database is locked")] * 2
+
+    def flaky_write(fn, conn):
+        if failures:
+            raise failures.pop()
+        return original(fn, conn)
+
+    monkeypatch.setattr(logCRUD, "write_transaction", flaky_write)
+    before = _count(db_path)
+    log_action("super_admin", "survives two failures")
+    flush_audit_log()
+    writer = logCRUD.start_audit_writer(db_path)
+    assert (writer.failed, _count(db_path)) == (0, before + 1)
+
+
+def test_batch_is_counted_failed_once_retries_run_out(db_path, monkeypatch):
+    monkeypatch.setattr(logCRUD, "WRITE_BACKOFF", 0)
+    attempts = []
+
+    def broken_write(fn, conn):
+        attempts.append(1)
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(logCRUD, "write_transaction", broken_write)
+    log_action("super_admin", "a")
+    log_action("super_admin", "b")
+    flush_audit_log()
+    writer = logCRUD.start_audit_writer(db_path)
+    assert writer.failed == 2
+    assert len(attempts) % (logCRUD.WRITE_RETRIES + 1) == 0
+
+
+def test_events_go_to_the_database_of_conn(db_path, tmp_path):
+    other = str(tmp_path / "other.db")
+    initialize(other)
+    before = _count(db_path), _count(other)
+    log_action("super_admin", "default database")
+    log_action("super_admin", "other database", conn=database.get_connection(other))
+    flush_audit_log()
+    assert (_count(db_path), _count(other)) == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,73 @@
+import os
+import zipfile
+
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import backup_restore, scooter_service
+from services.errors import NotFound, ServiceError
+
+
+def _serials(conn):
+    return sorted(s.serial_number for s in scooter_service.iter_scooter_matches(conn, "segway"))
+
+
+@pytest.fixture
+def backup_dir(tmp_path):
+    return str(tmp_path / "backups")
+
+
+def test_incremental_chain_verifies_and_restores(conn, backup_dir):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("BAK1234560"))
+    full = backup_restore.backup(conn, SUPER_ADMIN, "full", backup_dir)
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("BAK1234561"))
+    incremental = backup_restore.backup(conn, SUPER_ADMIN, "incremental", backup_dir)
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("BAK1234562"))
+
+    assert incremental["kind"] == "incremental"
+    assert incremental["parent"]["id"] == full["id"]
+    assert incremental["pages_stored"] < incremental["page_count"]
+    manifests = backup_restore.list_backups(backup_dir)
+    assert [m["id"] for m in backup_restore._chain(manifests[-1], manifests)] == [full["id"], incremental["id"]]
+    backup_restore.verify_backup(incremental["name"], backup_dir)
+
+    backup_restore.restore(conn, SUPER_ADMIN, incremental["name"], backup_dir=backup_dir)
+    assert _serials(conn) == ["BAK1234560", "BAK1234561"]
+
+    backup_restore.restore(conn, SUPER_ADMIN, full["name"], backup_dir=backup_dir)
+    assert _serials(conn) == ["BAK1234560"]
+
+
+def test_chain_with_a_missing_parent_is_refused(conn, backup_dir):
+    full = backup_restore.backup(conn, SUPER_ADMIN, "full", backup_dir)
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("BAK1234560"))
+    incremental = backup_restore.backup(conn, SUPER_ADMIN, "incremental", backup_dir)
+    os.remove(os.path.join(backup_dir, full["name"]))
+
+    with pytest.raises(ServiceError, match="missing"):
+        backup_restore.verify_backup(incremental["name"], backup_dir)
+    with pytest.raises(ServiceError, match="missing"):
+        backup_restore.restore(conn, SUPER_ADMIN, incremental["name"], backup_dir=backup_dir)
+    assert _serials(conn) == ["BAK1234560"]
+
+
+def test_corrupt_archive_is_refused(conn, backup_dir):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("BAK1234560"))
+    full = backup_restore.backup(conn, SUPER_ADMIN, "full", backup_dir)
+    path = os.path.join(backup_dir, full["name"])
+    with zipfile.ZipFile(path) as zf:
+        entries = {name: zf.read(name) for name in zf.namelist()}
+    pages = bytearray(entries["pages.bin"])
+    pages[-1] ^= 0xFF
+    entries["pages.bin"] = bytes(pages)
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+
+    with pytest.raises(ServiceError, match="checksum"):
+        backup_restore.verify_backup(full["name"], backup_dir)
+
+
+def test_unknown_backup(conn, backup_dir):
+    with pytest.raises(NotFound):
+        backup_restore.verify_backup("backup-none.umbak", backup_dir)
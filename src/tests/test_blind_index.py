@@ -0,0 +1,24 @@
+from conftest import SUPER_ADMIN, scooter_fields
+from services import crypto_utils, scooter_service
+from services.blind_index import blind_index
+
+
+def test_blind_index_normalizes_and_separates_fields():
+    assert blind_index("serial_number", " ABC1234567 ") == blind_index("serial_number", "abc1234567")
+    assert blind_index("serial_number", "abc1234567") != blind_index("username", "abc1234567")
+    assert len(blind_index("serial_number", "abc1234567")) == 32
+
+
+def test_blind_index_depends_on_the_key(keys, monkeypatch):
+    before = blind_index("username", "super_admin")
+    monkeypatch.setattr(crypto_utils, "_derived", {})
+    monkeypatch.setattr(crypto_utils, "_keyring", dict(crypto_utils._keyring, index_root="another root"))
+    assert blind_index("username", "super_admin") != before
+
+
+def test_lookup_by_serial_goes_through_the_digest(conn):
+    created = scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("ABC1234567"))
+    stored = conn.execute("SELECT serial_number, serial_bidx FROM scooters WHERE id = ?", (created.id,)).fetchone()
+    assert b"ABC1234567" not in bytes(stored[0])
+    assert stored[1] == blind_index("serial_number", "ABC1234567")
+    assert scooter_service.get_scooter(conn, "abc1234567").id == created.id
@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from modelEncryption.bulk_decode import decode_rows, iter_decode_rows
+from modelEncryption.scooterEncryption import rows_to_scooters
+from services import scooter_service
+
+
+def _double(x):
+    if x == 13:
+        raise ValueError("unlucky")
+    return x * 2
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_order_is_kept_and_failures_come_back_as_none(workers):
+    errors = []
+    result = decode_rows(range(40), _double, workers=workers, chunk_size=3,
+                         on_error=lambda i, row, e: errors.append((i, row)))
+    assert result == [None if x == 13 else x * 2 for x in range(40)]
+    assert errors == [(13, 13)]
+
+
+def test_streaming_reads_a_bounded_window():
+    consumed = []
+    rows = (consumed.append(x) or x for x in itertools.count())
+    stream = iter_decode_rows(rows, _double, workers=2, chunk_size=10)
+    assert [next(stream) for _ in range(5)] == [0, 2, 4, 6, 8]
+    assert len(consumed) <= 2 * 2 * 10 + 10
+
+
+def test_rows_to_scooters_decodes_stored_rows(conn):
+    serials = [f"DEC123456{i}" for i in range(5)]
+    for serial in serials:
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(serial))
+    rows = conn.execute("SELECT * FROM scooters ORDER BY id").fetchall()
+    rows.insert(2, rows[0][:3] + (b"not a sealed blob",) + rows[0][4:])
+    scooters = rows_to_scooters(rows, workers=3, chunk_size=2)
+    assert [s.serial_number if s else None for s in scooters] == serials[:2] + [None] + serials[2:]
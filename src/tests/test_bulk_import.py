@@ -0,0 +1,79 @@
+import csv
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import bulk_import, scooter_service
+
+HEADER = list(scooter_fields("").keys())
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def _rejects(result):
+    with open(result.reject_report, newline="", encoding="utf-8") as f:
+        return [(int(r["line"]), r["field"], r["error"]) for r in csv.DictReader(f)]
+
+
+def test_import_reports_invalid_and_duplicate_rows(conn, tmp_path):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("OLD1234567"))
+    path = _write_csv(tmp_path / "scooters.csv", [
+        scooter_fields("NEW1234560"),
+        scooter_fields("NEW1234561", soc="150"),
+        scooter_fields("OLD1234567"),
+        scooter_fields("NEW1234560"),
+        scooter_fields("NEW1234562", latitude="52.50000"),
+        scooter_fields("NEW1234563"),
+    ])
+
+    result = bulk_import.import_records(conn, SUPER_ADMIN, "scooters", path)
+
+    assert (result.imported, result.rejected) == (2, 4)
+    duplicate = bulk_import.ENTITIES["scooters"].duplicate_message
+    assert _rejects(result) == [
+        (3, "soc", "Must be between 0 and 100."),
+        (4, "", duplicate),
+        (5, "", duplicate),
+        (6, "latitude", "Invalid or out-of-bounds latitude (51.85000–52.00000)."),
+    ]
+    assert scooter_service.get_scooter(conn, "NEW1234563").soc == 40
+    assert list(scooter_service.search_scooters(conn, SUPER_ADMIN, "new1234560"))
+
+
+def test_import_without_rejects_writes_no_report(conn, tmp_path):
+    path = _write_csv(tmp_path / "scooters.csv", [scooter_fields(f"NEW123456{i}") for i in range(5)])
+    result = bulk_import.import_records(conn, SUPER_ADMIN, "scooters", path, batch_size=2)
+    assert (result.imported, result.rejected, result.reject_report) == (5, 0, None)
+
+
+def test_import_never_reuses_ids_of_deleted_rows(conn, tmp_path):
+    for i in range(3):
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(f"OLD123456{i}"))
+    scooter_service.delete_scooter(conn, SUPER_ADMIN, "OLD1234562")
+    deleted_id = 3
+
+    bulk_import.import_records(conn, SUPER_ADMIN, "scooters", _write_csv(tmp_path / "s.csv", [scooter_fields("NEW1234560")]))
+
+    assert scooter_service.get_scooter(conn, "NEW1234560").id > deleted_id
+
+
+def test_key_taken_during_the_import_is_rejected(conn, tmp_path, monkeypatch):
+    path = _write_csv(tmp_path / "s.csv", [scooter_fields("NEW1234560"), scooter_fields("NEW1234561")])
+    check = bulk_import._existing_keys
+
+    def racing(c, spec, keys):
+        # Another process inserts the first serial after the batch's duplicate check
+        monkeypatch.setattr(bulk_import, "_existing_keys", check)
+        scooter_service.create_scooter(c, SUPER_ADMIN, scooter_fields("NEW1234560", model="Other"))
+        return check(c, spec, keys) - {keys[0]}
+
+    monkeypatch.setattr(bulk_import, "_existing_keys", racing)
+    result = bulk_import.import_records(conn, SUPER_ADMIN, "scooters", path)
+
+    assert (result.imported, result.rejected) == (1, 1)
+    assert _rejects(result) == [(2, "", bulk_import.ENTITIES["scooters"].duplicate_message)]
+    assert scooter_service.get_scooter(conn, "NEW1234560").model == "Other"
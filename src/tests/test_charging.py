@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import scooter_service
+from services.charging import charging_needed, count_charging_needed
+from services.errors import PermissionDenied, ValidationError
+
+# serial suffix, soc, target range, out of service
+FLEET = [(0, "10", "20-80", "no"), (1, "50", "20-80", "no"), (2, "5", "30-90", "no"),
+         (3, "95", "20-80", "no"), (4, "0", "20-80", "yes"), (5, "15", "20-80", "no")]
+
+
+@pytest.fixture
+def fleet(conn):
+    for i, soc, target, oos in FLEET:
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(
+            f"CHG123456{i}", soc=soc, target_soc_range=target, out_of_service=oos))
+
+
+def _report(conn, mode, **page):
+    return [(gap, s.serial_number) for gap, s in charging_needed(conn, SUPER_ADMIN, mode, **page)]
+
+
+def test_below_target_largest_deficit_first(conn, fleet):
+    assert _report(conn, "below") == [(25, "CHG1234562"), (10, "CHG1234560"), (5, "CHG1234565")]
+    assert count_charging_needed(conn, "below") == 3
+    assert _report(conn, "below", limit=1, offset=1) == [(10, "CHG1234560")]
+
+
+def test_above_target(conn, fleet):
+    assert _report(conn, "above") == [(15, "CHG1234563")]
+    assert count_charging_needed(conn, "above") == 1
+
+
+def test_report_follows_updates(conn, fleet):
+    scooter_service.update_scooter(conn, SUPER_ADMIN, "CHG1234562", {"target_soc_range": "0-50"})
+    scooter_service.update_scooter(conn, SUPER_ADMIN, "CHG1234564", {"out_of_service": "no"})
+    assert _report(conn, "below") == [(20, "CHG1234564"), (10, "CHG1234560"), (5, "CHG1234565")]
+
+
+def test_report_is_served_by_its_index(conn, fleet):
+    plan = " ".join(row[-1] for row in conn.execute("""
+        EXPLAIN QUERY PLAN SELECT id FROM scooters INDEXED BY idx_scooters_soc_below
+        WHERE out_of_service = 0 AND soc_min - soc > 0 ORDER BY soc_min - soc DESC, id LIMIT 50
+    """))
+    assert "idx_scooters_soc_below" in plan and "TEMP B-TREE" not in plan
+
+
+def test_invalid_mode_and_permission(conn):
+    with pytest.raises(ValidationError):
+        charging_needed(conn, SUPER_ADMIN, "sideways")
+    with pytest.raises(PermissionDenied):
+        charging_needed(conn, {"username": "nobody", "role": "traveller"})
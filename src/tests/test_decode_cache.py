@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+
+from conftest import SUPER_ADMIN
+from modelEncryption.decode_cache import DecodeCache, decode_cache
+from services import auth_service
+from services.logCRUD import flush_audit_log, log_action, query_logs
+
+
+@dataclass
+class Item:
+    value: str
+
+
+def _decode(row):
+    return Item(row[1])
+
+
+def test_hit_returns_a_copy():
+    cache = DecodeCache()
+    first = cache.get_or_decode("t", 1, (1, "a"), _decode)
+    first.value = "mutated"
+    assert cache.get_or_decode("t", 1, (1, "a"), _decode).value == "a"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_new_version_of_a_row_replaces_the_old_one():
+    cache = DecodeCache()
+    cache.get_or_decode("t", 1, (1, "a"), _decode)
+    assert cache.get_or_decode("t", 1, (1, "b"), _decode).value == "b"
+    assert cache.stats()["entries"] == 1
+    cache.invalidate("t", 1)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DecodeCache(max_entries=2)
+    for i in range(2):
+        cache.get_or_decode("t", i, (i, "x"), _decode)
+    cache.get_or_decode("t", 0, (0, "x"), _decode)   # 0 is now the most recent
+    cache.get_or_decode("t", 2, (2, "x"), _decode)
+    assert cache.evictions == 1
+    cache.get_or_decode("t", 0, (0, "x"), _decode)
+    assert cache.hits == 2
+
+
+def test_password_change_replaces_the_cached_user(conn):
+    auth_service.create_user(conn, SUPER_ADMIN, "sysadmin01", "Correct_Horse1!", "sysadmin", "Sam", "Admin")
+    old_hash = auth_service.find_user(conn, "sysadmin01").password_hash
+    actor = {"username": "sysadmin01", "role": "sysadmin"}
+    auth_service.change_password(conn, actor, "Battery_Staple2!", current_password="Correct_Horse1!")
+
+    assert auth_service.find_user(conn, "sysadmin01").password_hash != old_hash
+    users = [key for key in decode_cache._entries if key[0] == "users"]
+    assert len(users) == 1
+
+
+def test_log_rows_bypass_the_cache(conn):
+    for i in range(5):
+        log_action("super_admin", f"event {i}")
+    flush_audit_log()
+    decode_cache.clear()
+    entries, _ = query_logs(conn)
+    assert len(entries) >= 5
+    assert decode_cache.stats()["entries"] == 0
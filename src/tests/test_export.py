@@ -0,0 +1,72 @@
+import csv
+import gzip
+import json
+import os
+import stat
+
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import export, scooter_service
+from services.errors import PermissionDenied
+
+SERIALS = [f"EXP123456{i}" for i in range(5)]
+
+
+@pytest.fixture
+def scooters(conn):
+    for serial in SERIALS:
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(serial))
+
+
+def test_csv_export_holds_every_row(conn, scooters, tmp_path):
+    path = str(tmp_path / "scooters.csv")
+    result = export.export_table(conn, SUPER_ADMIN, "scooters", path)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert (result.exported, result.failed) == (5, 0)
+    assert [r["serial_number"] for r in rows] == SERIALS
+    assert not os.path.exists(path + ".part")
+
+
+def test_gzip_jsonl_export(conn, scooters, tmp_path):
+    path = str(tmp_path / "scooters.jsonl.gz")
+    export.export_table(conn, SUPER_ADMIN, "scooters", path, workers=2)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["serial_number"] for r in records] == SERIALS
+    assert records[0]["soc"] == 40
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX file modes")
+@pytest.mark.parametrize("name", ["scooters.csv", "scooters.csv.gz"])
+def test_export_file_is_private_to_its_owner(conn, scooters, tmp_path, name):
+    path = tmp_path / name
+    path.write_text("older, world-readable export")
+    path.chmod(0o644)
+    export.export_table(conn, SUPER_ADMIN, "scooters", str(path))
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_undecryptable_rows_are_skipped_and_counted(conn, scooters, tmp_path):
+    conn.execute("UPDATE scooters SET serial_number = ? WHERE id = 2", (b"not a sealed blob",))
+    conn.commit()
+    result = export.export_table(conn, SUPER_ADMIN, "scooters", str(tmp_path / "s.jsonl"))
+    assert (result.exported, result.failed) == (4, 1)
+
+
+def test_failed_export_leaves_no_files(conn, scooters, tmp_path, monkeypatch):
+    def broken(model):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(export, "_to_record", broken)
+    path = tmp_path / "s.csv"
+    with pytest.raises(RuntimeError):
+        export.export_table(conn, SUPER_ADMIN, "scooters", str(path))
+    assert list(tmp_path.glob("s.csv*")) == []
+
+
+def test_export_requires_the_entity_permission(conn, tmp_path):
+    engineer = {"username": "engineer01", "role": "engineer"}
+    with pytest.raises(PermissionDenied):
+        export.export_table(conn, engineer, "logs", str(tmp_path / "logs.csv"))
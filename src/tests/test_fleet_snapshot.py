@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import scooter_service
+from services.errors import ServiceError
+from services.fleet_snapshot import FleetSnapshot, ensure_change_tracking, fleet_summary
+
+
+@pytest.fixture
+def fleet(conn):
+    for i, (brand, soc, mileage) in enumerate([("Segway", "10", "100"), ("Segway", "50", "300"), ("NIU", "90", "200")]):
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(f"FLT123456{i}", brand=brand, soc=soc,
+                                                                          mileage=mileage))
+
+
+def test_summary_and_per_brand_aggregates(conn, fleet):
+    snapshot = FleetSnapshot.load(conn)
+    summary = snapshot.summary()
+    assert (summary["count"], summary["avg_soc"], summary["below_target"], summary["above_target"]) == (3, 50.0, 1, 1)
+    by_brand = snapshot.by_brand("mileage")
+    assert by_brand["Segway"]["median"] == 200.0 and by_brand["NIU"]["count"] == 1
+    assert snapshot.select_ids(snapshot.mask(brand="Segway", soc_below=20)) == [1]
+
+
+def test_refresh_applies_updates_and_deletes(conn, fleet):
+    snapshot = FleetSnapshot.load(conn)
+    scooter_service.update_scooter(conn, SUPER_ADMIN, "FLT1234560", {"soc": "70"})
+    assert snapshot.refresh(conn) == (1, 0)
+    assert snapshot.soc.tolist() == [70, 50, 90]
+
+    scooter_service.delete_scooter(conn, SUPER_ADMIN, "FLT1234561")
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("FLT1234563"))
+    assert snapshot.refresh(conn) == (1, 1)
+    assert snapshot.ids.tolist() == [1, 3, 4]
+    assert fleet_summary(conn, SUPER_ADMIN)["fleet"]["count"] == 3
+
+
+def test_id_sweep_runs_only_after_a_delete(conn, fleet):
+    snapshot = FleetSnapshot.load(conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        scooter_service.update_scooter(conn, SUPER_ADMIN, "FLT1234560", {"soc": "70"})
+        snapshot.refresh(conn)
+        snapshot.refresh(conn)
+        assert "SELECT id FROM scooters" not in statements
+        scooter_service.delete_scooter(conn, SUPER_ADMIN, "FLT1234560")
+        assert snapshot.refresh(conn) == (0, 1)
+        assert statements.count("SELECT id FROM scooters") == 1
+        snapshot.refresh(conn)
+        assert statements.count("SELECT id FROM scooters") == 1
+    finally:
+        conn.set_trace_callback(None)
+
+
+def test_old_delete_trigger_is_replaced(conn, fleet):
+    conn.execute("DROP TRIGGER trg_scooters_seq_delete")
+    conn.execute("""
+        CREATE TRIGGER trg_scooters_seq_delete AFTER DELETE ON scooters
+        BEGIN
+            UPDATE change_counters SET value = value + 1 WHERE name = 'scooters';
+        END
+    """)
+    conn.execute("DELETE FROM change_counters WHERE name = 'scooters_deleted'")
+    conn.commit()
+    with pytest.raises(ServiceError):
+        FleetSnapshot.load(conn)
+
+    ensure_change_tracking(conn)
+    snapshot = FleetSnapshot.load(conn)
+    scooter_service.delete_scooter(conn, SUPER_ADMIN, "FLT1234562")
+    assert snapshot.refresh(conn) == (0, 1)
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+
+import pytest
+
+from services import instrumentation
+from services.instrumentation import InstrumentedConnection, observe, snapshot, timed, timer
+
+
+@pytest.fixture
+def metrics():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_nothing_is_recorded_while_disabled():
+    instrumentation.reset()
+    observe("crypto.encrypt", 0.001)
+    with timer("command", "menu"):
+        pass
+    assert timed("x")(lambda: 42)() == 42
+    assert snapshot() == {}
+
+
+def test_observe_counts_and_fills_cumulative_buckets(metrics):
+    observe("crypto.encrypt", 0.0002, nbytes=100)
+    observe("crypto.encrypt", 0.003, nbytes=50, error=True)
+    observe("crypto.encrypt", 10.0)
+    values = snapshot()["crypto.encrypt"][""]
+    assert (values["count"], values["errors"], values["bytes"]) == (3, 1, 150)
+    assert values["buckets"]["0.00025"] == 1
+    assert values["buckets"]["0.005"] == 2
+    assert values["buckets"]["5.0"] == 2 and values["buckets"]["+Inf"] == 3
+
+
+def test_timed_and_timer_record_errors(metrics):
+    @timed("crypto.decrypt", size=lambda data: len(data), label="fernet")
+    def decrypt(data):
+        if not data:
+            raise ValueError("empty")
+        return data
+
+    decrypt(b"abcd")
+    with pytest.raises(ValueError):
+        decrypt(b"")
+    with pytest.raises(RuntimeError):
+        with timer("command", "menu"):
+            raise RuntimeError("boom")
+
+    recorded = snapshot()
+    assert {k: recorded["crypto.decrypt"]["fernet"][k] for k in ("count", "errors", "bytes")} == \
+        {"count": 2, "errors": 1, "bytes": 4}
+    assert recorded["command"]["menu"]["errors"] == 1
+
+
+def test_sql_statements_are_timed_by_verb(metrics):
+    conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    conn.execute("CREATE TABLE t (x)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    conn.cursor().execute("  select * from t")
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("SELECT * FROM missing")
+    sql = snapshot()["sql.execute"]
+    assert {verb: v["count"] for verb, v in sql.items()} == {"CREATE": 1, "INSERT": 1, "SELECT": 2}
+    assert sql["SELECT"]["errors"] == 1
+
+
+def test_prometheus_text(metrics):
+    observe("crypto.encrypt", 0.001, label='say "hi"', nbytes=7)
+    text = instrumentation.to_prometheus(snapshot())
+    assert "urban_mobility_instrumentation_enabled 1" in text
+    assert 'urban_mobility_crypto_encrypt_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 1' in text
+    assert 'urban_mobility_crypto_encrypt_seconds_count{op="say \\"hi\\""} 1' in text
+    assert 'urban_mobility_crypto_encrypt_bytes_total{op="say \\"hi\\""} 7' in text
+
+
+def test_export_writes_json_or_prometheus_by_extension(metrics, tmp_path):
+    observe("bcrypt.verify", 0.2)
+    instrumentation.export(str(tmp_path / "metrics.json"))
+    instrumentation.export(str(tmp_path / "metrics.prom"))
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["enabled"] and data["metrics"]["bcrypt.verify"][""]["count"] == 1
+    assert "urban_mobility_bcrypt_verify_seconds_count" in (tmp_path / "metrics.prom").read_text()
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_environment_switches_recording_on(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.json")
+    monkeypatch.setenv(instrumentation.ENV_VAR, path)
+    handlers = []
+    monkeypatch.setattr(instrumentation.signal, "signal", lambda *args: handlers.append(args))
+    try:
+        assert instrumentation.configure_from_env() == path
+        assert instrumentation.is_enabled()
+        if hasattr(instrumentation.signal, "SIGUSR1"):
+            assert handlers == [(instrumentation.signal.SIGUSR1, instrumentation._toggle)]
+    finally:
+        instrumentation.stop_metrics_exporter()   # writes the final snapshot
+        instrumentation.disable()
+        instrumentation.reset()
+    assert json.loads(open(path).read())["enabled"]
@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from modelEncryption.decode_cache import decode_cache
+from services import crypto_utils, key_rotation, scooter_service
+
+
+def test_key_rotation_reencrypts_and_retires_the_old_key(conn):
+    for i in range(3):
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(f"ROT123456{i}"))
+    old_key = crypto_utils.load_keyring()["primary"]
+    digest = conn.execute("SELECT serial_bidx FROM scooters ORDER BY id").fetchone()[0]
+
+    new_id = key_rotation.start_rotation(grace=0)
+    assert crypto_utils.current_key_id() == new_id
+    assert key_rotation.stale_tokens(conn) > 0
+
+    results = key_rotation.run_rotation(conn)
+    assert results["scooters"] == (3, 0, 0)
+    assert key_rotation.stale_tokens(conn) == 0
+    assert key_rotation.finish_rotation(conn) == 1
+
+    keyring = crypto_utils.load_keyring()
+    assert keyring["decrypt_only"] == [] and keyring["primary"] != old_key
+    # The digests are keyed by the index root, which rotation leaves alone
+    assert keyring["index_root"] == old_key
+    assert conn.execute("SELECT serial_bidx FROM scooters ORDER BY id").fetchone()[0] == digest
+    decode_cache.clear()
+    assert scooter_service.get_scooter(conn, "ROT1234561").serial_number == "ROT1234561"
+    for (blob,) in conn.execute("SELECT serial_number FROM scooters"):
+        assert crypto_utils.sealed_with_primary(blob)
+
+
+def test_finish_refuses_before_the_rotation_has_run(conn):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("ROT1234560"))
+    key_rotation.start_rotation(grace=0)
+    with pytest.raises(RuntimeError):
+        key_rotation.finish_rotation(conn)
+    assert len(crypto_utils.load_keyring()["decrypt_only"]) == 1
+
+
+def test_index_root_note_names_the_original_key(keys):
+    note = key_rotation.index_root_note()
+    assert crypto_utils.key_id(keys.read_bytes().decode()) in note
+    assert "(the original secret.key)" in note and "is not rotated" in note
+
+
+def test_index_root_note_without_secret_key(keys):
+    crypto_utils.save_keyring(crypto_utils.load_keyring())
+    keys.unlink()
+    assert "(the original secret.key)" not in key_rotation.index_root_note()
+
+
+def test_command_line_rotation(conn, db_path, capsys):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("ROT1234560"))
+    key_rotation.main(["--db", db_path, "start", "--grace", "0"])
+    key_rotation.main(["--db", db_path, "run"])
+    key_rotation.main(["--db", db_path, "finish"])
+    out = capsys.readouterr().out
+    assert "scooters: rotated 1, changed concurrently 0, failed 0" in out
+    assert "Retired 1 old key(s)." in out
+    assert out.count("is not rotated") == 2
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from models.log_entry import LogEntry
+from services.logCRUD import flush_audit_log, query_logs, start_audit_writer
+
+START = datetime(2024, 3, 1, 12, 0, 0)
+
+
+def _seed(db_path):
+    """30 events an hour apart, alternating alice/bob; every fifth one suspicious"""
+    writer = start_audit_writer(db_path)
+    for i in range(30):
+        writer.submit(LogEntry(timestamp=START + timedelta(hours=i), username="alice" if i % 2 == 0 else "bob",
+                               activity=f"event {i}", additional_info="", suspicious=i % 5 == 0))
+    flush_audit_log()
+
+
+def _pages(conn, **filters):
+    activities, after = [], None
+    while True:
+        page, after = query_logs(conn, after=after, page_size=7, **filters)
+        activities.append([entry.activity for _, entry in page])
+        if after is None:
+            return activities
+
+
+def test_pages_run_newest_first_without_gaps(conn, db_path):
+    _seed(db_path)
+    pages = _pages(conn, since=START)
+    assert [len(p) for p in pages] == [7, 7, 7, 7, 2]
+    assert sum(pages, []) == [f"event {i}" for i in range(29, -1, -1)]
+
+
+def test_filters_combine(conn, db_path):
+    _seed(db_path)
+    assert sum(_pages(conn, since=START + timedelta(hours=10), until=START + timedelta(hours=20)), []) == \
+        [f"event {i}" for i in range(19, 9, -1)]
+    assert sum(_pages(conn, since=START, suspicious=True), []) == [f"event {i}" for i in (25, 20, 15, 10, 5, 0)]
+    assert sum(_pages(conn, username="bob"), []) == [f"event {i}" for i in range(29, 0, -2)]
+    assert sum(_pages(conn, username="alice", suspicious=True), []) == ["event 20", "event 10", "event 0"]
+
+
+def test_exact_page_ends_without_a_cursor(conn, db_path):
+    _seed(db_path)
+    page, after = query_logs(conn, username="alice", page_size=15)
+    assert len(page) == 15 and after is None
+    page, after = query_logs(conn, username="alice", page_size=14)
+    assert len(page) == 14 and after is not None
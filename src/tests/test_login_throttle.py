@@ -0,0 +1,64 @@
+import pytest
+
+from services import login_throttle
+from services.login_throttle import SOURCE_CAPACITY, TICK, USER_CAPACITY, USER_REFILL
+
+PER_TOKEN = USER_REFILL / USER_CAPACITY
+
+
+@pytest.fixture(autouse=True)
+def unswept(monkeypatch):
+    monkeypatch.setattr(login_throttle, "_swept_tick", 0)
+
+
+def _fail(conn, times, username="mallory01", source="10.0.0.1"):
+    return [login_throttle.acquire(conn, username, source) for _ in range(times)]
+
+
+def test_bucket_empties_then_refills_one_token_at_a_time(conn, clock):
+    assert _fail(conn, USER_CAPACITY) == [0.0] * USER_CAPACITY
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") == pytest.approx(PER_TOKEN)
+
+    clock.advance(PER_TOKEN / 2)
+    assert login_throttle.retry_after(conn, "mallory01", "10.0.0.1") == pytest.approx(PER_TOKEN / 2)
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") == pytest.approx(PER_TOKEN / 2)
+
+    clock.advance(PER_TOKEN / 2)
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") == 0.0
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") > 0
+
+
+def test_retry_after_takes_nothing(conn, clock):
+    for _ in range(10):
+        assert login_throttle.retry_after(conn, "mallory01", "10.0.0.1") == 0.0
+    assert _fail(conn, USER_CAPACITY) == [0.0] * USER_CAPACITY
+
+
+def test_refill_is_capped_at_capacity(conn, clock):
+    _fail(conn, 1)
+    clock.advance(USER_REFILL * 10)
+    assert _fail(conn, USER_CAPACITY) == [0.0] * USER_CAPACITY
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") > 0
+
+
+def test_successful_login_refills_the_username(conn, clock):
+    _fail(conn, USER_CAPACITY)
+    login_throttle.reset(conn, "mallory01")
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") == 0.0
+
+
+def test_source_bucket_spans_usernames(conn, clock):
+    waits = [login_throttle.acquire(conn, f"user{i:05d}", "10.0.0.1") for i in range(SOURCE_CAPACITY)]
+    assert waits == [0.0] * SOURCE_CAPACITY
+    assert login_throttle.acquire(conn, "newcomer1", "10.0.0.1") > 0
+    assert login_throttle.acquire(conn, "newcomer1", "10.0.0.2") == 0.0
+
+
+def test_sweep_drops_buckets_once_they_are_full_again(conn, clock):
+    _fail(conn, USER_CAPACITY)
+    assert conn.execute("SELECT COUNT(*) FROM login_throttle").fetchone()[0] == 2
+
+    clock.advance(USER_REFILL + 2 * TICK)
+    assert login_throttle.sweep(conn) == 2
+    assert login_throttle.sweep(conn) == 0   # once per tick
+    assert login_throttle.acquire(conn, "mallory01", "10.0.0.1") == 0.0
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import scooter_service
+from services.errors import ValidationError
+from services.maintenance import count_due, due_ids, maintenance_due, mark_serviced
+
+TODAY = date.today()
+
+
+def _ago(days: int) -> str:
+    return (TODAY - timedelta(days=days)).isoformat()
+
+
+# serial suffix, days since last maintenance, km since service (rule: 180 days or 1000 km)
+FLEET = [(0, 200, 0), (1, 178, 0), (2, 10, 980), (3, 10, 0), (4, 190, 1200), (5, 100, 500)]
+
+
+@pytest.fixture
+def fleet(conn):
+    for i, days, km in FLEET:
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(
+            f"MNT123456{i}", last_maintenance=_ago(days), mileage="100"))
+        if km:
+            conn.execute("UPDATE scooters SET mileage = mileage + ? WHERE id = ?", (km, i + 1))
+    conn.commit()
+
+
+def _serials(hits):
+    return [s.serial_number for _, _, s in hits]
+
+
+def test_due_scooters_most_urgent_first(conn, fleet):
+    total, hits = maintenance_due(conn, SUPER_ADMIN)
+    assert total == 4
+    assert _serials(hits) == ["MNT1234560", "MNT1234564", "MNT1234561", "MNT1234562"]
+    assert hits[-1][:2] == ((TODAY + timedelta(days=170)).isoformat(), 20.0)
+
+
+def test_pages_are_cut_in_sql_and_total_is_counted_separately(conn, fleet):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        total, hits = maintenance_due(conn, SUPER_ADMIN, limit=2, offset=1)
+    finally:
+        conn.set_trace_callback(None)
+    assert (total, _serials(hits)) == (4, ["MNT1234564", "MNT1234561"])
+    assert any("LIMIT" in s and "OFFSET" in s for s in statements)
+    assert any("COUNT(*)" in s for s in statements)
+    assert len(due_ids(conn, limit=10, offset=4)) == 0 and count_due(conn) == 4
+
+
+def test_mark_serviced_reschedules(conn, fleet):
+    updated, missing = mark_serviced(conn, SUPER_ADMIN, ["MNT1234560", " MNT1234564 ", "NOPE123456", ""])
+    assert (updated, missing) == (2, ["NOPE123456"])
+    total, hits = maintenance_due(conn, SUPER_ADMIN)
+    assert (total, _serials(hits)) == (2, ["MNT1234561", "MNT1234562"])
+    assert scooter_service.get_scooter(conn, "MNT1234564").last_maintenance == TODAY.isoformat()
+
+
+def test_service_date_must_not_be_in_the_future(conn, fleet):
+    with pytest.raises(ValidationError):
+        mark_serviced(conn, SUPER_ADMIN, ["MNT1234560"], (TODAY + timedelta(days=1)).isoformat())
+    with pytest.raises(ValidationError):
+        mark_serviced(conn, SUPER_ADMIN, ["MNT1234560"], "01-01-2024")
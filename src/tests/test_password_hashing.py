@@ -0,0 +1,46 @@
+from conftest import SUPER_ADMIN, TEST_BCRYPT_COST
+from services import auth_service, password_hashing
+from services.password_hashing import calibrate, cost_of, ensure_password_hashing, needs_rehash
+
+PASSWORD = "Correct_Horse1!"
+
+
+def test_floor_is_not_below_the_default_cost():
+    assert password_hashing.MIN_COST >= password_hashing.DEFAULT_COST
+
+
+def test_only_weaker_hashes_need_rehashing(monkeypatch):
+    monkeypatch.setattr(password_hashing, "_cost", 12)
+    assert needs_rehash("$2b$10$" + "x" * 53)
+    assert not needs_rehash("$2b$12$" + "x" * 53)
+    assert not needs_rehash("$2b$14$" + "x" * 53)
+    monkeypatch.setattr(password_hashing, "_cost", None)
+    assert not needs_rehash("$2b$10$" + "x" * 53)
+
+
+def _stored_cost(conn) -> int:
+    return cost_of(auth_service.find_user(conn, "sysadmin01").password_hash)
+
+
+def test_login_upgrades_a_weaker_hash_but_keeps_a_stronger_one(conn, monkeypatch):
+    auth_service.create_user(conn, SUPER_ADMIN, "sysadmin01", PASSWORD, "sysadmin", "Sam", "Admin")
+    assert _stored_cost(conn) == TEST_BCRYPT_COST
+
+    monkeypatch.setattr(password_hashing, "_cost", TEST_BCRYPT_COST + 1)
+    assert auth_service.authenticate(conn, "sysadmin01", PASSWORD)
+    assert _stored_cost(conn) == TEST_BCRYPT_COST + 1
+
+    monkeypatch.setattr(password_hashing, "_cost", TEST_BCRYPT_COST)
+    assert auth_service.authenticate(conn, "sysadmin01", PASSWORD)
+    assert _stored_cost(conn) == TEST_BCRYPT_COST + 1
+
+
+def test_stored_cost_is_raised_to_the_floor(conn, monkeypatch):
+    monkeypatch.setattr(password_hashing, "MIN_COST", TEST_BCRYPT_COST + 2)
+    ensure_password_hashing(conn)
+    assert password_hashing.current_cost() == TEST_BCRYPT_COST + 2
+
+
+def test_calibration_never_goes_below_the_floor(monkeypatch):
+    monkeypatch.setattr(password_hashing, "MIN_COST", TEST_BCRYPT_COST)
+    assert calibrate(target_ms=0) == TEST_BCRYPT_COST
@@ -0,0 +1,40 @@
+import pytest
+from cryptography.fernet import InvalidToken
+
+from conftest import SUPER_ADMIN, scooter_fields
+from modelEncryption.sealed_rows import SEALED_COLUMNS, SEAL_COLUMN, is_sealed, open_fields, seal_fields
+from services import crypto_utils, scooter_service
+
+VALUES = ("Anna", "Jansen-Dijkstra", "Coolsingel", "40", "3011AD", "Rotterdam",
+          "anna@example.nl", "+31-6-12345678", "AB1234567")
+
+
+def test_sealed_round_trip():
+    stored = seal_fields("travellers", VALUES, "sealed")
+    assert is_sealed(stored[SEALED_COLUMNS["travellers"].index(SEAL_COLUMN["travellers"])])
+    assert all(v == "" for v in stored if not is_sealed(v))
+    assert open_fields("travellers", stored) == list(VALUES)
+
+
+def test_field_format_round_trip():
+    stored = seal_fields("travellers", VALUES, "fields")
+    assert not any(is_sealed(v) for v in stored)
+    assert open_fields("travellers", stored) == list(VALUES)
+
+
+def test_sealed_blob_is_bound_to_its_table_and_content():
+    blob = crypto_utils.seal(b"payload", b"travellers")
+    assert crypto_utils.unseal(blob, b"travellers") == b"payload"
+    with pytest.raises(InvalidToken):
+        crypto_utils.unseal(blob, b"users")
+    tampered = blob[:-1] + bytes([blob[-1] ^ 1])
+    with pytest.raises(InvalidToken):
+        crypto_utils.unseal(tampered, b"travellers")
+
+
+def test_scooter_rows_are_stored_sealed(conn):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("SEAL123456"))
+    stored = conn.execute("SELECT brand, model, serial_number, latitude, longitude FROM scooters").fetchone()
+    assert is_sealed(stored[SEALED_COLUMNS["scooters"].index(SEAL_COLUMN["scooters"])])
+    assert b"SEAL123456" not in b"".join(v if isinstance(v, bytes) else str(v).encode() for v in stored)
+    assert scooter_service.get_scooter(conn, "SEAL123456").brand == "Segway"
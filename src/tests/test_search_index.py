@@ -0,0 +1,39 @@
+from conftest import SUPER_ADMIN, scooter_fields
+from services import scooter_service, search_index
+from services.search_index import candidate_ids, gram_digest
+
+
+def test_trigram_candidates_and_search(conn):
+    segway = scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("SEG1234567"))
+    xiaomi = scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("XIA1234567", brand="Xiaomi", model="Pro2"))
+
+    assert candidate_ids(conn, "scooters", "egwa") == [segway.id]
+    assert sorted(candidate_ids(conn, "scooters", "1234567")) == sorted([segway.id, xiaomi.id])
+    assert candidate_ids(conn, "scooters", "zzz") == []
+    assert candidate_ids(conn, "scooters", "ma") is None   # too short for a trigram: full scan
+
+    found = list(scooter_service.search_scooters(conn, SUPER_ADMIN, "xiaomi pro"))
+    assert [s.serial_number for s in found] == ["XIA1234567"]
+
+
+def test_search_index_follows_updates_and_deletes(conn):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("SEG1234567"))
+    scooter_service.update_scooter(conn, SUPER_ADMIN, "SEG1234567", {"model": "Ninebot"})
+    assert [s.model for s in scooter_service.search_scooters(conn, SUPER_ADMIN, "ninebot")] == ["Ninebot"]
+    assert list(scooter_service.search_scooters(conn, SUPER_ADMIN, "max")) == []
+
+    scooter_service.delete_scooter(conn, SUPER_ADMIN, "SEG1234567")
+    assert candidate_ids(conn, "scooters", "ninebot") == []
+
+
+def test_grams_are_keyed_per_entity():
+    assert gram_digest("scooters", "abc") != gram_digest("travellers", "abc")
+
+
+def test_rebuild_command_uses_the_given_database(conn, db_path, capsys):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields("SEG1234567"))
+    conn.execute("DELETE FROM search_grams")
+    conn.commit()
+    search_index.main(["--db", db_path])
+    assert "1 scooters" in capsys.readouterr().out
+    assert candidate_ids(conn, "scooters", "seg123") == [scooter_service.get_scooter(conn, "SEG1234567").id]
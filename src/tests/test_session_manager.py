@@ -0,0 +1,123 @@
+import pytest
+
+from conftest import SUPER_ADMIN
+from services import auth_service, session_manager
+from services.api_server import ApiServer
+from services.session_manager import CHECK_INTERVAL, IDLE_TIMEOUT, MAX_LIFETIME
+
+PASSWORD = "Correct_Horse1!"
+NEW_PASSWORD = "Battery_Staple2!"
+ACTOR = {"username": "sysadmin01", "role": "sysadmin"}
+
+
+@pytest.fixture
+def user(conn):
+    return auth_service.create_user(conn, SUPER_ADMIN, "sysadmin01", PASSWORD, "sysadmin", "Sam", "Admin")
+
+
+def _rows(conn):
+    return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def test_session_resolves_to_its_user(conn, clock, user):
+    token = session_manager.create_session(conn, user)
+    session = session_manager.resolve(conn, token)
+    assert session.actor["username"] == "sysadmin01"
+    assert session.can("create_backup") and not session.can("create_sysadmin")
+    assert session_manager.resolve(conn, token + "x") is None
+    # Only the hash is stored
+    assert conn.execute("SELECT token_hash FROM sessions").fetchone()[0] != token
+
+
+def test_revoke_ends_the_session(conn, clock, user):
+    token = session_manager.create_session(conn, user)
+    session_manager.revoke(conn, token)
+    assert session_manager.resolve(conn, token) is None
+    assert _rows(conn) == 0
+
+
+def test_revocation_elsewhere_is_seen_after_the_check_interval(conn, clock, user):
+    token = session_manager.create_session(conn, user)
+    conn.execute("DELETE FROM sessions")   # as another process would
+    conn.commit()
+    assert session_manager.resolve(conn, token) is not None   # still cached
+    clock.advance(CHECK_INTERVAL)
+    assert session_manager.resolve(conn, token) is None
+
+
+def test_revoke_user_sessions(conn, clock, user):
+    tokens = [session_manager.create_session(conn, user) for _ in range(2)]
+    assert session_manager.revoke_user_sessions(conn, SUPER_ADMIN, "SysAdmin01") == 2
+    assert all(session_manager.resolve(conn, t) is None for t in tokens)
+
+
+def test_idle_session_expires(conn, clock, user):
+    token = session_manager.create_session(conn, user)
+    clock.advance(IDLE_TIMEOUT - 1)
+    assert session_manager.resolve(conn, token) is not None   # use slides the expiry
+    clock.advance(IDLE_TIMEOUT - 1)
+    assert session_manager.resolve(conn, token) is not None
+    clock.advance(IDLE_TIMEOUT)
+    assert session_manager.resolve(conn, token) is None
+
+
+def test_expiry_slides_in_the_table_too(conn, clock, user):
+    token = session_manager.create_session(conn, user)
+    clock.advance(IDLE_TIMEOUT - 1)
+    session_manager.resolve(conn, token)
+    assert conn.execute("SELECT expires_at FROM sessions").fetchone()[0] == clock.now + IDLE_TIMEOUT
+    session_manager.clear_cache()   # another process, or a restart, reads the stored expiry
+    clock.advance(IDLE_TIMEOUT - 1)
+    assert session_manager.resolve(conn, token) is not None
+
+
+def test_session_ends_at_max_lifetime_even_when_used(conn, clock, user):
+    token = session_manager.create_session(conn, user)
+    step = IDLE_TIMEOUT - 1
+    for _ in range(int(MAX_LIFETIME // step)):
+        clock.advance(step)
+        assert session_manager.resolve(conn, token) is not None
+    clock.advance(step)
+    assert session_manager.resolve(conn, token) is None
+
+
+def test_sweep_removes_expired_sessions(conn, clock, user):
+    old = session_manager.create_session(conn, user)
+    clock.advance(IDLE_TIMEOUT / 2)
+    fresh = session_manager.create_session(conn, user)
+    clock.advance(IDLE_TIMEOUT / 2)
+    assert session_manager.sweep(conn) == 1
+    assert _rows(conn) == 1
+    assert session_manager.resolve(conn, old) is None
+    assert session_manager.resolve(conn, fresh) is not None
+
+
+def _live(conn, tokens):
+    session_manager.clear_cache()   # read the table, not this process's cache
+    return [session_manager.resolve(conn, t) is not None for t in tokens]
+
+
+def test_own_password_change_keeps_the_current_session(conn, clock, user):
+    current, other = (session_manager.create_session(conn, user) for _ in range(2))
+    auth_service.change_password(conn, ACTOR, NEW_PASSWORD, current_password=PASSWORD, session_token=current)
+    assert session_manager.resolve(conn, other) is None
+    assert _live(conn, [current, other]) == [True, False]
+
+
+def test_admin_password_reset_ends_every_session(conn, clock, user):
+    tokens = [session_manager.create_session(conn, user) for _ in range(2)]
+    auth_service.change_password(conn, SUPER_ADMIN, NEW_PASSWORD, target_username="sysadmin01",
+                                 session_token=tokens[0])
+    assert _live(conn, tokens) == [False, False]
+
+
+def test_password_change_over_the_api_keeps_the_calling_session(conn, db_path, clock, user):
+    current, other = (session_manager.create_session(conn, user) for _ in range(2))
+    server = ApiServer(db_path, workers=1)
+    try:
+        status, payload = server._dispatch("POST", "/password", {"authorization": f"Bearer {current}"},
+                                           {"current_password": PASSWORD, "new_password": NEW_PASSWORD}, "127.0.0.1")
+    finally:
+        server.close()
+    assert (status, payload) == (201, {"updated": "sysadmin01"})
+    assert _live(conn, [current, other]) == [True, False]
@@ -0,0 +1,59 @@
+import math
+import sqlite3
+import time
+
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import scooter_service
+from services.errors import ValidationError
+from services.spatial_index import SpatialIndex, haversine_km
+from services.telemetry import TelemetryIngestor
+
+
+def _nearest_serials(conn, lat, lon, n):
+    return [s.serial_number for _, s in scooter_service.nearby_scooters(conn, SUPER_ADMIN, lat, lon, n=n)]
+
+
+def test_nearest_matches_a_linear_scan():
+    index = SpatialIndex()
+    for i in range(400):
+        index.add(i, 51.86 + (i % 20) * 0.007, 4.41 + (i // 20) * 0.009)
+    for lat, lon in ((51.9, 4.5), (51.86, 4.41), (51.999, 4.599)):
+        expected = sorted((haversine_km(lat, lon, p[0], p[1]), i) for i, p in index.positions.items())[:7]
+        assert index.nearest(lat, lon, 7) == expected
+
+
+def test_nearest_far_from_the_fleet_is_bounded():
+    index = SpatialIndex()
+    for i in range(100):
+        index.add(i, 51.9 + i * 0.0001, 4.5)
+    started = time.perf_counter()
+    assert [i for _, i in index.nearest(0.0, 0.0, 1)] == [0]
+    assert time.perf_counter() - started < 1.0
+
+
+@pytest.mark.parametrize("lat, lon", [(math.nan, 4.5), (math.inf, 4.5), (51.9, -math.inf), (0.0, 0.0), (51.9, 4.7)])
+def test_location_outside_the_service_area_is_rejected(conn, lat, lon):
+    with pytest.raises(ValidationError):
+        scooter_service.nearby_scooters(conn, SUPER_ADMIN, lat, lon, n=3)
+
+
+def test_index_sees_changes_made_outside_the_service(conn, db_path):
+    for i in range(3):
+        scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(f"GEO123456{i}", latitude=f"{51.90 + i * 0.01:.5f}"))
+    assert _nearest_serials(conn, 51.90, 4.47917, 2) == ["GEO1234560", "GEO1234561"]
+
+    other = sqlite3.connect(db_path)   # another process
+    other.execute("DELETE FROM scooters WHERE id = (SELECT MIN(id) FROM scooters)")
+    other.commit()
+    other.close()
+    assert _nearest_serials(conn, 51.90, 4.47917, 2) == ["GEO1234561", "GEO1234562"]
+
+    ingestor = TelemetryIngestor(db_path, window=60)
+    ingestor.submit({"serial": "GEO1234562", "lat": 51.90001, "lon": 4.47917})
+    ingestor.flush()
+    ingestor.close()
+    assert _nearest_serials(conn, 51.90, 4.47917, 1) == ["GEO1234562"]
+    assert [s.serial_number for _, s in scooter_service.nearby_scooters(
+        conn, SUPER_ADMIN, 51.90, 4.47917, radius_km=0.5)] == ["GEO1234562"]
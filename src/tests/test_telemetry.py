@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from conftest import SUPER_ADMIN, scooter_fields
+from services import scooter_service, telemetry
+from services.telemetry import TelemetryIngestor
+
+SERIAL = "TEL1234567"
+
+
+@pytest.fixture
+def ingestor(conn, db_path):
+    scooter_service.create_scooter(conn, SUPER_ADMIN, scooter_fields(SERIAL))
+    ingestor = TelemetryIngestor(db_path, window=3600)   # flushed by hand below
+    yield ingestor
+    ingestor.close()
+
+
+def test_reports_are_coalesced_newest_first(conn, ingestor):
+    ingestor.submit({"serial": SERIAL, "soc": 70, "ts": 200})
+    ingestor.submit({"serial": SERIAL, "soc": 55, "mileage": 150, "ts": 100})   # late, older soc
+    ingestor.submit({"serial": SERIAL, "lat": 51.95, "lon": 4.45, "ts": 150})
+    ingestor.flush(conn)
+
+    scooter = scooter_service.get_scooter(conn, SERIAL)
+    assert (scooter.soc, scooter.mileage) == (70, 150)
+    assert (float(scooter.latitude), float(scooter.longitude)) == (51.95, 4.45)
+    assert [s.serial_number for s in scooter_service.search_scooters(conn, SUPER_ADMIN, "51.95")] == [SERIAL]
+    m = ingestor.snapshot()
+    assert (m["received"], m["coalesced"], m["rows_updated"], m["pending"]) == (3, 2, 1, 0)
+
+
+def test_malformed_and_unknown_reports_are_counted(conn, ingestor):
+    assert not ingestor.submit_line("not json")
+    assert not ingestor.submit({"soc": 50})
+    assert not ingestor.submit({"serial": SERIAL, "lat": 51.95})
+    assert not ingestor.submit({"serial": SERIAL, "soc": 150})
+    assert ingestor.submit({"serial": "UNKNOWN123", "soc": 50})
+    ingestor.flush(conn)
+    m = ingestor.snapshot()
+    assert (m["rejected"], m["unknown_serial"], m["rows_updated"]) == (4, 1, 0)
+
+
+def _fail_writes(monkeypatch, times):
+    original = telemetry.write_transaction
+    calls = []
+
+    def flaky(fn, conn):
+        calls.append(1)
+        if len(calls) <= times:
+            raise sqlite3.OperationalError("database is locked")
+        return original(fn, conn)
+
+    monkeypatch.setattr(telemetry, "write_transaction", flaky)
+
+
+def test_failed_flush_is_retried_under_newer_reports(conn, ingestor, monkeypatch):
+    _fail_writes(monkeypatch, times=1)
+    ingestor.submit({"serial": SERIAL, "soc": 60, "mileage": 120, "ts": 100})
+    ingestor.flush(conn)
+    assert ingestor.snapshot()["pending"] == 1
+
+    ingestor.submit({"serial": SERIAL, "soc": 65, "ts": 200})
+    ingestor.flush(conn)
+    scooter = scooter_service.get_scooter(conn, SERIAL)
+    assert (scooter.soc, scooter.mileage) == (65, 120)
+    m = ingestor.snapshot()
+    assert (m["failed_flushes"], m["lost_updates"], m["pending"]) == (1, 0, 0)
+
+
+def test_update_is_given_up_after_the_last_attempt(conn, ingestor, monkeypatch):
+    _fail_writes(monkeypatch, times=telemetry.FLUSH_ATTEMPTS)
+    ingestor.submit({"serial": SERIAL, "soc": 60})
+    for _ in range(telemetry.FLUSH_ATTEMPTS):
+        ingestor.flush(conn)
+    m = ingestor.snapshot()
+    assert (m["failed_flushes"], m["lost_updates"], m["pending"]) == (telemetry.FLUSH_ATTEMPTS, 1, 0)
+    assert scooter_service.get_scooter(conn, SERIAL).soc == 40